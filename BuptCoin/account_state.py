@@ -0,0 +1,195 @@
+# account_state.py - 账户状态索引
+"""
+账户状态索引
+按地址表 ID 保存每个地址的链上余额、累计转出、累计收入，区块追加时增量更新，
+查询余额只需一次数组下标访问，不再遍历整条链。
+余额规则与数据库余额表相同：非系统地址发出的每笔交易另扣一笔交易手续费（手续费已计入矿工的奖励交易）。
+待处理交易的支出按发送方单独汇总，同样在交易进出待处理池时增量维护。
+"""
+
+from array import array
+from typing import Dict, List, Optional
+
+from address_registry import address_registry
+from rich_list import RichList
+
+# 系统地址（挖矿奖励等的发送方），不扣减余额
+SYSTEM_ADDRESS = "0"
+# 创世交易的接收方，没有对应的私钥
+GENESIS_ADDRESS = "genesis"
+# 不参与富豪榜排名的系统账户
+UNRANKED_ADDRESSES = (SYSTEM_ADDRESS, GENESIS_ADDRESS)
+
+
+class AccountStateIndex:
+    """链上已确认交易累计出的账户状态"""
+
+    def __init__(self, transaction_fee: float = 0.0):
+        """
+        Args:
+            transaction_fee: 每笔非系统交易向发送方收取的手续费
+        """
+        self.transaction_fee = transaction_fee
+        # 下标为地址表 ID
+        self.balances = array('d')
+        self.total_sent = array('d')
+        self.total_received = array('d')
+        # 按余额排序的富豪榜，余额变化时同步调整
+        self.rich_list = RichList()
+
+        self._system_id = address_registry.get_id(SYSTEM_ADDRESS)
+        self._unranked_ids = {address_registry.get_id(address) for address in UNRANKED_ADDRESSES}
+        self._block_count = 0
+        self._last_block_hash: Optional[str] = None
+
+    def _ensure_capacity(self, address_id: int) -> None:
+        missing = address_id + 1 - len(self.balances)
+        if missing > 0:
+            zeros = array('d', bytes(8 * missing))
+            self.balances.extend(zeros)
+            self.total_sent.extend(zeros)
+            self.total_received.extend(zeros)
+
+    def apply_block(self, block, update_ranking: bool = True) -> None:
+        """把一个区块的交易计入账户状态"""
+        touched = set()
+        for tx in block.transactions:
+            receiver_id = tx.receiver_id
+            self._ensure_capacity(receiver_id)
+            self.balances[receiver_id] += tx.amount
+            self.total_received[receiver_id] += tx.amount
+            touched.add(receiver_id)
+
+            sender_id = tx.sender_id
+            if sender_id != self._system_id:
+                self._ensure_capacity(sender_id)
+                self.balances[sender_id] -= tx.amount + self.transaction_fee
+                self.total_sent[sender_id] += tx.amount
+                touched.add(sender_id)
+        if update_ranking:
+            for address_id in touched - self._unranked_ids:
+                self.rich_list.update(address_id, self.balances[address_id])
+        self._block_count += 1
+        self._last_block_hash = block.hash
+
+    def reset(self) -> None:
+        self.balances = array('d')
+        self.total_sent = array('d')
+        self.total_received = array('d')
+        self.rich_list = RichList()
+        self._block_count = 0
+        self._last_block_hash = None
+
+    def rebuild(self, chain: List) -> None:
+        """从头重新计算（加载区块链或链被回滚时使用）"""
+        self.reset()
+        for block in chain:
+            self.apply_block(block, update_ranking=False)
+        self.rich_list.rebuild(self.balances, self._unranked_ids)
+
+    def sync(self, chain: List) -> None:
+        """
+        与区块链保持一致：只计入新追加的区块；链变短或链尾被替换时重建
+
+        每次查询前调用，链未变化时是 O(1)。
+        """
+        applied = self._block_count
+        if applied > len(chain) or (applied and chain[applied - 1].hash != self._last_block_hash):
+            self.rebuild(chain)
+            return
+        for block in chain[applied:]:
+            self.apply_block(block)
+
+    @property
+    def block_count(self) -> int:
+        """已计入的区块数"""
+        return self._block_count
+
+    def export_accounts(self) -> Dict[str, List[float]]:
+        """{地址: [余额, 累计转出, 累计收入]}，只包含有过交易的地址（用于状态快照）"""
+        accounts = {}
+        for address_id in range(len(self.balances)):
+            received = self.total_received[address_id]
+            sent = self.total_sent[address_id]
+            if received or sent:
+                accounts[address_registry.address(address_id)] = [
+                    self.balances[address_id], sent, received
+                ]
+        return accounts
+
+    def restore(self, accounts: Dict[str, List[float]], block_count: int, last_block_hash: str) -> None:
+        """从状态快照恢复：快照包含前 block_count 个区块，之后的区块由 sync() 补上"""
+        self.reset()
+        for address, (balance, sent, received) in accounts.items():
+            address_id = address_registry.get_id(address)
+            self._ensure_capacity(address_id)
+            self.balances[address_id] = balance
+            self.total_sent[address_id] = sent
+            self.total_received[address_id] = received
+        self.rich_list.rebuild(self.balances, self._unranked_ids)
+        self._block_count = block_count
+        self._last_block_hash = last_block_hash
+
+    def _value(self, column: array, address: str) -> float:
+        address_id = address_registry.lookup(address)
+        if address_id is None or address_id >= len(column):
+            return 0.0
+        return column[address_id]
+
+    def balance(self, address: str) -> float:
+        """链上余额（不含待处理交易）"""
+        return self._value(self.balances, address)
+
+    def get_account(self, address: str) -> Dict[str, float]:
+        """{'balance', 'total_sent', 'total_received'}"""
+        return {
+            'balance': self._value(self.balances, address),
+            'total_sent': self._value(self.total_sent, address),
+            'total_received': self._value(self.total_received, address)
+        }
+
+
+class PendingSpendIndex:
+    """
+    待处理交易的按发送方汇总的支出（金额 + 手续费）
+
+    交易进入、移出待处理池时增量更新，余额检查无需遍历整个待处理池。
+    """
+
+    def __init__(self):
+        # 地址表 ID -> 待处理支出合计
+        self._outflows: Dict[int, float] = {}
+        self.transaction_count = 0
+
+    @classmethod
+    def from_transactions(cls, transactions: List, fee: float) -> 'PendingSpendIndex':
+        index = cls()
+        for tx in transactions:
+            index.add(tx, fee)
+        return index
+
+    def add(self, transaction, fee: float) -> None:
+        sender_id = transaction.sender_id
+        self._outflows[sender_id] = self._outflows.get(sender_id, 0.0) + transaction.amount + fee
+        self.transaction_count += 1
+
+    def remove(self, transaction, fee: float) -> None:
+        sender_id = transaction.sender_id
+        remaining = self._outflows.get(sender_id, 0.0) - transaction.amount - fee
+        self.transaction_count -= 1
+        # 该地址已没有待处理交易时删除条目，避免浮点误差累积
+        if remaining <= 1e-9:
+            self._outflows.pop(sender_id, None)
+        else:
+            self._outflows[sender_id] = remaining
+
+    def clear(self) -> None:
+        self._outflows.clear()
+        self.transaction_count = 0
+
+    def outflow(self, address: str) -> float:
+        """地址在待处理交易中的支出合计"""
+        address_id = address_registry.lookup(address)
+        if address_id is None:
+            return 0.0
+        return self._outflows.get(address_id, 0.0)
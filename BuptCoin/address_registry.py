@@ -0,0 +1,58 @@
+# address_registry.py - 地址驻留表
+"""
+地址驻留表
+为每个出现过的地址（BPC_..., 0x..., 系统地址 "0" 等）分配一个稠密的整数 ID，
+交易、索引和缓存只保存 ID，需要显示时再查回地址字符串。
+每个地址字符串在进程内只保存一份，按地址建立的索引可以直接用 ID 做数组下标。
+"""
+
+import sys
+import threading
+from typing import Dict, Iterator, List, Optional
+
+
+class AddressRegistry:
+    """地址 <-> 整数 ID 的双向映射，ID 从 0 开始连续分配，分配后不会改变"""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._addresses: List[str] = []
+        # 只有分配新 ID 时加锁，查询已有地址不加锁
+        self._lock = threading.Lock()
+
+    def get_id(self, address: str) -> int:
+        """返回地址的 ID，地址第一次出现时分配新 ID"""
+        address_id = self._ids.get(address)
+        if address_id is None:
+            with self._lock:
+                address_id = self._ids.get(address)
+                if address_id is None:
+                    address_id = len(self._addresses)
+                    self._addresses.append(sys.intern(address))
+                    self._ids[self._addresses[address_id]] = address_id
+        return address_id
+
+    def lookup(self, address: str) -> Optional[int]:
+        """查询地址的 ID，未登记过返回 None（不分配）"""
+        return self._ids.get(address)
+
+    def address(self, address_id: int) -> str:
+        """由 ID 查地址"""
+        return self._addresses[address_id]
+
+    def intern(self, address: str) -> str:
+        """登记地址并返回表中保存的那一份字符串，供钱包等处共享同一对象"""
+        return self._addresses[self.get_id(address)]
+
+    def __contains__(self, address: str) -> bool:
+        return address in self._ids
+
+    def __len__(self) -> int:
+        return len(self._addresses)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._addresses))
+
+
+# 全局地址表
+address_registry = AddressRegistry()
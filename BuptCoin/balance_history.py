@@ -0,0 +1,124 @@
+# balance_history.py - 历史余额索引
+"""
+历史余额索引
+为每个地址记录一条按区块高度递增的余额变动日志（高度, 该区块内的净变动），
+并同时保存每条记录之后的累计余额。查询某个高度的余额、某段高度内的余额变化
+都只需一次二分查找，不必从头重放区块链。
+余额规则与 AccountStateIndex 相同：非系统地址发出的每笔交易另扣一笔交易手续费。
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Tuple
+
+from account_state import SYSTEM_ADDRESS
+from address_registry import address_registry
+
+
+class AddressLog:
+    """单个地址的余额变动日志"""
+
+    __slots__ = ('heights', 'deltas', 'balances')
+
+    def __init__(self):
+        self.heights = array('l')
+        self.deltas = array('d')
+        # balances[i] 为 heights[i] 区块之后的余额
+        self.balances = array('d')
+
+    def record(self, height: int, delta: float) -> None:
+        """记录 height 区块内的净变动（高度必须不小于已有记录）"""
+        if self.heights and self.heights[-1] == height:
+            self.deltas[-1] += delta
+            self.balances[-1] += delta
+            return
+        previous = self.balances[-1] if self.balances else 0.0
+        self.heights.append(height)
+        self.deltas.append(delta)
+        self.balances.append(previous + delta)
+
+    def balance_at(self, height: int) -> float:
+        """height 区块之后的余额"""
+        position = bisect_right(self.heights, height) - 1
+        return self.balances[position] if position >= 0 else 0.0
+
+    def changes_between(self, start: int, end: int) -> List[Tuple[int, float, float]]:
+        """高度在 [start, end] 内的每条记录：(高度, 净变动, 之后的余额)"""
+        first = bisect_left(self.heights, start)
+        last = bisect_right(self.heights, end)
+        return [(self.heights[i], self.deltas[i], self.balances[i]) for i in range(first, last)]
+
+
+class BalanceHistory:
+    """所有地址的历史余额索引，随区块追加增量更新"""
+
+    def __init__(self, transaction_fee: float = 0.0):
+        """
+        Args:
+            transaction_fee: 每笔非系统交易向发送方收取的手续费
+        """
+        self.transaction_fee = transaction_fee
+        # 地址表 ID -> AddressLog
+        self._logs: Dict[int, AddressLog] = {}
+        self._system_id = address_registry.get_id(SYSTEM_ADDRESS)
+        self._block_count = 0
+        self._last_block_hash: Optional[str] = None
+
+    def apply_block(self, block) -> None:
+        """把一个区块的余额变动追加到日志"""
+        deltas: Dict[int, float] = {}
+        for tx in block.transactions:
+            deltas[tx.receiver_id] = deltas.get(tx.receiver_id, 0.0) + tx.amount
+            if tx.sender_id != self._system_id:
+                deltas[tx.sender_id] = deltas.get(tx.sender_id, 0.0) - tx.amount - self.transaction_fee
+        for address_id, delta in deltas.items():
+            log = self._logs.get(address_id)
+            if log is None:
+                log = self._logs[address_id] = AddressLog()
+            log.record(block.index, delta)
+        self._block_count += 1
+        self._last_block_hash = block.hash
+
+    def rebuild(self, chain: List) -> None:
+        self._logs = {}
+        self._block_count = 0
+        self._last_block_hash = None
+        for block in chain:
+            self.apply_block(block)
+
+    def sync(self, chain: List) -> None:
+        """与区块链保持一致：只追加新区块；链变短或链尾被替换时重建"""
+        applied = self._block_count
+        if applied > len(chain) or (applied and chain[applied - 1].hash != self._last_block_hash):
+            self.rebuild(chain)
+            return
+        for block in chain[applied:]:
+            self.apply_block(block)
+
+    def _log(self, address: str) -> Optional[AddressLog]:
+        address_id = address_registry.lookup(address)
+        if address_id is None:
+            return None
+        return self._logs.get(address_id)
+
+    def balance_at(self, address: str, height: int) -> float:
+        """地址在 height 区块之后的链上余额"""
+        log = self._log(address)
+        return round(log.balance_at(height), 8) if log else 0.0
+
+    def balance_range(self, address: str, start: int, end: int) -> Dict:
+        """
+        地址在区块高度 [start, end] 内的余额变化
+
+        Returns:
+            {'start_balance': start 之前的余额, 'end_balance': end 之后的余额,
+             'changes': [(高度, 净变动, 之后的余额), ...]}
+        """
+        log = self._log(address)
+        if log is None:
+            return {'start_balance': 0.0, 'end_balance': 0.0, 'changes': []}
+        return {
+            'start_balance': round(log.balance_at(start - 1), 8),
+            'end_balance': round(log.balance_at(end), 8),
+            'changes': log.changes_between(start, end)
+        }
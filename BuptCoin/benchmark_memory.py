@@ -0,0 +1,149 @@
+# benchmark_memory.py - 区块链内存占用基准测试
+"""
+内存基准测试
+用 tracemalloc 统计合成区块链中每笔交易、每个区块占用的字节数，
+并与改造前的对象布局（属性存于 __dict__、字符串不驻留、区块保留整棵默克尔树的叶子列表）对比。
+
+用法: python benchmark_memory.py [交易总数] [每区块交易数] [地址数]
+      默认 1000000 笔交易、每区块 1000 笔、10000 个地址
+"""
+
+import gc
+import hashlib
+import sys
+import time
+import tracemalloc
+
+from blockchain import Block, Transaction, BLOCK_VERSION_MERKLE
+
+
+class DictRecord:
+    """对照组：与改造前一样的普通对象，属性存于 __dict__"""
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+def make_dict_block(**fields):
+    """对照组区块：和改造前一样，每个区块带一棵保存了叶子列表的默克尔树"""
+    transactions = fields['transactions']
+    merkle_tree = DictRecord(transactions=transactions,
+                             leaves=[tx.transaction_id for tx in transactions], root=None)
+    return DictRecord(merkle_tree=merkle_tree, **fields)
+
+
+def make_transactions(create, count: int, address_count: int, block_size: int):
+    """
+    生成合成交易，模拟从数据库逐行读取：每行的字符串都是新对象
+
+    Args:
+        create: 交易构造函数（Transaction.from_stored 或对照组 DictRecord）
+    """
+    transactions = []
+    base_timestamp = 1700000000
+    for i in range(count):
+        transactions.append(create(
+            sender=f"BPC{(i * 7) % address_count:08d}",
+            receiver=f"BPC{(i * 13 + 1) % address_count:08d}",
+            amount=float(i % 1000) + 0.5,
+            transaction_type="transfer",
+            data="",
+            timestamp=base_timestamp + i // block_size,
+            transaction_id=hashlib.sha256(str(i).encode()).hexdigest(),
+            block_number=i // block_size,
+            status="confirmed"
+        ))
+    return transactions
+
+
+def make_blocks(create, transactions, block_size: int):
+    blocks = []
+    previous_hash = "0" * 64
+    for index, start in enumerate(range(0, len(transactions), block_size)):
+        block_hash = hashlib.sha256(f"block{index}".encode()).hexdigest()
+        blocks.append(create(
+            index=index,
+            transactions=transactions[start:start + block_size],
+            previous_hash=previous_hash,
+            timestamp=1700000000 + index,
+            nonce=index,
+            block_hash=block_hash,
+            version=BLOCK_VERSION_MERKLE,
+            bits=0x2000ffff
+        ))
+        previous_hash = block_hash
+    return blocks
+
+
+def measure(build):
+    """返回 (结果, 新增内存字节数, 耗时秒)"""
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.time()
+    result = build()
+    elapsed = time.time() - start
+    gc.collect()
+    return result, tracemalloc.get_traced_memory()[0] - before, elapsed
+
+
+def run_benchmark(create_transaction, create_block, tx_count: int, block_size: int, address_count: int,
+                  compute_roots: bool = True):
+    tracemalloc.start()
+    transactions, tx_bytes, tx_time = measure(
+        lambda: make_transactions(create_transaction, tx_count, address_count, block_size))
+    blocks, block_bytes, block_time = measure(
+        lambda: make_blocks(create_block, transactions, block_size))
+    root_bytes, root_time = 0, 0.0
+    if compute_roots:
+        # 第一次访问默克尔根会计算并缓存，只保存根、不保留整棵树
+        _, root_bytes, root_time = measure(lambda: [block.merkle_root for block in blocks])
+    tracemalloc.stop()
+
+    block_count = len(blocks)
+    return {
+        'transactions': tx_count,
+        'blocks': block_count,
+        'bytes_per_transaction': tx_bytes / tx_count,
+        'bytes_per_block': block_bytes / block_count,
+        'bytes_per_block_with_root': (block_bytes + root_bytes) / block_count,
+        'total_mb': (tx_bytes + block_bytes + root_bytes) / 1024 / 1024,
+        'build_seconds': tx_time + block_time,
+        'merkle_seconds': root_time
+    }
+
+
+def print_report(name: str, report: dict):
+    print(f"\n{name}")
+    print(f"  交易数: {report['transactions']}, 区块数: {report['blocks']}")
+    print(f"  每笔交易: {report['bytes_per_transaction']:.1f} 字节")
+    print(f"  每个区块: {report['bytes_per_block']:.1f} 字节（不含交易），"
+          f"计算默克尔根后 {report['bytes_per_block_with_root']:.1f} 字节")
+    print(f"  合计: {report['total_mb']:.1f} MB")
+    print(f"  构建耗时: {report['build_seconds']:.2f}秒, 默克尔根计算: {report['merkle_seconds']:.2f}秒")
+
+
+def main():
+    tx_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    block_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    address_count = int(sys.argv[3]) if len(sys.argv) > 3 else 10000
+
+    print("=" * 60)
+    print("BuptCoin 内存基准测试")
+    print("=" * 60)
+    print(f"合成区块链: {tx_count} 笔交易, 每区块 {block_size} 笔, {address_count} 个地址")
+
+    slotted = run_benchmark(Transaction.from_stored, Block.from_stored, tx_count, block_size, address_count)
+    print_report("__slots__ 对象（当前实现）", slotted)
+    gc.collect()
+
+    plain = run_benchmark(DictRecord, make_dict_block, tx_count, block_size, address_count,
+                          compute_roots=False)
+    print_report("改造前的对象布局（对照）", plain)
+
+    saved = 1 - slotted['total_mb'] / plain['total_mb'] if plain['total_mb'] else 0
+    print(f"\n内存节省: {saved * 100:.1f}%")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# block_template.py - 区块模板
+"""
+区块模板
+从交易池中按手续费率优先挑选交易组成下一个区块，受最大字节数和最大交易数限制，
+没有被选中的交易留在交易池等待下一个区块。
+同一发送方的交易必须按到达顺序打包（后面的交易可能依赖前面交易之后的余额），
+因此每次只比较各发送方队首交易的手续费率。
+"""
+
+import heapq
+from typing import List
+
+# 默认区块上限
+DEFAULT_MAX_BLOCK_BYTES = 1_000_000
+DEFAULT_MAX_BLOCK_TRANSACTIONS = 1000
+# 为挖矿奖励交易预留的字节数（奖励交易在选完交易后才生成）
+REWARD_RESERVED_BYTES = 512
+
+
+class BlockTemplate:
+    """选中的交易（按到达顺序排列）及其汇总"""
+
+    def __init__(self, entries: List, pool_size: int):
+        self.entries = sorted(entries, key=lambda entry: entry.sequence)
+        self.transactions = [entry.transaction for entry in self.entries]
+        self.total_size = sum(entry.size for entry in entries)
+        self.total_fees = sum(entry.fee for entry in entries)
+        # 交易池中没有被选中的交易数
+        self.remaining = pool_size - len(entries)
+
+    @property
+    def includes_all(self) -> bool:
+        """是否选中了交易池中的全部交易"""
+        return self.remaining == 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class BlockTemplateBuilder:
+    """按手续费率和发送方顺序挑选交易"""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BLOCK_BYTES,
+                 max_transactions: int = DEFAULT_MAX_BLOCK_TRANSACTIONS):
+        """
+        Args:
+            max_bytes: 区块中交易规范编码的总字节数上限（含奖励交易）
+            max_transactions: 区块交易数上限（含奖励交易）
+        """
+        self.max_bytes = max(REWARD_RESERVED_BYTES + 1, int(max_bytes))
+        self.max_transactions = max(2, int(max_transactions))
+
+    @property
+    def max_transaction_bytes(self) -> int:
+        """单笔交易最多能占的字节数（扣除奖励交易预留后的区块容量），更大的交易永远无法打包"""
+        return self.max_bytes - REWARD_RESERVED_BYTES
+
+    def build(self, mempool) -> BlockTemplate:
+        """从交易池挑选交易（不修改交易池）"""
+        byte_budget = self.max_transaction_bytes
+        count_budget = self.max_transactions - 1
+
+        # 每个发送方一个队列，堆中只放队首：(-手续费率, 到达序号, 发送方, 队列位置)
+        queues = {}
+        heap = []
+        for entry in mempool.entries():
+            sender_id = entry.transaction.sender_id
+            if sender_id not in queues:
+                queues[sender_id] = mempool.sender_queue(sender_id)
+                heap.append((-entry.fee_rate, entry.sequence, sender_id, 0))
+        heapq.heapify(heap)
+
+        selected = []
+        used_bytes = 0
+        while heap and len(selected) < count_budget:
+            _, _, sender_id, position = heapq.heappop(heap)
+            entry = queues[sender_id][position]
+            if used_bytes + entry.size > byte_budget:
+                # 放不下时该发送方后面的交易也不能打包（依赖顺序）
+                continue
+            selected.append(entry)
+            used_bytes += entry.size
+            if position + 1 < len(queues[sender_id]):
+                following = queues[sender_id][position + 1]
+                heapq.heappush(heap, (-following.fee_rate, following.sequence, sender_id, position + 1))
+
+        return BlockTemplate(selected, len(mempool))
@@ -1,8 +1,29 @@
+import hashlib
 import json
+import struct
+import sys
 import time
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Callable, Optional, Tuple
+from account_state import AccountStateIndex
+from address_registry import address_registry
+from balance_history import BalanceHistory
+from block_template import BlockTemplateBuilder, DEFAULT_MAX_BLOCK_BYTES, DEFAULT_MAX_BLOCK_TRANSACTIONS
+# 区块格式版本定义在 canonical_encoding.py（校验进程不导入本模块也能使用）
+from canonical_encoding import (BLOCK_VERSION_HEADER, BLOCK_VERSION_LEGACY, BLOCK_VERSION_MERKLE,
+                                BLOCK_VERSION_TARGET, CURRENT_BLOCK_VERSION, CanonicalEncoder)
+from chain_columns import ChainColumns
+from chain_validator import ChainValidationReport, ChainValidator
+from difficulty import DifficultyRetargeter, DifficultyTarget
+from governance import GovernanceAggregates, governance_records
+from mempool import (Mempool, DEFAULT_MEMPOOL_EXPIRY, DEFAULT_MEMPOOL_MAX_BYTES,
+                     DEFAULT_MEMPOOL_MAX_TRANSACTIONS, STATUS_EVICTED, STATUS_EXPIRED,
+                     STATUS_REJECTED)
 from merkle_tree import MerkleTree
+from mining import (CancellationToken, MiningProgress, ParallelMiningEngine, PROGRESS_INTERVAL,
+                    make_nonce_hasher)
+from signature_verifier import SignatureVerifier
 from smart_contract import ContractManager
+from state_snapshot import DEFAULT_SNAPSHOT_INTERVAL, StateSnapshot
 from utils import Utils
 
 # 在顶部添加数据库导入
@@ -16,6 +37,11 @@ except ImportError:
 
 
 class Transaction:
+    # 使用 __slots__ 去掉每个实例的 __dict__，链上交易数量巨大时显著节省内存
+    # 发送方、接收方只保存地址表中的整数 ID，sender / receiver 属性按需查回地址
+    __slots__ = ('sender_id', 'receiver_id', 'amount', 'transaction_type', 'data', 'timestamp',
+                 'signature', 'block_number', 'status', 'transaction_id')
+
     def __init__(self, sender: str, receiver: str, amount: float,
                  transaction_type: str = "transfer", data: str = "", signature: Optional[str] = None, timestamp: Optional[int] = None):
         self.sender = sender
@@ -31,8 +57,57 @@ class Transaction:
         # 🔥 在所有属性设置完成后才计算哈希
         self.transaction_id = self.calculate_hash()
 
+    @classmethod
+    def from_stored(cls, sender: str, receiver: str, amount: float, transaction_type: str, data: str,
+                    timestamp: int, transaction_id: str, signature: Optional[str] = None,
+                    block_number: Optional[int] = None, status: str = "confirmed") -> 'Transaction':
+        """
+        从可信存储恢复交易，直接使用存储的transaction_id，不重新计算哈希
+
+        数据库每行都会返回新的字符串对象，地址换成地址表 ID，类型、状态这类高度重复的字段在这里驻留（intern），
+        让所有交易共享同一个字符串对象。
+        """
+        tx = cls.__new__(cls)
+        tx.sender_id = address_registry.get_id(sender)
+        tx.receiver_id = address_registry.get_id(receiver)
+        tx.amount = amount
+        tx.transaction_type = sys.intern(transaction_type)
+        tx.data = data or ""
+        tx.timestamp = timestamp
+        tx.signature = signature
+        tx.block_number = block_number
+        tx.status = sys.intern(status)
+        tx.transaction_id = transaction_id
+        return tx
+
+    @property
+    def sender(self) -> str:
+        return address_registry.address(self.sender_id)
+
+    @sender.setter
+    def sender(self, address: str):
+        self.sender_id = address_registry.get_id(address)
+
+    @property
+    def receiver(self) -> str:
+        return address_registry.address(self.receiver_id)
+
+    @receiver.setter
+    def receiver(self, address: str):
+        self.receiver_id = address_registry.get_id(address)
+
+    def encode(self) -> bytes:
+        """交易的规范二进制编码"""
+        return CanonicalEncoder.encode_transaction(
+            self.sender, self.receiver, self.amount, self.transaction_type, self.data, self.timestamp
+        )
+
     def calculate_hash(self) -> str:
-        transaction_data = {
+        return Utils.calculate_hash(self.encode())
+
+    def signing_data(self) -> Dict:
+        """钱包签名的交易字段（与 Wallet.create_signed_transaction 中的 transaction_data 相同）"""
+        return {
             'sender': self.sender,
             'receiver': self.receiver,
             'amount': self.amount,
@@ -40,7 +115,19 @@ class Transaction:
             'data': self.data,
             'timestamp': self.timestamp
         }
-        return Utils.calculate_hash(transaction_data)
+
+    def signing_payload(self) -> bytes:
+        """签名内容：signing_data 的排序键 JSON"""
+        return json.dumps(self.signing_data(), sort_keys=True).encode()
+
+    def calculate_legacy_hash(self) -> str:
+        """旧格式交易哈希（排序键JSON），用于校验升级前产生的交易"""
+        return Utils.calculate_hash(self.signing_data())
+
+    def has_valid_id(self) -> bool:
+        """transaction_id 是否与交易内容一致（兼容旧格式哈希）"""
+        return (self.transaction_id == self.calculate_hash()
+                or self.transaction_id == self.calculate_legacy_hash())
 
     def to_dict(self) -> Dict:
         """转换为字典（包含数据库需要的字段）"""
@@ -67,45 +154,169 @@ class Transaction:
             return f"Transaction[{self.transaction_type}]({self.sender} -> {self.receiver}: {self.amount})"
 
 
+NONCE_FORMAT = '>Q'
+
+
 class Block:
+    __slots__ = ('version', 'index', 'timestamp', '_transactions', '_transaction_loader', 'previous_hash',
+                 'nonce', 'bits', '_merkle_tree', '_merkle_root', 'hash')
+
     def __init__(self, index: int, transactions: List[Transaction], previous_hash: str,
-                 timestamp: Optional[int] = None, nonce: int = 0):
+                 timestamp: Optional[int] = None, nonce: int = 0, version: int = CURRENT_BLOCK_VERSION,
+                 bits: Optional[int] = None, merkle_root: Optional[str] = None):
+        self.version = version
         self.index = index
         self.timestamp = timestamp or Utils.get_current_timestamp()
-        self.transactions = transactions
+        self._transactions = transactions
+        self._transaction_loader = None
         self.previous_hash = previous_hash
         self.nonce = nonce
-        self.merkle_tree = MerkleTree(transactions)
+        # 紧凑格式难度目标，版本 3 起参与区块哈希
+        self.bits = bits
+        # 调用方已知默克尔根时（如挖矿模板）推迟到需要证明时再建树
+        self._merkle_tree = None
+        self._merkle_root = merkle_root
         self.hash = self.calculate_hash()
 
-    def calculate_hash(self) -> str:
-        """计算区块的哈希值（包含默克尔根和nonce）"""
-        block_data = {
+    @classmethod
+    def from_stored(cls, index: int, transactions: Optional[List[Transaction]], previous_hash: str,
+                    timestamp: int, nonce: int, block_hash: str, version: int = BLOCK_VERSION_LEGACY,
+                    bits: Optional[int] = None, merkle_root: Optional[str] = None,
+                    transaction_loader: Optional[Callable[[int], List[Transaction]]] = None) -> 'Block':
+        """
+        从可信存储恢复区块，直接使用存储的区块哈希和默克尔根
+
+        没有存储默克尔根时推迟到 merkle_root 被访问（如验证链）时才由交易计算；
+        整链校验总会由交易重新计算默克尔根并与存储的值比对。
+        transactions 为 None 时只恢复区块头，第一次访问 transactions 时调用 transaction_loader(高度) 加载。
+        """
+        block = cls.__new__(cls)
+        block.version = version
+        block.index = index
+        block.timestamp = timestamp
+        block._transactions = transactions
+        block._transaction_loader = transaction_loader
+        block.previous_hash = previous_hash
+        block.nonce = nonce
+        block.bits = bits
+        block._merkle_tree = None
+        block._merkle_root = merkle_root or None
+        block.hash = block_hash
+        return block
+
+    @property
+    def transactions(self) -> List[Transaction]:
+        """区块中的交易（只恢复了区块头的区块在第一次访问时加载）"""
+        if self._transactions is None:
+            self._transactions = self._transaction_loader(self.index)
+            self._transaction_loader = None
+        return self._transactions
+
+    @transactions.setter
+    def transactions(self, transactions: List[Transaction]):
+        self._transactions = transactions
+        self._transaction_loader = None
+
+    @property
+    def is_loaded(self) -> bool:
+        """交易是否已加载"""
+        return self._transactions is not None
+
+    @property
+    def merkle_tree(self) -> MerkleTree:
+        """完整默克尔树（按需构建）"""
+        if self._merkle_tree is None:
+            self._merkle_tree = MerkleTree(self.transactions, legacy=self.version < BLOCK_VERSION_MERKLE)
+        return self._merkle_tree
+
+    @property
+    def merkle_root(self) -> str:
+        """默克尔根（按需计算）；只求根时不保留整棵树，需要证明时才由 merkle_tree 建树"""
+        if self._merkle_root is None:
+            if self._merkle_tree is not None:
+                self._merkle_root = self._merkle_tree.get_root()
+            else:
+                self._merkle_root = MerkleTree(
+                    self.transactions, legacy=self.version < BLOCK_VERSION_MERKLE
+                ).get_root()
+        return self._merkle_root
+
+    def hash_fields(self) -> Dict:
+        """参与旧格式区块哈希计算的字段（不含nonce）"""
+        return {
             'index': self.index,
             'timestamp': self.timestamp,
             'transactions': [tx.to_dict() for tx in self.transactions],
             'previous_hash': self.previous_hash,
-            'nonce': self.nonce,
-            'merkle_root': self.merkle_tree.get_root()
+            'merkle_root': self.merkle_root
         }
+
+    def header_prefix(self) -> bytes:
+        """区块头中除nonce以外的部分，交易只通过默克尔根参与哈希"""
+        return CanonicalEncoder.encode_block_header_prefix(
+            self.version, self.index, self.timestamp, self.previous_hash, self.merkle_root,
+            self.bits if self.version >= BLOCK_VERSION_TARGET else None
+        )
+
+    def hash_job(self) -> Tuple[str, Any]:
+        """
+        描述如何为任意nonce计算本区块哈希（可跨进程传递）
+
+        Returns:
+            ('header', 区块头前缀字节) 或 ('legacy', 旧格式哈希字段)
+        """
+        if self.version >= BLOCK_VERSION_HEADER:
+            return 'header', self.header_prefix()
+        return 'legacy', self.hash_fields()
+
+    def calculate_hash(self) -> str:
+        """计算区块的哈希值（包含默克尔根和nonce）"""
+        if self.version >= BLOCK_VERSION_HEADER:
+            header_hash = hashlib.sha256(self.header_prefix())
+            header_hash.update(struct.pack(NONCE_FORMAT, self.nonce))
+            return header_hash.hexdigest()
+
+        block_data = self.hash_fields()
+        block_data['nonce'] = self.nonce
         return Utils.calculate_hash(block_data)
 
-    def mine_block(self, difficulty: int) -> None:
-        target = '0' * difficulty
-        print(f"开始挖矿，难度: {difficulty}, 目标前缀: {target}")
-        
+    def mine_block(self, target, cancel_token: Optional[CancellationToken] = None,
+                   progress_callback: Optional[Callable[[MiningProgress], None]] = None) -> bool:
+        """
+        工作量证明：递增nonce直到哈希不大于目标值
+
+        Args:
+            target: DifficultyTarget（整数按旧的十六进制前导 0 个数解释）
+            cancel_token: 取消令牌，被取消时立即停止
+            progress_callback: 进度回调，每隔 PROGRESS_INTERVAL 秒调用一次
+
+        Returns:
+            找到有效哈希返回 True，被取消返回 False
+        """
+        target = DifficultyTarget.coerce(target)
+        target_hex = target.target_hex
+        print(f"开始挖矿，难度: {target}")
+
+        # 区块头前缀只编码一次，之后每次尝试只追加nonce
+        hash_nonce = make_nonce_hasher(self.hash_job())
+
         start_time = time.time()
+        last_report = start_time
         attempts = 0
         
-        while self.hash[:difficulty] != target:
+        while self.hash > target_hex:
             self.nonce += 1
-            self.hash = self.calculate_hash()
+            self.hash = hash_nonce(self.nonce)
             attempts += 1
             
             if attempts % 1000 == 0:
-                elapsed = time.time() - start_time
-                rate = attempts / elapsed if elapsed > 0 else 0
-                print(f"尝试次数: {attempts}, 速度: {rate:.0f} H/s")
+                if cancel_token and cancel_token.cancelled:
+                    print(f"⏹️  挖矿已取消（已尝试 {attempts} 次）")
+                    return False
+                now = time.time()
+                if progress_callback and now - last_report >= PROGRESS_INTERVAL:
+                    progress_callback(MiningProgress(attempts, now - start_time))
+                    last_report = now
         
         elapsed = time.time() - start_time
         rate = attempts / elapsed if elapsed > 0 else 0
@@ -115,18 +326,36 @@ class Block:
         print(f"  尝试次数: {attempts}")
         print(f"  耗时: {elapsed:.2f}秒")
         print(f"  平均算力: {rate:.0f} H/s")
+        return True
+
+    def get_transaction_proof(self, transaction_id: str) -> Optional[Dict]:
+        """
+        生成区块内某笔交易的默克尔包含证明，交易不在本区块时返回 None
+
+        Returns:
+            {'index', 'leaf_count', 'leaf', 'siblings', 'root', 'legacy'}，
+            校验时把 leaf_count 传给 MerkleTree.verify_proof
+        """
+        for index, tx in enumerate(self.transactions):
+            if tx.transaction_id == transaction_id:
+                proof = self.merkle_tree.get_proof(index)
+                proof['legacy'] = self.merkle_tree.legacy
+                return proof
+        return None
 
     def to_dict(self) -> Dict:
         return {
+            'version': self.version,
             'index': self.index,
             'timestamp': self.timestamp,
             'transactions': [tx.to_dict() for tx in self.transactions],
             'previous_hash': self.previous_hash,
             'hash': self.hash,
             'nonce': self.nonce,
-            'merkle_root': self.merkle_tree.get_root(),
+            'merkle_root': self.merkle_root,
             'transaction_count': len(self.transactions),
-            'difficulty': 2,
+            'bits': self.bits,
+            'difficulty': round(DifficultyTarget.from_compact(self.bits).zero_bits, 2) if self.bits else None,
             'size': len(json.dumps([tx.to_dict() for tx in self.transactions]))
         }
 
@@ -135,11 +364,36 @@ class Block:
 
 
 class Blockchain:
-    def __init__(self, difficulty: int = 2):
+    def __init__(self, difficulty: int = 2, mining_workers: int = 1):
         self.chain: List[Block] = []
-        self.pending_transactions: List[Transaction] = []
-        self.difficulty = difficulty
+        # 链上交易的列式副本，供按地址 / 类型 / 时间段的聚合查询使用，第一次查询时建立
+        self._chain_columns = ChainColumns()
+        # 每笔非系统交易的手续费
         self.transaction_fee = 0.1
+        # 各地址的链上余额 / 累计转出 / 累计收入，区块追加时增量更新（余额扣除手续费，与余额表一致）
+        self.account_state = AccountStateIndex(self.transaction_fee)
+        # 各地址按区块高度的余额变动日志，第一次查询历史余额时建立
+        self.balance_history = BalanceHistory(self.transaction_fee)
+        # 质押总额与投票统计，区块追加时增量更新，随状态快照保存和恢复
+        self.governance = GovernanceAggregates()
+        # 富豪榜显示用的地址昵称 / 所有者缓存，每个地址只查询一次数据库
+        self._address_labels: Dict[str, Dict] = {}
+        # 地址公钥缓存（地址由公钥哈希得到，公钥不会变化），以及批量验证签名的进程池
+        self._public_keys: Dict[str, str] = {}
+        self.signature_verifier = SignatureVerifier()
+        # 非系统交易一律要求有效签名；只有打开 allow_unsigned_legacy 时，
+        # 从数据库加载的区块（高度不超过 legacy_unsigned_height）中才允许出现签名功能上线前的未签名交易
+        self.allow_unsigned_legacy = False
+        self.legacy_unsigned_height = -1
+        # 已连续保存到数据库的最高区块高度（从网络接收、未保存的区块不会推进它），只在该高度保存状态快照
+        self.persisted_height = -1
+        # 整链校验引擎，区块哈希 / 工作量证明 / 默克尔根 / 交易 ID 在进程池中并行检查
+        self.chain_validator = ChainValidator()
+        self.difficulty = difficulty
+        # 挖矿进程数大于1时使用多核并行挖矿引擎
+        self.mining_engine = ParallelMiningEngine(mining_workers) if mining_workers > 1 else None
+        # 当前挖矿轮次的取消令牌，收到新区块时通过 abort_mining() 取消
+        self.mining_cancel_token: Optional[CancellationToken] = None
         self.mining_reward = 10.0
         self.contract_manager = ContractManager()
         self.forks = []
@@ -151,6 +405,36 @@ class Blockchain:
         else:
             print("⚠️  使用内存存储，数据不会持久化")
 
+        # difficulty 为初始难度（十六进制前导 0 个数），之后按出块时间动态调整
+        block_interval = 10
+        # 每隔多少个区块保存一次状态快照
+        self.snapshot_interval = DEFAULT_SNAPSHOT_INTERVAL
+        # 区块大小上限，超出的交易留在交易池等待下一个区块
+        max_block_bytes = DEFAULT_MAX_BLOCK_BYTES
+        max_block_transactions = DEFAULT_MAX_BLOCK_TRANSACTIONS
+        # 交易池上限和待处理交易的存活时间
+        mempool_max_bytes = DEFAULT_MEMPOOL_MAX_BYTES
+        mempool_max_transactions = DEFAULT_MEMPOOL_MAX_TRANSACTIONS
+        mempool_expiry = DEFAULT_MEMPOOL_EXPIRY
+        if self.db and self.db.is_connected:
+            mempool_max_bytes = self.db.get_config_value('mempool_max_bytes', mempool_max_bytes)
+            mempool_max_transactions = self.db.get_config_value('mempool_max_transactions',
+                                                                mempool_max_transactions)
+            mempool_expiry = self.db.get_config_value('mempool_expiry', mempool_expiry)
+            max_block_bytes = self.db.get_config_value('max_block_bytes', max_block_bytes)
+            max_block_transactions = self.db.get_config_value('max_block_transactions', max_block_transactions)
+            block_interval = self.db.get_config_value('block_time', block_interval)
+            self.snapshot_interval = max(1, int(self.db.get_config_value('snapshot_interval',
+                                                                         self.snapshot_interval)))
+            self.allow_unsigned_legacy = bool(self.db.get_config_value('allow_unsigned_legacy', 0))
+        self.retargeter = DifficultyRetargeter(DifficultyTarget.from_hex_zeros(difficulty),
+                                               block_interval=block_interval)
+        self.block_template_builder = BlockTemplateBuilder(max_block_bytes, max_block_transactions)
+        # 交易池：按 ID 去重，维护发送方队列、手续费率优先堆、待支出汇总和增量默克尔树，
+        # 总量有上限，池满时挤掉手续费率最低的交易；放不进区块模板的交易不接受
+        self.mempool = Mempool(mempool_max_bytes, mempool_max_transactions, mempool_expiry,
+                               self.block_template_builder.max_transaction_bytes)
+
         loaded = self.load_from_database()
         
         if loaded and self.chain:
@@ -159,7 +443,8 @@ class Blockchain:
                 print(f"   第一个区块的索引是 {self.chain[0].index}，应该是 0！")
                 print(f"   正在清空并重新创建区块链...\n")
                 self.chain = []
-                self.pending_transactions = []
+                self.persisted_height = -1
+                self.mempool.clear()
                 loaded = False
         
         if not loaded:
@@ -176,101 +461,109 @@ class Blockchain:
         try:
             print("正在从数据库加载数据...")
 
+            # 先读取最新的快照：快照及之前的区块只恢复区块头，交易在第一次访问时才加载
+            snapshot = self.read_state_snapshot()
+            archived_height = snapshot.height if snapshot else -1
+
             cursor = self.db.connection.cursor(dictionary=True)
-            cursor.execute('''
-            SELECT DISTINCT block_number FROM transactions 
-            WHERE block_number IS NOT NULL AND status = 'confirmed'
-            ORDER BY block_number ASC
-            ''')
-            block_numbers = [row['block_number'] for row in cursor.fetchall()]
+            cursor.execute('SELECT * FROM blocks ORDER BY block_number ASC')
+            blocks_data = cursor.fetchall()
             cursor.close()
 
-            if not block_numbers:
+            if not blocks_data:
                 print("数据库中没有任何区块")
                 return False
 
-            print(f"数据库中找到区块: {block_numbers}")
+            print(f"数据库中找到 {len(blocks_data)} 个区块 "
+                  f"(#{blocks_data[0]['block_number']} - #{blocks_data[-1]['block_number']})")
 
-            if block_numbers[0] != 0:
-                print(f"⚠️ 警告：数据库中第一个区块不是0，而是 {block_numbers[0]}！数据库可能损坏！")
+            if blocks_data[0]['block_number'] != 0:
+                print(f"⚠️ 警告：数据库中第一个区块不是0，而是 {blocks_data[0]['block_number']}！数据库可能损坏！")
                 return False
 
-            blocks_dict = {}
-            for block_num in block_numbers:
-                cursor = self.db.connection.cursor(dictionary=True)
-                cursor.execute('''
-                SELECT * FROM transactions 
-                WHERE block_number = %s AND status = 'confirmed'
-                ORDER BY timestamp ASC
-                ''', (block_num,))
-                transactions_data = cursor.fetchall()
-                cursor.close()
-
-                if transactions_data:
-                    transactions = []
-                    for tx_data in transactions_data:
-                        tx = Transaction(
-                            sender=tx_data['from_address'],
-                            receiver=tx_data['to_address'],
-                            amount=float(tx_data['amount']),
-                            transaction_type=tx_data['transaction_type'],
-                            data=tx_data.get('data', ''),
-                            timestamp=tx_data['timestamp']
-                        )
-                        # 🔥 用数据库中的transaction_hash覆盖
-                        tx.transaction_id = tx_data['transaction_hash']
-                        tx.block_number = tx_data['block_number']
-                        tx.status = tx_data['status']
-                        transactions.append(tx)
-
-                    cursor = self.db.connection.cursor(dictionary=True)
-                    cursor.execute('SELECT * FROM blocks WHERE block_number = %s', (block_num,))
-                    block_data = cursor.fetchone()
-                    cursor.close()
-
-                    if block_data:
-                        block = Block(
-                            index=block_data['block_number'],
-                            transactions=transactions,
-                            previous_hash=block_data['previous_hash'],
-                            timestamp=block_data['timestamp'],
-                            nonce=block_data['nonce']
-                        )
-                        # 🔥 用数据库中的block_hash覆盖
-                        block.hash = block_data['block_hash']
-                        blocks_dict[block_num] = block
-                        print(f"  加载区块 #{block_num}: {block.hash[:20]}...")
-
-            sorted_blocks = sorted(blocks_dict.items(), key=lambda x: x[0])
-            for _, block in sorted_blocks:
-                self.chain.append(block)
+            # 只查出快照之后的已确认交易，按区块分组
+            transactions_by_block = self.fetch_confirmed_transactions(archived_height + 1)
+
+            for block_data in blocks_data:
+                block_num = block_data['block_number']
+                archived = block_num <= archived_height
+                transactions = None if archived else transactions_by_block.get(block_num)
+                if not archived and not transactions:
+                    continue
+
+                # 旧数据库只记录了十六进制前导 0 个数形式的难度
+                bits = (block_data.get('target_bits')
+                        or DifficultyTarget.from_hex_zeros(block_data['difficulty']).to_compact())
+                # 使用存储的block_hash，默克尔根和区块哈希等到验证时才计算
+                self.chain.append(Block.from_stored(
+                    index=block_num,
+                    transactions=transactions,
+                    previous_hash=block_data['previous_hash'],
+                    timestamp=block_data['timestamp'],
+                    nonce=block_data['nonce'],
+                    block_hash=block_data['block_hash'],
+                    version=block_data.get('version') or BLOCK_VERSION_LEGACY,
+                    bits=bits,
+                    merkle_root=block_data.get('merkle_root'),
+                    transaction_loader=self.load_archived_transactions if archived else None
+                ))
+            if self.chain:
+                self.persisted_height = self.chain[-1].index
+            if self.allow_unsigned_legacy and self.chain:
+                self.legacy_unsigned_height = self.chain[-1].index
+            self.restore_state_snapshot(snapshot)
 
             print(f"✅ 从数据库加载了 {len(self.chain)} 个区块")
 
-            cursor = self.db.connection.cursor(dictionary=True)
-            cursor.execute('''
-            SELECT * FROM transactions 
-            WHERE status = 'pending' 
-            ORDER BY timestamp ASC
-            ''')
-            pending_txs = cursor.fetchall()
-            cursor.close()
-
+            # 超过存活时间的待处理交易只在数据库中标记为过期，不再加载
+            if self.mempool.expiry and self.mempool.expiry > 0:
+                expired = self.db.mark_pending_before(int(time.time() - self.mempool.expiry), STATUS_EXPIRED)
+                if expired:
+                    print(f"⏹️  {expired} 笔待处理交易已过期")
+
+            # 最多加载交易池容量内最新的待处理交易，更早的标记为被挤出；
+            # 与最早加载的交易时间戳相同的交易按 id 区分，没有加载的也标记为被挤出
+            pending_txs = self.db.get_pending_transactions(self.mempool.max_transactions)
+            if len(pending_txs) == self.mempool.max_transactions:
+                oldest = pending_txs[0]
+                evicted = self.db.mark_pending_before(oldest['timestamp'], STATUS_EVICTED, oldest.get('id'))
+                if evicted:
+                    print(f"⚠️  交易池已满，{evicted} 笔较早的待处理交易被挤出")
+
+            unsigned = []
+            oversized = []
             for tx_data in pending_txs:
-                tx = Transaction(
+                if tx_data['from_address'] != "0" and not tx_data.get('signature'):
+                    # 未签名的待处理交易不进入交易池（allow_unsigned_legacy 只对已确认区块生效）
+                    unsigned.append(tx_data['transaction_hash'])
+                    continue
+                tx = Transaction.from_stored(
                     sender=tx_data['from_address'],
                     receiver=tx_data['to_address'],
                     amount=float(tx_data['amount']),
                     transaction_type=tx_data['transaction_type'],
                     data=tx_data.get('data', ''),
-                    timestamp=tx_data['timestamp']
+                    timestamp=tx_data['timestamp'],
+                    transaction_id=tx_data['transaction_hash'],
+                    signature=tx_data.get('signature'),
+                    status=tx_data['status']
                 )
-                tx.transaction_id = tx_data['transaction_hash']
-                tx.status = tx_data['status']
-                self.pending_transactions.append(tx)
-
-            if self.pending_transactions:
-                print(f"✅ 从数据库加载了 {len(self.pending_transactions)} 笔待处理交易")
+                if not self.mempool.fits(tx):
+                    # 区块上限调小后放不进任何区块的交易
+                    oversized.append(tx.transaction_id)
+                    continue
+                # 存活时间从交易创建时算起，重启不会延长
+                self.mempool.add(tx, self.transaction_fee, added_at=tx.timestamp)
+            self.record_dropped_transactions()
+            if unsigned:
+                self.db.mark_transactions_status(unsigned, STATUS_REJECTED)
+                print(f"⚠️  {len(unsigned)} 笔未签名的待处理交易已拒绝")
+            if oversized:
+                self.db.mark_transactions_status(oversized, STATUS_REJECTED)
+                print(f"⚠️  {len(oversized)} 笔超过区块容量的待处理交易已拒绝")
+
+            if self.mempool:
+                print(f"✅ 从数据库加载了 {len(self.mempool)} 笔待处理交易")
 
             return True
 
@@ -292,13 +585,17 @@ class Blockchain:
             transaction_type="genesis",
             timestamp=GENESIS_TIMESTAMP
         )
+        # 创世交易沿用旧格式哈希，保证各节点的创世区块哈希保持不变
+        genesis_transaction.transaction_id = genesis_transaction.calculate_legacy_hash()
 
         genesis_block = Block(
             index=0,
             transactions=[genesis_transaction],
             previous_hash="0" * 64,
             timestamp=GENESIS_TIMESTAMP,
-            nonce=0
+            nonce=0,
+            version=BLOCK_VERSION_LEGACY,  # 保持创世区块哈希与已有链一致
+            bits=self.retargeter.initial_target.to_compact()
         )
 
         genesis_block.hash = genesis_block.calculate_hash()
@@ -313,12 +610,14 @@ class Blockchain:
             try:
                 block_data = {
                     'number': genesis_block.index,
+                    'version': genesis_block.version,
                     'hash': genesis_block.hash,
                     'previous_hash': genesis_block.previous_hash,
                     'timestamp': genesis_block.timestamp,
                     'difficulty': self.difficulty,
+                    'target_bits': genesis_block.bits,
                     'nonce': genesis_block.nonce,
-                    'merkle_root': genesis_block.merkle_tree.get_root(),
+                    'merkle_root': genesis_block.merkle_root,
                     'transaction_count': 1,
                     'miner_address': 'system',
                     'block_size': 0
@@ -340,16 +639,34 @@ class Blockchain:
                     'memo': 'Genesis Transaction'
                 }
                 self.db.record_transaction(tx_data)
+                self.persisted_height = 0
 
                 print("✅ 创世区块已保存到数据库")
             except Exception as e:
                 print(f"⚠️ 保存创世区块到数据库失败 (可能已存在): {e}")
 
     def add_transaction(self, transaction: Transaction, signature: str = None) -> bool:
-        if signature and transaction.sender != "0":
+        if transaction.transaction_id in self.mempool:
+            print(f"⚠️ 交易已在交易池中，忽略重复交易: {transaction.transaction_id[:20]}...")
+            return False
+
+        signature = signature or transaction.signature
+        if transaction.sender != "0":
+            if not signature:
+                print(f"❌ 交易缺少签名，拒绝！交易ID: {transaction.transaction_id}")
+                return False
             if not self.verify_transaction_signature(transaction, signature):
                 print(f"❌ 交易签名验证失败！交易ID: {transaction.transaction_id}")
                 return False
+            transaction.signature = signature
+
+        if not self.mempool.fits(transaction):
+            print(f"❌ 交易过大，超过区块可容纳的 {self.mempool.max_transaction_bytes} 字节，拒绝！")
+            return False
+
+        # 先清除过期交易，释放它们占用的待支出
+        self.mempool.expire()
+        self.record_dropped_transactions()
 
         if transaction.sender != "0":
             sender_balance = self.get_balance(transaction.sender)
@@ -360,24 +677,13 @@ class Blockchain:
                 print(f"   需要: {total_cost:.8f}, 余额: {sender_balance:.8f}")
                 return False
 
-        self.pending_transactions.append(transaction)
+        if not self.mempool.add(transaction, self.transaction_fee):
+            print("❌ 交易池已满，交易的手续费率低于池中所有交易，未被接受")
+            return False
 
         if self.db and self.db.is_connected:
             try:
-                tx_data = {
-                    'hash': transaction.transaction_id,
-                    'from': transaction.sender,
-                    'to': transaction.receiver,
-                    'amount': float(transaction.amount),
-                    'fee': float(self.transaction_fee),
-                    'transaction_type': transaction.transaction_type,
-                    'data': transaction.data,
-                    'timestamp': transaction.timestamp,
-                    'status': 'pending',
-                    'confirmations': 0,
-                    'block_number': None,
-                    'memo': f'{transaction.transaction_type} transaction'
-                }
+                tx_data = self._pending_transaction_row(transaction)
 
                 success = self.db.record_transaction(tx_data)
                 if not success:
@@ -386,6 +692,7 @@ class Blockchain:
                 print(f"❌ 数据库操作异常: {e}")
                 import traceback
                 traceback.print_exc()
+        self.record_dropped_transactions()
 
         print(f"✅ 交易已添加到待处理池: {transaction}")
         print(f"   交易ID: {transaction.transaction_id}")
@@ -393,8 +700,255 @@ class Blockchain:
 
         return True
 
-    def mine_pending_transactions(self, miner_address: str) -> bool:
-        if not self.pending_transactions:
+    def _pending_transaction_row(self, transaction: Transaction) -> Dict:
+        """待处理交易在 transactions 表中的记录"""
+        return {
+            'hash': transaction.transaction_id,
+            'from': transaction.sender,
+            'to': transaction.receiver,
+            'amount': float(transaction.amount),
+            'fee': float(self.transaction_fee),
+            'transaction_type': transaction.transaction_type,
+            'data': transaction.data,
+            'timestamp': transaction.timestamp,
+            'status': 'pending',
+            'signature': transaction.signature,
+            'confirmations': 0,
+            'block_number': None,
+            'memo': f'{transaction.transaction_type} transaction'
+        }
+
+    def _available_balances(self, addresses: List[str]) -> Dict[str, float]:
+        """
+        一组地址当前可用于新交易的余额（与 get_balance 口径相同）
+
+        数据库可用时一次查询取出所有地址的余额，否则使用内存中的账户状态。
+        """
+        if self.db and self.db.is_connected:
+            db_balances = self.db.get_address_balances(addresses)
+            if db_balances is not None:
+                return {address: max(0, db_balances[address] - self.pending_outflow(address))
+                        for address in addresses}
+
+        account_state = self.get_account_state()
+        return {address: round(account_state.balance(address) - self.pending_outflow(address), 8)
+                for address in addresses}
+
+    def add_transactions(self, transactions: List[Transaction],
+                         signatures: Optional[List[str]] = None) -> List[Dict]:
+        """
+        批量提交交易
+
+        整批交易基于同一份余额视图校验，同一发送方在批内的多笔支出依次扣减；
+        被接受的交易在一个数据库事务中批量写入。
+
+        Args:
+            transactions: 交易列表
+            signatures: 与 transactions 一一对应的签名，省略时使用各交易自带的签名；
+                        非系统交易没有签名时拒绝
+
+        Returns:
+            与 transactions 一一对应的结果：[{'transaction_id', 'accepted', 'reason'}, ...]，
+            reason 为拒绝原因，被接受时为 None
+        """
+        self.mempool.expire()
+        self.record_dropped_transactions()
+
+        senders = list({tx.sender for tx in transactions if tx.sender != "0"})
+        available = self._available_balances(senders)
+
+        # 整批签名一次性交给验证进程池
+        if signatures is None:
+            signatures = [tx.signature for tx in transactions]
+        signed = [position for position, tx in enumerate(transactions)
+                  if signatures[position] and tx.sender != "0"]
+        verified = {position: False for position, tx in enumerate(transactions)
+                    if not signatures[position] and tx.sender != "0"}
+        verified.update(zip(signed, self.verify_transaction_signatures(
+            [transactions[position] for position in signed], [signatures[position] for position in signed])))
+
+        results = []
+        seen = set()
+        for position, tx in enumerate(transactions):
+            tx_id = tx.transaction_id
+            result = {'transaction_id': tx_id, 'accepted': False, 'reason': None}
+            results.append(result)
+
+            if tx_id in seen or tx_id in self.mempool:
+                result['reason'] = "重复交易"
+                continue
+            seen.add(tx_id)
+
+            if not verified.get(position, True):
+                result['reason'] = "签名验证失败" if signatures[position] else "缺少签名"
+                continue
+            if position in verified:
+                tx.signature = signatures[position]
+
+            if not self.mempool.fits(tx):
+                result['reason'] = f"交易过大（超过区块可容纳的 {self.mempool.max_transaction_bytes} 字节）"
+                continue
+
+            total_cost = tx.amount + self.transaction_fee
+            if tx.sender != "0" and available[tx.sender] < total_cost:
+                result['reason'] = f"余额不足（需要 {total_cost:.8f}，可用 {available[tx.sender]:.8f}）"
+                continue
+
+            if not self.mempool.add(tx, self.transaction_fee):
+                result['reason'] = "交易池已满，手续费率过低"
+                continue
+
+            if tx.sender != "0":
+                available[tx.sender] -= total_cost
+            result['accepted'] = True
+
+        # 批内较早接受的交易可能又被后面的交易挤出交易池，这些交易不再写入数据库
+        accepted = []
+        for tx, result in zip(transactions, results):
+            if not result['accepted']:
+                continue
+            if tx.transaction_id not in self.mempool:
+                result['accepted'] = False
+                result['reason'] = "交易池已满，手续费率过低"
+                continue
+            accepted.append(tx)
+
+        if accepted and self.db and self.db.is_connected:
+            if not self.db.record_transactions([self._pending_transaction_row(tx) for tx in accepted]):
+                print("❌ 批量保存交易到数据库失败")
+        self.record_dropped_transactions()
+
+        print(f"✅ 批量提交 {len(transactions)} 笔交易：接受 {len(accepted)} 笔，"
+              f"拒绝 {len(transactions) - len(accepted)} 笔")
+        return results
+
+    def current_target(self) -> DifficultyTarget:
+        """下一个区块的难度目标"""
+        return self.retargeter.next_target(self.chain)
+
+    def verify_timestamp(self, block: Block, now: Optional[int] = None) -> bool:
+        """
+        校验新区块的时间戳（区块高度取 block.index，之前的区块须已在链上）
+
+        时间戳须晚于前面区块的中位时间，且不超过本地时间 + 允许的漂移，
+        否则矿工可以伪造时间戳拉长或缩短一轮的用时来操纵难度。
+        """
+        lower, upper = self.retargeter.timestamp_bounds(self.chain, block.index, now)
+        if block.timestamp <= lower:
+            print(f"❌ 区块 #{block.index} 的时间戳不晚于中位时间")
+            print(f"   中位时间: {lower}, 区块时间戳: {block.timestamp}")
+            return False
+        if block.timestamp > upper:
+            print(f"❌ 区块 #{block.index} 的时间戳超前本地时间过多")
+            print(f"   允许上限: {upper}, 区块时间戳: {block.timestamp}")
+            return False
+        return True
+
+    def verify_proof_of_work(self, block: Block) -> bool:
+        """
+        校验区块的工作量证明（区块高度取 block.index，之前的区块须已在链上）
+
+        版本 3 起区块携带的目标值必须等于难度调整计算出的目标，时间戳须通过 verify_timestamp；
+        旧版本区块沿用固定的十六进制前导 0 难度。
+        """
+        if block.version < BLOCK_VERSION_TARGET:
+            if block.hash[:self.difficulty] != '0' * self.difficulty:
+                print(f"❌ 区块 #{block.index} 的工作量证明无效")
+                print(f"   要求难度: {self.difficulty}")
+                print(f"   哈希前缀: {block.hash[:self.difficulty]}")
+                return False
+            return True
+
+        if not self.verify_timestamp(block):
+            return False
+
+        expected_target = self.retargeter.next_target(self.chain, block.index)
+        if block.bits != expected_target.to_compact():
+            print(f"❌ 区块 #{block.index} 的难度目标不正确")
+            print(f"   期望: {expected_target}")
+            print(f"   实际: bits=0x{(block.bits or 0):08x}")
+            return False
+
+        if not expected_target.is_met(block.hash):
+            print(f"❌ 区块 #{block.index} 的工作量证明无效")
+            print(f"   要求难度: {expected_target}")
+            print(f"   区块哈希: {block.hash[:20]}...")
+            return False
+        return True
+
+    @property
+    def pending_transactions(self) -> List[Transaction]:
+        """交易池中的交易（按到达顺序的副本，修改它不会影响交易池）"""
+        return self.mempool.transactions()
+
+    @pending_transactions.setter
+    def pending_transactions(self, transactions: List[Transaction]):
+        self.mempool.clear()
+        for tx in transactions:
+            self.mempool.add(tx, self.transaction_fee)
+
+    def pending_merkle_root(self, reward_transaction: Transaction) -> str:
+        """待处理交易（按到达顺序）加上奖励交易后的默克尔根，O(log n)"""
+        return self.mempool.merkle_root_with(reward_transaction)
+
+    def pending_outflow(self, address: str) -> float:
+        """地址在待处理交易中的支出（金额 + 手续费），O(1)"""
+        return self.mempool.outflow(address)
+
+    def record_dropped_transactions(self) -> int:
+        """
+        把被挤出或过期的交易移出后的状态写回数据库（每种状态一次批量更新），返回处理的数量
+
+        内存存储时只清空记录。
+        """
+        dropped = self.mempool.take_dropped()
+        if not dropped:
+            return 0
+        by_status: Dict[str, List[str]] = {}
+        for entry, status in dropped:
+            by_status.setdefault(status, []).append(entry.transaction.transaction_id)
+        for status, tx_hashes in by_status.items():
+            reason = "过期" if status == STATUS_EXPIRED else "手续费率过低被挤出"
+            print(f"⚠️  {len(tx_hashes)} 笔待处理交易因{reason}移出交易池")
+            if self.db and self.db.is_connected:
+                self.db.mark_transactions_status(tx_hashes, status)
+        return len(dropped)
+
+    def remove_pending_transactions(self, transactions: List[Transaction]) -> int:
+        """
+        把已被区块打包的交易移出交易池，返回移除的数量
+
+        挖矿期间新加入的交易和未被打包的交易继续留在池中。
+        """
+        return self.mempool.remove_transactions(transactions)
+
+    def abort_mining(self) -> bool:
+        """取消正在进行的挖矿（例如链上已出现同高度的新区块），返回是否有挖矿被取消"""
+        token = self.mining_cancel_token
+        if token is None or token.cancelled:
+            return False
+        token.cancel()
+        print("⏹️  正在取消当前挖矿...")
+        return True
+
+    def mine_pending_transactions(self, miner_address: str, cancel_token: Optional[CancellationToken] = None,
+                                  progress_callback: Optional[Callable[[MiningProgress], None]] = None,
+                                  mining_engine=None) -> bool:
+        """
+        按手续费率从交易池挑选交易（受区块大小上限限制）并挖矿
+
+        Args:
+            miner_address: 矿工地址
+            cancel_token: 取消令牌，未提供时内部创建，可通过 abort_mining() 取消
+            progress_callback: 挖矿进度回调
+            mining_engine: 本次使用的挖矿引擎（如 MiningPoolServer），默认使用 self.mining_engine
+
+        Returns:
+            区块成功加入区块链返回 True；无交易、被取消或保存失败返回 False
+        """
+        self.mempool.expire()
+        self.record_dropped_transactions()
+        if not self.mempool:
             print("没有待处理的交易，无需挖矿")
             return False
 
@@ -403,11 +957,21 @@ class Blockchain:
         print(f"{'=' * 60}")
         print(f"矿工地址: {miner_address}")
         print(f"挖矿奖励: {self.mining_reward}")
-        print(f"待处理交易数: {len(self.pending_transactions)}")
-        print(f"挖矿难度: {self.difficulty}")
-
-        total_fees = len(self.pending_transactions) * self.transaction_fee
+        print(f"待处理交易数: {len(self.mempool)}")
+        target = self.current_target()
+        print(f"挖矿难度: {target}")
+
+        # 先选出本次打包的交易，未选中的和挖矿期间新到达的交易留给下一个区块
+        template = self.block_template_builder.build(self.mempool)
+        if not template:
+            # 交易池中没有一笔交易放得进区块，不挖只含奖励的空块
+            print("⚠️  没有可以打包进区块的交易，停止挖矿")
+            return False
+        all_transactions = list(template.transactions)
+        total_fees = template.total_fees
         print(f"总手续费: {total_fees}")
+        if template.remaining:
+            print(f"区块已达上限，{template.remaining} 笔交易留待下一个区块")
 
         reward_transaction = Transaction(
             sender="0",
@@ -417,7 +981,10 @@ class Blockchain:
             data=f"Block reward and fees for mining block #{len(self.chain)}"
         )
 
-        all_transactions = self.pending_transactions.copy()
+        # 选中了交易池中全部交易且交易池没有变化时，直接用增量默克尔树得到默克尔根
+        merkle_root = None
+        if template.includes_all and len(self.mempool) == len(all_transactions):
+            merkle_root = self.pending_merkle_root(reward_transaction)
         all_transactions.append(reward_transaction)
 
         print(f"打包交易总数: {len(all_transactions)}")
@@ -427,16 +994,40 @@ class Blockchain:
         for i, tx in enumerate(all_transactions):
             print(f"  [{i}] {tx.sender} -> {tx.receiver}: {tx.amount}, TxID: {tx.transaction_id[:20]}...")
 
+        # 时间戳须晚于中位时间（同一秒内连续出块时顺延）
+        median_time = self.retargeter.median_time_past(self.chain)
         new_block = Block(
             index=len(self.chain),
             transactions=all_transactions,
-            previous_hash=self.get_latest_block().hash
+            previous_hash=self.get_latest_block().hash,
+            timestamp=max(Utils.get_current_timestamp(), median_time + 1),
+            bits=target.to_compact(),
+            merkle_root=merkle_root
         )
 
         print(f"\n开始计算工作量证明...")
+        cancel_token = cancel_token or CancellationToken()
+        self.mining_cancel_token = cancel_token
+        mining_engine = mining_engine or self.mining_engine
         start_time = time.time()
-        new_block.mine_block(self.difficulty)
+        try:
+            if mining_engine:
+                found = mining_engine.mine(new_block, target, cancel_token, progress_callback).found
+            else:
+                found = new_block.mine_block(target, cancel_token, progress_callback)
+        finally:
+            self.mining_cancel_token = None
         mining_time = time.time() - start_time
+
+        if not found:
+            print("❌ 挖矿未完成（已取消）")
+            return False
+
+        # 挖矿期间链上可能已经接受了其他节点的区块，此时本区块已成孤块
+        if self.get_latest_block().hash != new_block.previous_hash:
+            print("⚠️  挖矿期间区块链已更新，丢弃过期区块")
+            return False
+
         print(f"挖矿耗时: {mining_time:.2f}秒")
         
         # 🔥 关键修复：挖矿后再次打印哈希，确认没有变化
@@ -449,12 +1040,14 @@ class Blockchain:
                 # 🔥 关键：保存区块时使用new_block.hash（已挖矿的哈希）
                 block_data = {
                     'number': new_block.index,
+                    'version': new_block.version,
                     'hash': new_block.hash,  # 🔥 这个哈希是挖矿后的
                     'previous_hash': new_block.previous_hash,
                     'timestamp': new_block.timestamp,
-                    'difficulty': self.difficulty,
+                    'difficulty': int(target.zero_bits) // 4,
+                    'target_bits': new_block.bits,
                     'nonce': new_block.nonce,
-                    'merkle_root': new_block.merkle_tree.get_root(),
+                    'merkle_root': new_block.merkle_root,
                     'transaction_count': len(all_transactions),
                     'miner_address': miner_address,
                     'block_size': len(json.dumps([tx.to_dict() for tx in all_transactions]))
@@ -513,6 +1106,14 @@ class Blockchain:
                     self.db.update_address_balance(miner_address, self.mining_reward + total_fees, 'add')
                     print(f"✅ 矿工 {miner_address} 获得奖励: {self.mining_reward + total_fees}")
 
+                    stakes, votes = governance_records(all_transactions)
+                    self.db.record_stakes(stakes)
+                    self.db.record_votes(votes)
+
+                    if new_block.index == self.persisted_height + 1:
+                        self.persisted_height = new_block.index
+                    self.save_state_snapshot_if_due()
+
                 else:
                     print("❌ 保存区块到数据库失败")
 
@@ -521,9 +1122,10 @@ class Blockchain:
                 import traceback
                 traceback.print_exc()
                 self.chain.pop()
+                self.persisted_height = min(self.persisted_height, len(self.chain) - 1)
                 return False
 
-        self.pending_transactions = []
+        self.remove_pending_transactions(all_transactions)
 
         print(f"\n{'=' * 60}")
         print("挖矿完成！")
@@ -549,117 +1151,326 @@ class Blockchain:
             try:
                 db_balance = self.db.get_address_balance(address)
                 if db_balance is not None:
-                    pending_sent = 0.0
-                    for tx in self.pending_transactions:
-                        if tx.sender == address:
-                            pending_sent += tx.amount + self.transaction_fee
-
-                    return max(0, db_balance - pending_sent)
+                    return max(0, db_balance - self.pending_outflow(address))
             except Exception as e:
                 print(f"从数据库查询余额失败，使用本地计算: {e}")
 
-        for block in self.chain:
-            for transaction in block.transactions:
-                if transaction.receiver == address:
-                    balance += transaction.amount
-                if transaction.sender == address and transaction.sender != "0":
-                    balance -= transaction.amount
-
-        for transaction in self.pending_transactions:
-            if transaction.sender == address:
-                balance -= transaction.amount + self.transaction_fee
+        balance += self.get_account_state().balance(address)
+        balance -= self.pending_outflow(address)
 
         return round(balance, 8)
 
-    def verify_transaction_signature(self, transaction: Transaction, signature: str) -> bool:
-        try:
-            return True
-        except Exception as e:
-            print(f"验证签名时出错: {e}")
+    def get_account_state(self) -> AccountStateIndex:
+        """返回与当前链同步的账户状态索引"""
+        self.account_state.sync(self.chain)
+        return self.account_state
+
+    def get_rich_list(self, limit: int = 10) -> List[Dict]:
+        """
+        按链上余额排序的富豪榜（进程内维护，不查询余额表）
+
+        余额与 get_balance 的规则相同（发送方扣除手续费），不含系统地址 "0" 和 genesis 账户。
+
+        Returns:
+            与 BuptCoinDatabase.get_rich_list 相同格式的列表：
+            [{'address', 'nickname', 'balance', 'owner_name'}, ...]
+        """
+        top = self.get_account_state().rich_list.top_k(limit)
+
+        missing = [address for address, _ in top if address not in self._address_labels]
+        if missing and self.db and self.db.is_connected:
+            labels = self.db.get_address_labels(missing)
+            for address in missing:
+                self._address_labels[address] = labels.get(address, {'nickname': None, 'owner_name': None})
+
+        rich_list = []
+        for address, balance in top:
+            label = self._address_labels.get(address, {'nickname': None, 'owner_name': None})
+            rich_list.append({
+                'address': address,
+                'nickname': label['nickname'] or address[:10] + "...",
+                'balance': round(balance, 8),
+                'owner_name': label['owner_name']
+            })
+        return rich_list
+
+    def get_address_rank(self, address: str) -> Optional[int]:
+        """地址在富豪榜上的排名（从 1 开始），余额不为正时返回 None"""
+        return self.get_account_state().rich_list.rank(address)
+
+    def get_governance(self) -> GovernanceAggregates:
+        """返回与当前链同步的质押与投票统计"""
+        self.governance.sync(self.chain)
+        return self.governance
+
+    def get_balance_history(self) -> BalanceHistory:
+        """返回与当前链同步的历史余额索引"""
+        self.balance_history.sync(self.chain)
+        return self.balance_history
+
+    def get_balance_at(self, address: str, height: int) -> float:
+        """地址在区块 #height 之后的链上余额"""
+        return self.get_balance_history().balance_at(address, height)
+
+    def get_balance_range(self, address: str, start: int, end: int) -> Dict:
+        """地址在区块高度 [start, end] 内的余额变化，见 BalanceHistory.balance_range"""
+        return self.get_balance_history().balance_range(address, start, end)
+
+    def save_state_snapshot_if_due(self) -> bool:
+        """链长度达到快照间隔的整数倍时保存状态快照"""
+        if not self.chain or len(self.chain) % self.snapshot_interval:
             return False
+        return self.save_state_snapshot()
 
-    def get_latest_block(self) -> Block:
-        return self.chain[-1] if self.chain else None
-
-    def is_chain_valid(self) -> bool:
-        print("\n" + "="*60)
-        print("正在验证区块链...")
-        print("="*60)
-
-        if len(self.chain) == 0:
-            print("区块链为空")
+    def save_state_snapshot(self) -> bool:
+        """把链尾处的账户状态和合约状态保存为快照（链尾及之前的区块须已全部保存到数据库）"""
+        if not (self.db and self.db.is_connected) or not self.chain:
+            return False
+        if self.get_latest_block().index > self.persisted_height:
+            # 快照之前的区块重启后无法从数据库加载，快照也就无法使用
+            return False
+        snapshot = StateSnapshot.capture(self.get_latest_block(), self.get_account_state(), self.contract_manager,
+                                         self.get_governance())
+        if self.db.save_state_snapshot(snapshot.to_record()):
+            print(f"✅ 已保存状态快照: {snapshot}")
             return True
-
-        genesis_block = self.chain[0]
-        if genesis_block.index != 0:
-            print(f"❌ 错误：创世区块索引应为0，实际为{genesis_block.index}")
-            print(f"\n🔍 诊断信息：")
-            print(f"   区块链总数: {len(self.chain)}")
-            print(f"   第一个区块索引: {genesis_block.index}")
-            print(f"   第一个区块哈希: {genesis_block.hash[:20]}...")
-            print(f"\n💡 解决方案：删除数据库重新开始！")
-            print(f"   cd D:\\pyqt5\\BuptCoin")
-            print(f"   del buptcoin.db")
-            print(f"   python BuptCoin/main.py\n")
+        return False
+
+    def read_state_snapshot(self, max_height: Optional[int] = None) -> Optional[StateSnapshot]:
+        """读取不超过 max_height 的最新状态快照，不存在、无法解析或摘要不符时返回 None"""
+        if not (self.db and self.db.is_connected):
+            return None
+        record = self.db.get_latest_state_snapshot(max_height)
+        if not record:
+            return None
+        try:
+            snapshot = StateSnapshot.from_record(record)
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"⚠️ 状态快照 #{record.get('block_number')} 无法解析: {e}")
+            return None
+        if not snapshot.is_valid():
+            print(f"⚠️ 状态快照 #{snapshot.height} 摘要不匹配，忽略")
+            return None
+        return snapshot
+
+    def restore_state_snapshot(self, snapshot: Optional[StateSnapshot] = None) -> bool:
+        """
+        从状态快照恢复账户状态、合约状态和治理统计，只重放快照之后的区块
+
+        未给出 snapshot 时读取不超过链尾的最新快照。
+        没有可用快照（不存在、摘要不符或与当前链不一致）时从头重建账户状态
+        （只恢复了区块头的区块此时会加载全部交易）。
+
+        Returns:
+            是否使用了快照
+        """
+        if snapshot is None and self.chain:
+            snapshot = self.read_state_snapshot(len(self.chain) - 1)
+
+        if snapshot is not None:
+            if snapshot.height >= len(self.chain) or self.chain[snapshot.height].hash != snapshot.block_hash:
+                print(f"⚠️ 状态快照 #{snapshot.height} 与当前区块链不一致，忽略")
+            else:
+                self.account_state.restore(snapshot.accounts, snapshot.height + 1, snapshot.block_hash)
+                self.contract_manager.restore_state(snapshot.contracts)
+                self.governance.restore(snapshot.governance, snapshot.height + 1, snapshot.block_hash)
+                self.account_state.sync(self.chain)
+                self.governance.sync(self.chain)
+                replayed = len(self.chain) - snapshot.height - 1
+                print(f"✅ 从状态快照 #{snapshot.height} 恢复，重放了 {replayed} 个区块")
+                return True
+
+        self.account_state.rebuild(self.chain)
+        return False
+
+    def fetch_confirmed_transactions(self, first_block: int = 0,
+                                     last_block: Optional[int] = None) -> Dict[int, List[Transaction]]:
+        """一次查出高度在 [first_block, last_block] 内的已确认交易，按区块高度分组"""
+        query = '''
+        SELECT * FROM transactions 
+        WHERE block_number >= %s AND status = 'confirmed'
+        '''
+        params = [first_block]
+        if last_block is not None:
+            query += ' AND block_number <= %s'
+            params.append(last_block)
+        query += ' ORDER BY block_number ASC, timestamp ASC, id ASC'
+
+        cursor = self.db.connection.cursor(dictionary=True)
+        cursor.execute(query, tuple(params))
+        transactions_by_block: Dict[int, List[Transaction]] = {}
+        for tx_data in cursor.fetchall():
+            # 数据库中的数据视为可信，直接使用存储的transaction_hash，不重新计算
+            tx = Transaction.from_stored(
+                sender=tx_data['from_address'],
+                receiver=tx_data['to_address'],
+                amount=float(tx_data['amount']),
+                transaction_type=tx_data['transaction_type'],
+                data=tx_data.get('data', ''),
+                timestamp=tx_data['timestamp'],
+                transaction_id=tx_data['transaction_hash'],
+                signature=tx_data.get('signature'),
+                block_number=tx_data['block_number'],
+                status=tx_data['status']
+            )
+            transactions_by_block.setdefault(tx_data['block_number'], []).append(tx)
+        cursor.close()
+        return transactions_by_block
+
+    def load_archived_transactions(self, height: int) -> List[Transaction]:
+        """
+        为只恢复了区块头的区块加载交易（Block.transactions 第一次被访问时调用）
+
+        需要旧区块交易的场景（整链校验、重建索引）通常会遍历全部旧区块，
+        因此一次查出所有尚未加载的区块的交易，而不是逐个区块查询。
+        """
+        archived = [block for block in self.chain if not block.is_loaded]
+        if not archived:
+            return []
+        print(f"正在从数据库加载 {len(archived)} 个历史区块的交易...")
+        transactions_by_block = self.fetch_confirmed_transactions(archived[0].index, archived[-1].index)
+        for block in archived:
+            block.transactions = transactions_by_block.get(block.index, [])
+        return transactions_by_block.get(height, [])
+
+    def get_chain_columns(self) -> ChainColumns:
+        """
+        返回与当前链同步的列式交易存储（只追加新区块）
+
+        列存覆盖全链，第一次调用时会加载快照之前只恢复了区块头的历史区块。
+        """
+        self._chain_columns.sync(self.chain)
+        return self._chain_columns
+
+    def get_recent_transactions(self, limit: int = 20) -> List[Transaction]:
+        """
+        最近确认的 limit 笔交易：从链尾向前取区块，区块内按时间戳倒序
+
+        只读取链尾的几个区块，不会加载快照之前只恢复了区块头的历史区块。
+        """
+        transactions = []
+        for block in reversed(self.chain):
+            if len(transactions) >= limit:
+                break
+            transactions.extend(sorted(block.transactions, key=lambda tx: tx.timestamp, reverse=True))
+        return transactions[:max(0, limit)]
+
+    def register_public_key(self, address: str, public_key: str) -> bool:
+        """
+        登记地址的公钥（内存存储时由钱包登记，数据库存储时从 wallet_addresses 读取）
+
+        地址必须由该公钥导出（钱包生成的 0x 地址或数据库创建的 BPC_ 地址），否则拒绝登记。
+        """
+        key_hash = hashlib.sha256(public_key.encode()).hexdigest()[:40]
+        if address not in (f"0x{key_hash}", f"BPC_{key_hash}"):
+            print(f"❌ 公钥与地址 {address} 不匹配，拒绝登记")
             return False
-        
-        if genesis_block.previous_hash != "0" * 64:
-            print(f"❌ 错误：创世区块的前驱哈希格式错误")
+        self._public_keys[address] = public_key
+        return True
+
+    def get_public_keys(self, addresses: List[str]) -> Dict[str, str]:
+        """一组地址的公钥，未缓存的地址一次查询数据库；找不到公钥的地址不在结果中"""
+        missing = [address for address in set(addresses) if address not in self._public_keys]
+        if missing and self.db and self.db.is_connected:
+            self._public_keys.update(self.db.get_public_keys(missing))
+        return {address: self._public_keys[address] for address in addresses if address in self._public_keys}
+
+    def verify_transaction_signature(self, transaction: Transaction, signature: str) -> bool:
+        """用发送方登记的公钥验证交易签名"""
+        public_key = self.get_public_keys([transaction.sender]).get(transaction.sender)
+        if public_key is None:
+            print(f"❌ 找不到发送方 {transaction.sender} 的公钥")
             return False
+        return self.signature_verifier.verify(transaction.signing_payload(), signature, public_key,
+                                              transaction.transaction_id)
+
+    def verify_transaction_signatures(self, transactions: List[Transaction],
+                                      signatures: List[str]) -> List[bool]:
+        """批量验证签名（多进程，已验证过的直接命中缓存），结果与 transactions 一一对应"""
+        if not transactions:
+            return []
+        public_keys = self.get_public_keys([tx.sender for tx in transactions])
+        return self.signature_verifier.verify_batch(
+            [(tx.signing_payload(), signature, public_keys.get(tx.sender))
+             for tx, signature in zip(transactions, signatures)],
+            [tx.transaction_id for tx in transactions]
+        )
 
-        print(f"✅ 创世区块验证通过 (索引: {genesis_block.index})")
+    def allows_unsigned(self, height: int) -> bool:
+        """该高度的区块是否允许包含未签名的非系统交易（仅限打开开关后从数据库加载的旧区块）"""
+        return self.allow_unsigned_legacy and height <= self.legacy_unsigned_height
 
-        for i in range(1, len(self.chain)):
-            current_block = self.chain[i]
-            previous_block = self.chain[i - 1]
+    def verify_block_signatures(self, block: Block) -> bool:
+        """
+        验证区块中所有非系统交易的签名，缺少签名即无效（allows_unsigned 的旧区块除外）
 
-            print(f"\n检查区块 #{current_block.index}...")
-            
-            # 🔥 调试信息：打印区块的交易transaction_id
-            print(f"  区块 #{current_block.index} 包含 {len(current_block.transactions)} 笔交易：")
-            for j, tx in enumerate(current_block.transactions):
-                print(f"    [{j}] TxID: {tx.transaction_id[:20]}...")
-
-            if current_block.index != previous_block.index + 1:
-                print(f"❌ 错误：区块索引不连续")
-                print(f"   前一个区块: #{previous_block.index}")
-                print(f"   当前区块: #{current_block.index}")
+        进入交易池时已验证过的交易命中缓存，不再重复 RSA 运算。
+        """
+        signed = []
+        for tx in block.transactions:
+            if tx.sender == "0":
+                continue
+            if tx.signature:
+                signed.append(tx)
+            elif not self.allows_unsigned(block.index):
+                print(f"❌ 区块 #{block.index} 中交易 {tx.transaction_id[:20]}... 缺少签名")
                 return False
-
-            if current_block.previous_hash != previous_block.hash:
-                print(f"❌ 错误：区块 #{current_block.index} 的前驱哈希不匹配")
-                print(f"   期望: {previous_block.hash[:20]}...")
-                print(f"   实际: {current_block.previous_hash[:20]}...")
+        # 缓存以 transaction_id 为键，ID 必须与交易内容一致命中才有意义
+        for tx in signed:
+            if not tx.has_valid_id():
+                print(f"❌ 区块 #{block.index} 中交易 {tx.transaction_id[:20]}... 的ID与内容不符")
                 return False
-
-            original_hash = current_block.hash
-            calculated_hash = current_block.calculate_hash()
-            
-            if original_hash != calculated_hash:
-                print(f"❌ 错误：区块 #{current_block.index} 的哈希值不匹配（可能被篡改）")
-                print(f"   存储的哈希: {original_hash[:20]}...")
-                print(f"   计算的哈希: {calculated_hash[:20]}...")
-                print(f"   Nonce: {current_block.nonce}")
-                print(f"\n💡 解决方案：删除数据库重新开始！")
-                print(f"   cd D:\\pyqt5\\BuptCoin")
-                print(f"   del buptcoin.db")
+        results = self.verify_transaction_signatures(signed, [tx.signature for tx in signed])
+        for tx, valid in zip(signed, results):
+            if not valid:
+                print(f"❌ 区块 #{block.index} 中交易 {tx.transaction_id[:20]}... 的签名无效")
                 return False
+        return True
 
-            if current_block.hash[:self.difficulty] != '0' * self.difficulty:
-                print(f"❌ 错误：区块 #{current_block.index} 的工作量证明无效")
-                print(f"   要求难度: {self.difficulty}")
-                print(f"   哈希前缀: {current_block.hash[:self.difficulty]}")
-                return False
+    def get_transaction_proof(self, transaction_id: str) -> Optional[Dict]:
+        """
+        为已确认交易生成包含证明（供轻客户端使用）
+
+        Returns:
+            默克尔证明（含叶子总数 leaf_count）加上所在区块的高度和哈希，未找到返回 None
+        """
+        for block in reversed(self.chain):
+            proof = block.get_transaction_proof(transaction_id)
+            if proof:
+                proof['block_number'] = block.index
+                proof['block_hash'] = block.hash
+                return proof
+        return None
+
+    def get_latest_block(self) -> Block:
+        return self.chain[-1] if self.chain else None
+
+    def validate_chain(self, verbose: bool = False) -> ChainValidationReport:
+        """并行校验整条链，返回结构化报告（见 chain_validator.py）"""
+        return self.chain_validator.validate(self, verbose)
 
-            print(f"✅ 区块 #{current_block.index} 验证通过")
-            print(f"   哈希: {current_block.hash[:20]}...")
-            print(f"   Nonce: {current_block.nonce}")
-            print(f"   交易数: {len(current_block.transactions)}")
+    def is_chain_valid(self, verbose: bool = False) -> bool:
+        """
+        校验整条链是否有效
 
+        Args:
+            verbose: 是否逐块输出校验结果，默认只输出汇总
+        """
         print("\n" + "="*60)
-        print("✅ 区块链验证完全通过！所有区块都是有效的！")
+        print("正在验证区块链...")
+        print("="*60)
+
+        report = self.validate_chain(verbose)
+        print(report.summary())
+        if not report.valid:
+            print(f"\n💡 解决方案：删除数据库重新开始！")
+            return False
+
+        timings = report.timings
         print(f"   总区块数: {len(self.chain)}")
-        print(f"   难度: {self.difficulty}")
+        print(f"   当前难度: {self.current_target()}")
+        print(f"   耗时: 顺序检查 {timings['sequential']:.3f}秒, 区块检查 {timings['blocks']:.3f}秒, "
+              f"签名检查 {timings['signatures']:.3f}秒")
         print("="*60 + "\n")
         return True
 
@@ -668,6 +1479,7 @@ class Blockchain:
             'chain': [block.to_dict() for block in self.chain],
             'pending_transactions': [tx.to_dict() for tx in self.pending_transactions],
             'difficulty': self.difficulty,
+            'target_bits': self.current_target().to_compact(),
             'mining_reward': self.mining_reward,
             'transaction_fee': self.transaction_fee
         }
@@ -678,8 +1490,8 @@ class Blockchain:
         print("=" * 60)
 
         print(f"区块总数: {len(self.chain)}")
-        print(f"待处理交易数: {len(self.pending_transactions)}")
-        print(f"挖矿难度: {self.difficulty}")
+        print(f"待处理交易数: {len(self.mempool)}")
+        print(f"挖矿难度: {self.current_target()}")
         print(f"挖矿奖励: {self.mining_reward}")
         print(f"交易手续费: {self.transaction_fee}")
 
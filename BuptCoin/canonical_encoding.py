@@ -0,0 +1,83 @@
+# canonical_encoding.py - 交易与区块头的规范二进制编码
+"""
+规范二进制编码
+用固定字段顺序、长度前缀字符串和定宽整数代替 json.dumps(sort_keys=True)，
+编码结果只取决于字段值本身，可直接作为哈希输入。
+"""
+
+import struct
+from typing import Optional
+
+# 交易编码格式版本，写在每笔交易编码的第一个字节
+TRANSACTION_ENCODING_VERSION = 1
+
+# 区块格式版本
+# 1: 旧格式，对整个区块（含全部交易）做 JSON 哈希
+# 2: 区块头格式，只通过默克尔根承诺交易，挖矿时可复用区块头前缀的哈希中间状态
+# 3: 区块头额外包含紧凑格式难度目标 bits，难度按出块时间动态调整
+# 4: 默克尔树父节点直接哈希两个 32 字节摘要（之前为十六进制字符串拼接）
+BLOCK_VERSION_LEGACY = 1
+BLOCK_VERSION_HEADER = 2
+BLOCK_VERSION_TARGET = 3
+BLOCK_VERSION_MERKLE = 4
+CURRENT_BLOCK_VERSION = BLOCK_VERSION_MERKLE
+
+# 金额以 1e-8 BPC 为单位编码为定宽整数，与数据库 DECIMAL(18, 8) 精度一致
+AMOUNT_SCALE = 100_000_000
+
+_UINT8 = struct.Struct('>B')
+_UINT32 = struct.Struct('>I')
+_INT64 = struct.Struct('>q')
+# 区块头前缀: version(4) + index(8) + timestamp(8) + previous_hash(32) + merkle_root(32)
+_BLOCK_HEADER_PREFIX = struct.Struct('>IQQ32s32s')
+# 带难度目标的区块头前缀: 在上面的基础上追加紧凑格式目标值 bits(4)
+_BLOCK_HEADER_PREFIX_WITH_BITS = struct.Struct('>IQQ32s32sI')
+
+
+class CanonicalEncoder:
+    """交易和区块头的规范编码器"""
+
+    @staticmethod
+    def encode_string(value: Optional[str]) -> bytes:
+        """长度前缀字符串: uint32 字节长度 + UTF-8 内容"""
+        raw = (value or "").encode('utf-8')
+        return _UINT32.pack(len(raw)) + raw
+
+    @staticmethod
+    def encode_amount(amount: float) -> bytes:
+        """金额编码为 int64（单位 1e-8）"""
+        return _INT64.pack(int(round(amount * AMOUNT_SCALE)))
+
+    @staticmethod
+    def encode_transaction(sender: str, receiver: str, amount: float, transaction_type: str,
+                           data: str, timestamp: int) -> bytes:
+        """
+        交易编码，字段顺序固定:
+        version | type | sender | receiver | amount | timestamp | data
+        """
+        encode_string = CanonicalEncoder.encode_string
+        return b''.join((
+            _UINT8.pack(TRANSACTION_ENCODING_VERSION),
+            encode_string(transaction_type),
+            encode_string(sender),
+            encode_string(receiver),
+            CanonicalEncoder.encode_amount(amount),
+            _INT64.pack(int(timestamp)),
+            encode_string(data)
+        ))
+
+    @staticmethod
+    def encode_block_header_prefix(version: int, index: int, timestamp: int,
+                                   previous_hash: str, merkle_root: str,
+                                   bits: Optional[int] = None) -> bytes:
+        """区块头中除 nonce 外的部分，哈希值以 32 字节原始形式编码；bits 为 None 时不编码目标值"""
+        fields = (
+            version,
+            index,
+            timestamp,
+            bytes.fromhex(previous_hash),
+            bytes.fromhex(merkle_root) if merkle_root else bytes(32)
+        )
+        if bits is None:
+            return _BLOCK_HEADER_PREFIX.pack(*fields)
+        return _BLOCK_HEADER_PREFIX_WITH_BITS.pack(*fields, bits)
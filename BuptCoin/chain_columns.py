@@ -0,0 +1,223 @@
+# chain_columns.py - 区块链交易的列式存储与聚合查询
+"""
+列式交易存储
+把链上所有交易按列保存在紧凑数组中（金额、时间戳、类型编码、发送方 ID、接收方 ID、
+区块高度），随区块追加增量更新。
+按地址 / 类型 / 时间段的金额统计不再逐块遍历全链，而是对整列做分组求和、Top-K、时间范围过滤。
+安装了 NumPy 时使用向量化计算，否则退回纯 Python 实现，结果相同。
+"""
+
+import heapq
+from array import array
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+from address_registry import address_registry
+
+try:
+    import numpy as np
+
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# sum_by / top_k 支持的分组键
+GROUP_KEYS = ('sender', 'receiver')
+
+
+def _int_dtype(column: array):
+    """与 array('l') 元素宽度一致的 NumPy 整数类型（平台相关）"""
+    return np.int64 if column.itemsize == 8 else np.int32
+
+
+class ChainColumns:
+    """链上交易的列式副本"""
+
+    def __init__(self):
+        self.amounts = array('d')
+        self.timestamps = array('q')
+        self.type_codes = array('B')
+        # 地址列直接保存全局地址表的 ID
+        self.sender_ids = array('l')
+        self.receiver_ids = array('l')
+        self.heights = array('l')
+
+        # 交易类型的字符串 <-> 整数编码
+        self._type_codes: Dict[str, int] = {}
+        self._types: List[str] = []
+
+        # 第 h 个区块的第一行下标和区块哈希
+        self._block_offsets: List[int] = []
+        self._block_hashes: List[str] = []
+
+    # ==================== 编码 ====================
+
+    def _encode_type(self, tx_type: str) -> int:
+        code = self._type_codes.get(tx_type)
+        if code is None:
+            code = len(self._types)
+            self._type_codes[tx_type] = code
+            self._types.append(tx_type)
+        return code
+
+    # ==================== 追加与同步 ====================
+
+    @property
+    def row_count(self) -> int:
+        return len(self.amounts)
+
+    @property
+    def block_count(self) -> int:
+        return len(self._block_offsets)
+
+    def append_block(self, block) -> None:
+        """把一个区块的交易追加到各列"""
+        self._block_offsets.append(len(self.amounts))
+        height = block.index
+        for tx in block.transactions:
+            self.amounts.append(float(tx.amount))
+            self.timestamps.append(int(tx.timestamp))
+            self.type_codes.append(self._encode_type(tx.transaction_type))
+            self.sender_ids.append(tx.sender_id)
+            self.receiver_ids.append(tx.receiver_id)
+            self.heights.append(height)
+        self._block_hashes.append(block.hash)
+
+    def truncate(self, block_count: int) -> None:
+        """只保留前 block_count 个区块（区块被回滚时使用）"""
+        if block_count >= self.block_count:
+            return
+        row_count = self._block_offsets[block_count]
+        for column in (self.amounts, self.timestamps, self.type_codes, self.sender_ids,
+                       self.receiver_ids, self.heights):
+            del column[row_count:]
+        del self._block_offsets[block_count:]
+        del self._block_hashes[block_count:]
+
+    def sync(self, chain: List) -> None:
+        """
+        与区块链保持一致：只追加新区块；链变短或区块被替换（分叉）时回滚到与链相同的前缀后重新追加
+
+        每次查询前调用，链未变化时是 O(1)。回滚只比较区块哈希，不读取交易。
+        """
+        synced = min(self.block_count, len(chain))
+        while synced and chain[synced - 1].hash != self._block_hashes[synced - 1]:
+            synced -= 1
+        self.truncate(synced)
+        for block in chain[synced:]:
+            self.append_block(block)
+
+    def locate(self, row: int) -> Tuple[int, int]:
+        """行号 -> (区块高度位置, 区块内交易下标)"""
+        block_position = bisect_right(self._block_offsets, row) - 1
+        return block_position, row - self._block_offsets[block_position]
+
+    # ==================== 过滤 ====================
+
+    def _column(self, key: str) -> array:
+        if key == 'sender':
+            return self.sender_ids
+        if key == 'receiver':
+            return self.receiver_ids
+        raise ValueError(f"不支持的分组键: {key}，可选: {', '.join(GROUP_KEYS)}")
+
+    def _type_code(self, tx_type: Optional[str]) -> Optional[int]:
+        """交易类型编码；类型从未出现过时返回 -1（不匹配任何行）"""
+        if tx_type is None:
+            return None
+        return self._type_codes.get(tx_type, -1)
+
+    def _np_mask(self, tx_type: Optional[str], start: Optional[int], end: Optional[int]):
+        """NumPy 布尔掩码（None 表示全部行）"""
+        mask = None
+        code = self._type_code(tx_type)
+        if code is not None:
+            mask = np.frombuffer(self.type_codes, dtype=np.uint8) == code
+        if start is not None or end is not None:
+            timestamps = np.frombuffer(self.timestamps, dtype=np.int64)
+            time_mask = np.ones(len(timestamps), dtype=bool)
+            if start is not None:
+                time_mask &= timestamps >= start
+            if end is not None:
+                time_mask &= timestamps < end
+            mask = time_mask if mask is None else mask & time_mask
+        return mask
+
+    def _py_rows(self, tx_type: Optional[str], start: Optional[int], end: Optional[int]):
+        """纯 Python 实现：满足条件的行号"""
+        code = self._type_code(tx_type)
+        type_codes = self.type_codes
+        timestamps = self.timestamps
+        for row in range(len(type_codes)):
+            if code is not None and type_codes[row] != code:
+                continue
+            if start is not None and timestamps[row] < start:
+                continue
+            if end is not None and timestamps[row] >= end:
+                continue
+            yield row
+
+    def rows_in_range(self, start: Optional[int] = None, end: Optional[int] = None,
+                      tx_type: Optional[str] = None) -> List[int]:
+        """时间范围 [start, end) 内（可再按类型过滤）的行号"""
+        if NUMPY_AVAILABLE:
+            mask = self._np_mask(tx_type, start, end)
+            if mask is None:
+                return list(range(self.row_count))
+            return np.flatnonzero(mask).tolist()
+        return list(self._py_rows(tx_type, start, end))
+
+    # ==================== 聚合 ====================
+
+    def sum_by(self, key: str, tx_type: Optional[str] = None, start: Optional[int] = None,
+               end: Optional[int] = None) -> Dict[str, float]:
+        """
+        按发送方 / 接收方分组对金额求和
+
+        Args:
+            key: 'sender' 或 'receiver'
+            tx_type: 只统计该类型的交易
+            start, end: 只统计时间戳在 [start, end) 内的交易
+        """
+        ids_column = self._column(key)
+        name_count = len(address_registry)
+        if not name_count or not self.row_count:
+            return {}
+
+        if NUMPY_AVAILABLE:
+            ids = np.frombuffer(ids_column, dtype=_int_dtype(ids_column))
+            amounts = np.frombuffer(self.amounts, dtype=np.float64)
+            mask = self._np_mask(tx_type, start, end)
+            if mask is not None:
+                ids, amounts = ids[mask], amounts[mask]
+            totals = np.bincount(ids, weights=amounts, minlength=name_count)
+            present = np.flatnonzero(np.bincount(ids, minlength=name_count))
+            return {address_registry.address(i): float(totals[i]) for i in present}
+
+        totals: Dict[int, float] = {}
+        amounts = self.amounts
+        for row in self._py_rows(tx_type, start, end):
+            group = ids_column[row]
+            totals[group] = totals.get(group, 0.0) + amounts[row]
+        return {address_registry.address(group): total for group, total in totals.items()}
+
+    def top_k(self, k: int, key: str, tx_type: Optional[str] = None, start: Optional[int] = None,
+              end: Optional[int] = None) -> List[Tuple[str, float]]:
+        """分组求和后金额最大的 k 组，按金额降序"""
+        totals = self.sum_by(key, tx_type, start, end)
+        return heapq.nlargest(k, totals.items(), key=lambda item: item[1])
+
+    def latest_rows(self, k: int) -> List[int]:
+        """时间戳最新的 k 行（按时间戳降序）"""
+        if k <= 0 or not self.row_count:
+            return []
+        if NUMPY_AVAILABLE:
+            timestamps = np.frombuffer(self.timestamps, dtype=np.int64)
+            if k < len(timestamps):
+                candidates = np.argpartition(timestamps, len(timestamps) - k)[-k:]
+            else:
+                candidates = np.arange(len(timestamps))
+            order = candidates[np.argsort(-timestamps[candidates], kind='stable')]
+            return order.tolist()
+        timestamps = self.timestamps
+        return heapq.nlargest(k, range(len(timestamps)), key=timestamps.__getitem__)
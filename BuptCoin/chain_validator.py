@@ -0,0 +1,289 @@
+# chain_validator.py - 区块链并行校验
+"""
+区块链并行校验
+整链校验分三步：
+1. 顺序检查：创世区块、区块索引连续、previous_hash 衔接、时间戳晚于中位时间，
+   并按难度调整规则算出每个区块应有的目标值（这些检查依赖前面的区块，只能按顺序进行，但每个区块只需 O(1)）
+2. 并行检查：交易 ID、默克尔根（总是由交易重新计算，再与区块头中的值比对）、区块哈希、工作量证明，
+   各区块互不依赖，以基本类型元组分块交给常驻进程池
+3. 签名检查：整条链的签名一次性批量验证（见 signature_verifier.py，已验证过的直接命中缓存）
+
+结果汇总为 ChainValidationReport：是否有效、第一个无效区块的高度和原因、各步耗时。
+除非 verbose，校验过程不逐块输出。
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+# 工作进程只导入以下纯计算模块；blockchain 会导入 database 并在模块级连接数据库，
+# 在 spawn 方式启动的工作进程中导入它可能阻塞，因此校验逻辑不依赖 Block / Transaction
+from canonical_encoding import (BLOCK_VERSION_HEADER, BLOCK_VERSION_MERKLE, BLOCK_VERSION_TARGET,
+                                CanonicalEncoder)
+from difficulty import DifficultyTarget
+from merkle_tree import MerkleTree
+from mining import make_nonce_hasher
+from utils import Utils
+
+# 工作进程收到的区块只包含基本类型，避免依赖父进程的地址表 ID
+# (version, index, timestamp, previous_hash, nonce, bits, hash, 区块头中的默克尔根, 交易元组列表, 工作量要求)
+# 区块头中的默克尔根：数据库存储或区块创建时得到的值，旧数据没有记录时为 None
+# 工作量要求：版本 3 之前为十六进制前导 0 个数，之后为难度调整算出的紧凑格式目标
+BlockJob = Tuple
+# 交易元组：(sender, receiver, amount, type, data, timestamp, transaction_id, signature, block_number, status)
+TransactionRow = Tuple
+# 工作进程返回：(区块高度, 失败原因或 None, 耗时秒)
+BlockResult = Tuple[int, Optional[str], float]
+
+class ChainValidationReport:
+    """整链校验结果"""
+
+    def __init__(self, block_count: int, workers: int):
+        self.block_count = block_count
+        self.workers = workers
+        self.first_invalid_height: Optional[int] = None
+        self.reason: Optional[str] = None
+        # 各步耗时（秒）：sequential / blocks / signatures / total
+        self.timings: Dict[str, float] = {}
+        # verbose 时记录通过并行检查的区块：[(高度, 耗时秒), ...]
+        self.block_results: List[Tuple[int, float]] = []
+
+    @property
+    def valid(self) -> bool:
+        return self.first_invalid_height is None
+
+    def fail(self, height: int, reason: str) -> None:
+        """记录失败，只保留高度最低的一个"""
+        if self.first_invalid_height is None or height < self.first_invalid_height:
+            self.first_invalid_height = height
+            self.reason = reason
+
+    def summary(self) -> str:
+        total = self.timings.get('total', 0.0)
+        if self.valid:
+            return f"✅ {self.block_count} 个区块全部有效（耗时 {total:.3f}秒，{self.workers} 个工作进程）"
+        return f"❌ 区块 #{self.first_invalid_height} 无效: {self.reason}（耗时 {total:.3f}秒）"
+
+    def to_dict(self) -> Dict:
+        return {
+            'valid': self.valid,
+            'block_count': self.block_count,
+            'first_invalid_height': self.first_invalid_height,
+            'reason': self.reason,
+            'timings': dict(self.timings),
+            'workers': self.workers
+        }
+
+
+def _block_job(block, requirement: int) -> BlockJob:
+    transactions = [
+        (tx.sender, tx.receiver, tx.amount, tx.transaction_type, tx.data, tx.timestamp,
+         tx.transaction_id, tx.signature, tx.block_number, tx.status)
+        for tx in block.transactions
+    ]
+    return (block.version, block.index, block.timestamp, block.previous_hash, block.nonce, block.bits,
+            block.hash, block._merkle_root, transactions, requirement)
+
+
+def _has_valid_id(row: TransactionRow) -> bool:
+    """交易 ID 是否与内容一致（与 Transaction.has_valid_id 相同，兼容旧格式哈希）"""
+    sender, receiver, amount, tx_type, data, timestamp, tx_id = row[:7]
+    if tx_id == Utils.calculate_hash(
+            CanonicalEncoder.encode_transaction(sender, receiver, amount, tx_type, data, timestamp)):
+        return True
+    return tx_id == Utils.calculate_hash({
+        'sender': sender,
+        'receiver': receiver,
+        'amount': amount,
+        'type': tx_type,
+        'data': data,
+        'timestamp': timestamp
+    })
+
+
+def _block_hash(version: int, index: int, timestamp: int, previous_hash: str, nonce: int,
+                bits: Optional[int], merkle_root: str, tx_rows: List[TransactionRow]) -> str:
+    """按区块版本计算区块哈希（与 Block.calculate_hash 相同）"""
+    if version >= BLOCK_VERSION_HEADER:
+        prefix = CanonicalEncoder.encode_block_header_prefix(
+            version, index, timestamp, previous_hash, merkle_root,
+            bits if version >= BLOCK_VERSION_TARGET else None
+        )
+        return make_nonce_hasher(('header', prefix))(nonce)
+
+    fields = {
+        'index': index,
+        'timestamp': timestamp,
+        'transactions': [
+            {'sender': sender, 'receiver': receiver, 'amount': amount, 'type': tx_type, 'data': data,
+             'timestamp': tx_timestamp, 'transaction_id': tx_id, 'block_number': block_number,
+             'status': status, 'signature': signature}
+            for sender, receiver, amount, tx_type, data, tx_timestamp, tx_id, signature, block_number, status
+            in tx_rows
+        ],
+        'previous_hash': previous_hash,
+        'merkle_root': merkle_root
+    }
+    return make_nonce_hasher(('legacy', fields))(nonce)
+
+
+def _check_block(job: BlockJob) -> BlockResult:
+    """检查单个区块的交易 ID、默克尔根、区块哈希和工作量证明"""
+    start = time.perf_counter()
+    version, index, timestamp, previous_hash, nonce, bits, block_hash, header_root, tx_rows, requirement = job
+
+    for row in tx_rows:
+        if not _has_valid_id(row):
+            return index, f"交易 {row[6][:20]}... 的ID与内容不符", time.perf_counter() - start
+
+    # 总是由交易重新计算默克尔根，再与区块头中的默克尔根比对
+    merkle_root = MerkleTree.from_leaves([bytes.fromhex(row[6]) for row in tx_rows],
+                                         legacy=version < BLOCK_VERSION_MERKLE).get_root()
+    if header_root is not None and merkle_root != header_root:
+        return index, "默克尔根与交易不符", time.perf_counter() - start
+
+    if _block_hash(version, index, timestamp, previous_hash, nonce, bits, merkle_root, tx_rows) != block_hash:
+        return index, "区块哈希不匹配（可能被篡改）", time.perf_counter() - start
+
+    if version < BLOCK_VERSION_TARGET:
+        if block_hash[:requirement] != '0' * requirement:
+            return index, f"工作量证明无效（要求 {requirement} 个前导 0）", time.perf_counter() - start
+    elif bits != requirement:
+        return index, "难度目标与难度调整结果不符", time.perf_counter() - start
+    elif not DifficultyTarget.from_compact(requirement).is_met(block_hash):
+        return index, "工作量证明无效", time.perf_counter() - start
+
+    return index, None, time.perf_counter() - start
+
+
+def _check_blocks(jobs: List[BlockJob]) -> List[BlockResult]:
+    """工作进程入口：依次检查一块区块"""
+    return [_check_block(job) for job in jobs]
+
+
+class ChainValidator:
+    """整链校验引擎，进程池在第一次并行校验时创建，之后一直复用"""
+
+    def __init__(self, workers: Optional[int] = None, chunk_size: int = 32, min_parallel: int = 64):
+        """
+        Args:
+            workers: 工作进程数，默认使用全部 CPU 核心
+            chunk_size: 每次交给一个工作进程的区块数
+            min_parallel: 区块数少于该数量时在当前进程检查，避免进程启动开销超过校验本身
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = max(1, chunk_size)
+        self.min_parallel = min_parallel
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def validate(self, blockchain, verbose: bool = False) -> ChainValidationReport:
+        """
+        校验整条链
+
+        Args:
+            blockchain: Blockchain 实例（使用其链、难度调整规则和签名验证）
+            verbose: 是否逐块输出校验结果
+        """
+        chain = blockchain.chain
+        parallel = self.workers > 1 and len(chain) >= self.min_parallel
+        report = ChainValidationReport(len(chain), self.workers if parallel else 1)
+        started = time.perf_counter()
+
+        # 1. 顺序检查
+        jobs = []
+        if chain:
+            genesis_block = chain[0]
+            if genesis_block.index != 0:
+                report.fail(0, f"创世区块索引应为0，实际为{genesis_block.index}")
+            elif genesis_block.previous_hash != "0" * 64:
+                report.fail(0, "创世区块的前驱哈希格式错误")
+
+        for position in range(1, len(chain) if report.valid else 0):
+            block = chain[position]
+            previous_block = chain[position - 1]
+            if block.index != previous_block.index + 1:
+                report.fail(position, f"区块索引不连续（前一个区块 #{previous_block.index}，当前 #{block.index}）")
+                break
+            if block.previous_hash != previous_block.hash:
+                report.fail(block.index, "前驱哈希不匹配")
+                break
+            if block.version < BLOCK_VERSION_TARGET:
+                requirement = blockchain.difficulty
+            else:
+                # 已在链上的区块只检查中位时间下界（本地时间上界只在接收新区块时检查）
+                if block.timestamp <= blockchain.retargeter.median_time_past(chain, position):
+                    report.fail(block.index, "时间戳不晚于中位时间")
+                    break
+                requirement = blockchain.retargeter.next_target(chain, block.index).to_compact()
+            jobs.append(_block_job(block, requirement))
+        report.timings['sequential'] = time.perf_counter() - started
+
+        # 2. 并行检查（只检查第一个顺序错误之前的区块）
+        phase_start = time.perf_counter()
+        results = None
+        if parallel and len(jobs) >= self.min_parallel:
+            chunks = [jobs[i:i + self.chunk_size] for i in range(0, len(jobs), self.chunk_size)]
+            try:
+                results = []
+                for chunk_results in self._get_executor().map(_check_blocks, chunks):
+                    results.extend(chunk_results)
+            except Exception as e:
+                print(f"⚠️  并行校验失败，改为单进程校验: {e}")
+                self.shutdown()
+                results = None
+                report.workers = 1
+        if results is None:
+            results = _check_blocks(jobs)
+        for height, reason, elapsed in results:
+            if reason is not None:
+                report.fail(height, reason)
+            elif verbose:
+                report.block_results.append((height, elapsed))
+        report.timings['blocks'] = time.perf_counter() - phase_start
+
+        # 3. 签名检查（只检查第一个无效区块之前的区块）
+        phase_start = time.perf_counter()
+        limit = report.first_invalid_height if not report.valid else len(chain)
+        # 非系统交易必须带签名，只有 allows_unsigned 的旧区块例外
+        signed = []
+        for block in chain[1:limit]:
+            for tx in block.transactions:
+                if tx.sender == "0":
+                    continue
+                if tx.signature:
+                    signed.append((block.index, tx))
+                elif not blockchain.allows_unsigned(block.index):
+                    report.fail(block.index, f"交易 {tx.transaction_id[:20]}... 缺少签名")
+                    break
+            if not report.valid and report.first_invalid_height <= block.index:
+                break
+        signature_results = blockchain.verify_transaction_signatures(
+            [tx for _, tx in signed], [tx.signature for _, tx in signed])
+        for (height, tx), valid in zip(signed, signature_results):
+            if not valid:
+                report.fail(height, f"交易 {tx.transaction_id[:20]}... 的签名无效")
+                break
+        report.timings['signatures'] = time.perf_counter() - phase_start
+        report.timings['total'] = time.perf_counter() - started
+
+        if verbose:
+            for height, elapsed in report.block_results:
+                if report.valid or height < report.first_invalid_height:
+                    block = chain[height]
+                    print(f"✅ 区块 #{height} 验证通过（{elapsed * 1000:.2f}ms）")
+                    print(f"   哈希: {block.hash[:20]}...")
+                    print(f"   Nonce: {block.nonce}")
+                    print(f"   交易数: {len(block.transactions)}")
+        return report
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def shutdown(self) -> None:
+        """关闭进程池（之后再次并行校验时会重新创建）"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
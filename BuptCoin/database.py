@@ -257,10 +257,12 @@ BuptCoin 数据库管理器"""
             CREATE TABLE IF NOT EXISTS blocks (
                 id INT AUTO_INCREMENT PRIMARY KEY,
                 block_number INT UNIQUE NOT NULL,
+                version INT NOT NULL DEFAULT 1,
                 block_hash VARCHAR(64) UNIQUE NOT NULL,
                 previous_hash VARCHAR(64) NOT NULL,
                 timestamp BIGINT NOT NULL,
                 difficulty INT NOT NULL,
+                target_bits INT UNSIGNED,
                 nonce BIGINT NOT NULL,
                 merkle_root VARCHAR(64),
                 transaction_count INT DEFAULT 0,
@@ -346,6 +348,26 @@ BuptCoin 数据库管理器"""
             ''')
             print("✅ 投票记录表创建完成")
 
+            # 9. 状态快照表
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS state_snapshots (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                block_number INT UNIQUE NOT NULL,
+                block_hash VARCHAR(64) NOT NULL,
+                state_digest VARCHAR(64) NOT NULL,
+                account_count INT DEFAULT 0,
+                state_data LONGTEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                INDEX idx_block_number (block_number)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+            ''')
+            print("✅ 状态快照表创建完成")
+
+            # 10. 旧数据库表结构升级
+            self.ensure_column(cursor, 'blocks', 'version', 'INT NOT NULL DEFAULT 1')
+            self.ensure_column(cursor, 'blocks', 'target_bits', 'INT UNSIGNED')
+            self.ensure_column(cursor, 'transactions', 'signature', 'TEXT')
+
             self.connection.commit()
             cursor.close()
 
@@ -359,6 +381,16 @@ BuptCoin 数据库管理器"""
             if "already exists" not in str(e):
                 raise
 
+    def ensure_column(self, cursor, table: str, column: str, definition: str):
+        """如果表中缺少某列则补上（用于升级旧版本数据库）"""
+        cursor.execute('''
+        SELECT COUNT(*) FROM information_schema.COLUMNS 
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+        ''', (table, column))
+        if cursor.fetchone()[0] == 0:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            print(f"✅ 表 {table} 已新增列 {column}")
+
     def init_default_data(self):
         """初始化默认数据"""
         try:
@@ -402,6 +434,13 @@ BuptCoin 数据库管理器"""
                 ('stake_reward_rate', '0.08', '质押收益率'),
                 ('min_stake_amount', '100.0', '最小质押数量'),
                 ('vote_min_stake', '1000.0', '投票最小质押'),
+                ('snapshot_interval', '100', '状态快照间隔(区块数)'),
+                ('max_block_bytes', '1000000', '区块最大字节数'),
+                ('max_block_transactions', '1000', '区块最大交易数'),
+                ('mempool_max_bytes', '5000000', '交易池最大字节数'),
+                ('mempool_max_transactions', '20000', '交易池最大交易数'),
+                ('mempool_expiry', '259200', '待处理交易过期时间(秒)'),
+                ('allow_unsigned_legacy', '0', '是否接受数据库中签名上线前的未签名已确认交易'),
                 ('database_version', '1.0.0', '数据库版本')
             ]
 
@@ -763,6 +802,75 @@ BuptCoin 数据库管理器"""
             print(f"❌ 查询地址余额失败: {e}")
             return 0.0
 
+    def get_address_balances(self, addresses: List[str]) -> Optional[Dict[str, float]]:
+        """批量查询地址余额：{地址: 余额}，不存在的地址余额为 0；查询失败返回 None"""
+        if not addresses:
+            return {}
+        try:
+            cursor = self.connection.cursor()
+
+            placeholders = ', '.join(['%s'] * len(addresses))
+            cursor.execute(f'''
+            SELECT address, balance FROM wallet_addresses WHERE address IN ({placeholders})
+            ''', tuple(addresses))
+
+            rows = cursor.fetchall()
+            cursor.close()
+
+            balances = {address: 0.0 for address in addresses}
+            for address, balance in rows:
+                balances[address] = float(balance) if balance is not None else 0.0
+            return balances
+
+        except Error as e:
+            print(f"❌ 批量查询地址余额失败: {e}")
+            return None
+
+    def get_address_keys(self, addresses: List[str]) -> Dict[str, Dict]:
+        """批量获取地址的密钥：{地址: {'public_key', 'private_key_encrypted'}}"""
+        if not addresses:
+            return {}
+        try:
+            cursor = self.connection.cursor(dictionary=True)
+
+            placeholders = ', '.join(['%s'] * len(addresses))
+            cursor.execute(f'''
+            SELECT address, public_key, private_key_encrypted 
+            FROM wallet_addresses WHERE address IN ({placeholders})
+            ''', tuple(addresses))
+
+            rows = cursor.fetchall()
+            cursor.close()
+
+            return {row['address']: {'public_key': row['public_key'],
+                                     'private_key_encrypted': row['private_key_encrypted']}
+                    for row in rows}
+
+        except Error as e:
+            print(f"❌ 获取地址密钥失败: {e}")
+            return {}
+
+    def get_public_keys(self, addresses: List[str]) -> Dict[str, str]:
+        """批量获取地址登记的公钥：{地址: 公钥 PEM}"""
+        if not addresses:
+            return {}
+        try:
+            cursor = self.connection.cursor()
+
+            placeholders = ', '.join(['%s'] * len(addresses))
+            cursor.execute(f'''
+            SELECT address, public_key FROM wallet_addresses WHERE address IN ({placeholders})
+            ''', tuple(addresses))
+
+            rows = cursor.fetchall()
+            cursor.close()
+
+            return {address: public_key for address, public_key in rows if public_key}
+
+        except Error as e:
+            print(f"❌ 获取地址公钥失败: {e}")
+            return {}
+
     def get_address_by_nickname(self, nickname: str) -> Optional[str]:
         """通过昵称获取地址"""
         try:
@@ -783,6 +891,23 @@ BuptCoin 数据库管理器"""
 
     # ==================== 交易管理 ====================
 
+    @staticmethod
+    def _transaction_params(tx_data: Dict) -> tuple:
+        """交易记录对应 INSERT INTO transactions 的参数"""
+        return (
+            tx_data.get('hash'),
+            tx_data.get('from'),
+            tx_data.get('to'),
+            tx_data.get('amount', 0),
+            tx_data.get('fee', 0),
+            tx_data.get('transaction_type', 'transfer'),
+            tx_data.get('data', ''),
+            tx_data.get('timestamp', int(time.time())),
+            tx_data.get('status', 'pending'),
+            tx_data.get('signature'),
+            tx_data.get('memo', '')
+        )
+
     def record_transaction(self, tx_data: Dict) -> bool:
         """记录交易"""
         try:
@@ -791,20 +916,9 @@ BuptCoin 数据库管理器"""
             cursor.execute('''
             INSERT INTO transactions 
             (transaction_hash, from_address, to_address, amount, fee, 
-             transaction_type, data, timestamp, status, memo) 
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ''', (
-                tx_data.get('hash'),
-                tx_data.get('from'),
-                tx_data.get('to'),
-                tx_data.get('amount', 0),
-                tx_data.get('fee', 0),
-                tx_data.get('transaction_type', 'transfer'),
-                tx_data.get('data', ''),
-                tx_data.get('timestamp', int(time.time())),
-                tx_data.get('status', 'pending'),
-                tx_data.get('memo', '')
-            ))
+             transaction_type, data, timestamp, status, signature, memo) 
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ''', self._transaction_params(tx_data))
 
             self.connection.commit()
             cursor.close()
@@ -814,6 +928,29 @@ BuptCoin 数据库管理器"""
             print(f"❌ 记录交易失败: {e}")
             return False
 
+    def record_transactions(self, tx_rows: List[Dict]) -> bool:
+        """在一个数据库事务中批量记录交易，任何一条失败时全部回滚"""
+        if not tx_rows:
+            return True
+        try:
+            cursor = self.connection.cursor()
+
+            cursor.executemany('''
+            INSERT INTO transactions 
+            (transaction_hash, from_address, to_address, amount, fee, 
+             transaction_type, data, timestamp, status, signature, memo) 
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ''', [self._transaction_params(tx_data) for tx_data in tx_rows])
+
+            self.connection.commit()
+            cursor.close()
+            return True
+
+        except Error as e:
+            self.connection.rollback()
+            print(f"❌ 批量记录交易失败: {e}")
+            return False
+
     def get_transaction_history(self, address: str, limit: int = 50,
                                 offset: int = 0) -> List[Dict]:
         """获取地址的交易历史"""
@@ -877,6 +1014,77 @@ BuptCoin 数据库管理器"""
             print(f"❌ 获取交易详情失败: {e}")
             return None
 
+    def get_pending_transactions(self, limit: int) -> List[Dict]:
+        """最新的 limit 笔待处理交易，按 (时间, id) 升序返回"""
+        try:
+            cursor = self.connection.cursor(dictionary=True)
+
+            cursor.execute('''
+            SELECT * FROM transactions 
+            WHERE status = 'pending' 
+            ORDER BY timestamp DESC, id DESC 
+            LIMIT %s
+            ''', (limit,))
+
+            transactions = cursor.fetchall()
+            cursor.close()
+            transactions.reverse()
+            return transactions
+
+        except Error as e:
+            print(f"❌ 获取待处理交易失败: {e}")
+            return []
+
+    def mark_pending_before(self, timestamp: int, status: str, before_id: Optional[int] = None) -> int:
+        """
+        把 timestamp 之前的待处理交易标记为 status，返回更新的行数
+
+        给出 before_id 时，时间戳等于 timestamp 且 id 小于 before_id 的交易也一并标记
+        （与 get_pending_transactions 的 (时间, id) 排序一致）。
+        """
+        try:
+            cursor = self.connection.cursor()
+
+            if before_id is None:
+                cursor.execute('''
+                UPDATE transactions SET status = %s 
+                WHERE status = 'pending' AND timestamp < %s
+                ''', (status, timestamp))
+            else:
+                cursor.execute('''
+                UPDATE transactions SET status = %s 
+                WHERE status = 'pending' AND (timestamp < %s OR (timestamp = %s AND id < %s))
+                ''', (status, timestamp, timestamp, before_id))
+
+            updated = cursor.rowcount
+            self.connection.commit()
+            cursor.close()
+            return updated
+
+        except Error as e:
+            print(f"❌ 更新待处理交易状态失败: {e}")
+            return 0
+
+    def mark_transactions_status(self, tx_hashes: List[str], status: str) -> bool:
+        """批量把仍处于待处理状态的交易标记为 status（被挤出或过期）"""
+        if not tx_hashes:
+            return True
+        try:
+            cursor = self.connection.cursor()
+
+            cursor.executemany('''
+            UPDATE transactions SET status = %s 
+            WHERE transaction_hash = %s AND status = 'pending'
+            ''', [(status, tx_hash) for tx_hash in tx_hashes])
+
+            self.connection.commit()
+            cursor.close()
+            return True
+
+        except Error as e:
+            print(f"❌ 批量更新交易状态失败: {e}")
+            return False
+
     # ==================== 区块管理 ====================
 
     def record_block(self, block_data: Dict) -> bool:
@@ -886,15 +1094,17 @@ BuptCoin 数据库管理器"""
 
             cursor.execute('''
             INSERT INTO blocks 
-            (block_number, block_hash, previous_hash, timestamp, difficulty,
+            (block_number, version, block_hash, previous_hash, timestamp, difficulty, target_bits,
              nonce, merkle_root, transaction_count, miner_address, block_size) 
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             ''', (
                 block_data.get('number'),
+                block_data.get('version', 1),
                 block_data.get('hash'),
                 block_data.get('previous_hash'),
                 block_data.get('timestamp'),
                 block_data.get('difficulty'),
+                block_data.get('target_bits'),
                 block_data.get('nonce'),
                 block_data.get('merkle_root'),
                 block_data.get('transaction_count', 0),
@@ -933,6 +1143,105 @@ BuptCoin 数据库管理器"""
             print(f"❌ 获取最新区块失败: {e}")
             return None
 
+    # ==================== 质押与投票 ====================
+
+    def record_stakes(self, stakes: List[Dict]) -> bool:
+        """批量记录已确认的质押"""
+        if not stakes:
+            return True
+        try:
+            cursor = self.connection.cursor()
+
+            cursor.executemany('''
+            INSERT INTO stakes (address, amount, start_time, end_time) 
+            VALUES (%s, %s, %s, %s)
+            ''', [(s['address'], s['amount'], s['start_time'], s.get('end_time')) for s in stakes])
+
+            self.connection.commit()
+            cursor.close()
+            return True
+
+        except Error as e:
+            print(f"❌ 记录质押失败: {e}")
+            return False
+
+    def record_votes(self, votes: List[Dict]) -> bool:
+        """批量记录已确认的投票"""
+        if not votes:
+            return True
+        try:
+            cursor = self.connection.cursor()
+
+            cursor.executemany('''
+            INSERT INTO votes (voter_address, proposal_id, vote_option, vote_power, timestamp) 
+            VALUES (%s, %s, %s, %s, %s)
+            ''', [(v['voter_address'], v['proposal_id'], v['vote_option'], v['vote_power'], v['timestamp'])
+                  for v in votes])
+
+            self.connection.commit()
+            cursor.close()
+            return True
+
+        except Error as e:
+            print(f"❌ 记录投票失败: {e}")
+            return False
+
+    # ==================== 状态快照 ====================
+
+    def save_state_snapshot(self, snapshot_data: Dict) -> bool:
+        """保存状态快照（同一高度已存在时覆盖）"""
+        try:
+            cursor = self.connection.cursor()
+
+            cursor.execute('''
+            INSERT INTO state_snapshots 
+            (block_number, block_hash, state_digest, account_count, state_data) 
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE block_hash = VALUES(block_hash), state_digest = VALUES(state_digest),
+                account_count = VALUES(account_count), state_data = VALUES(state_data)
+            ''', (
+                snapshot_data['block_number'],
+                snapshot_data['block_hash'],
+                snapshot_data['state_digest'],
+                snapshot_data.get('account_count', 0),
+                snapshot_data['state_data']
+            ))
+
+            self.connection.commit()
+            cursor.close()
+            return True
+
+        except Error as e:
+            print(f"❌ 保存状态快照失败: {e}")
+            return False
+
+    def get_latest_state_snapshot(self, max_block_number: Optional[int] = None) -> Optional[Dict]:
+        """获取最新的状态快照（可限定不超过某个高度）"""
+        try:
+            cursor = self.connection.cursor(dictionary=True)
+
+            if max_block_number is None:
+                cursor.execute('''
+                SELECT * FROM state_snapshots 
+                ORDER BY block_number DESC 
+                LIMIT 1
+                ''')
+            else:
+                cursor.execute('''
+                SELECT * FROM state_snapshots 
+                WHERE block_number <= %s 
+                ORDER BY block_number DESC 
+                LIMIT 1
+                ''', (max_block_number,))
+
+            snapshot = cursor.fetchone()
+            cursor.close()
+            return snapshot
+
+        except Error as e:
+            print(f"❌ 获取状态快照失败: {e}")
+            return None
+
     # ==================== 系统配置 ====================
 
     def get_config_value(self, key: str, default: Any = None) -> Any:
@@ -1065,6 +1374,31 @@ BuptCoin 数据库管理器"""
             print(f"❌ 获取富豪榜失败: {e}")
             return []
 
+    def get_address_labels(self, addresses: List[str]) -> Dict[str, Dict]:
+        """批量获取地址的昵称和所有者用户名：{地址: {'nickname', 'owner_name'}}"""
+        if not addresses:
+            return {}
+        try:
+            cursor = self.connection.cursor(dictionary=True)
+
+            placeholders = ', '.join(['%s'] * len(addresses))
+            cursor.execute(f'''
+            SELECT wa.address, wa.nickname, u.username as owner_name
+            FROM wallet_addresses wa
+            LEFT JOIN users u ON wa.user_id = u.id
+            WHERE wa.address IN ({placeholders})
+            ''', tuple(addresses))
+
+            rows = cursor.fetchall()
+            cursor.close()
+
+            return {row['address']: {'nickname': row['nickname'], 'owner_name': row['owner_name']}
+                    for row in rows}
+
+        except Error as e:
+            print(f"❌ 获取地址昵称失败: {e}")
+            return {}
+
     def close(self):
         """关闭数据库连接"""
         if self.connection and self.connection.is_connected():
@@ -0,0 +1,193 @@
+# difficulty.py - 挖矿难度目标与难度调整
+"""
+难度目标与难度调整
+难度用 256 位目标值表示：区块哈希（按大端整数）不大于目标值即满足工作量证明。
+目标值以紧凑格式（compact bits，与比特币 nBits 相同）存储，精度可细到单个前导零位，
+难度调整器每隔 window 个区块根据这一轮区块的时间戳调整一次目标值，使出块间隔保持在配置值附近。
+区块时间戳必须晚于最近若干区块时间戳的中位数，且不能超出本地时间太多，防止矿工伪造时间操纵难度。
+"""
+
+import math
+import time
+from typing import List, Optional, Tuple, Union
+
+# 目标值上限（最容易的难度）
+MAX_TARGET = (1 << 256) - 1
+
+# 计算中位时间（median time past）的区块数
+MEDIAN_TIME_SPAN = 11
+# 区块时间戳允许超出本地时间的最大秒数
+MAX_FUTURE_DRIFT = 2 * 60
+
+
+class DifficultyTarget:
+    """256 位工作量证明目标值"""
+
+    def __init__(self, target: int):
+        if target <= 0:
+            raise ValueError("目标值必须为正数")
+        self.target = min(target, MAX_TARGET)
+        # 64 位十六进制形式，等长小写十六进制字符串的字典序与数值大小一致
+        self.target_hex = format(self.target, '064x')
+
+    @classmethod
+    def from_zero_bits(cls, zero_bits: int) -> 'DifficultyTarget':
+        """要求哈希至少有 zero_bits 个前导零位"""
+        return cls((1 << (256 - zero_bits)) - 1)
+
+    @classmethod
+    def from_hex_zeros(cls, hex_zeros: int) -> 'DifficultyTarget':
+        """旧难度表示：哈希十六进制前导 0 的个数"""
+        return cls.from_zero_bits(4 * hex_zeros)
+
+    @classmethod
+    def from_compact(cls, bits: int) -> 'DifficultyTarget':
+        """从紧凑格式解码：最高字节为字节长度，低 3 字节为尾数"""
+        size = bits >> 24
+        mantissa = bits & 0x007fffff
+        if size <= 3:
+            target = mantissa >> (8 * (3 - size))
+        else:
+            target = mantissa << (8 * (size - 3))
+        return cls(target)
+
+    @classmethod
+    def coerce(cls, value: Union[int, 'DifficultyTarget']) -> 'DifficultyTarget':
+        """兼容旧接口：整数按十六进制前导 0 个数解释"""
+        if isinstance(value, DifficultyTarget):
+            return value
+        return cls.from_hex_zeros(value)
+
+    def to_compact(self) -> int:
+        """编码为紧凑格式（会截断到 3 字节尾数精度）"""
+        size = (self.target.bit_length() + 7) // 8
+        if size <= 3:
+            mantissa = self.target << (8 * (3 - size))
+        else:
+            mantissa = self.target >> (8 * (size - 3))
+        # 尾数最高位是符号位，置位时右移一个字节
+        if mantissa & 0x00800000:
+            mantissa >>= 8
+            size += 1
+        return (size << 24) | mantissa
+
+    def normalized(self) -> 'DifficultyTarget':
+        """经过紧凑格式往返后的目标值，所有节点据此得到完全一致的目标"""
+        return DifficultyTarget.from_compact(self.to_compact())
+
+    def is_met(self, block_hash: str) -> bool:
+        """区块哈希是否满足目标"""
+        return block_hash <= self.target_hex
+
+    def scaled(self, numerator: int, denominator: int) -> 'DifficultyTarget':
+        """目标值乘以 numerator / denominator（结果大于上限时取上限）"""
+        return DifficultyTarget(max(1, self.target * numerator // denominator))
+
+    @property
+    def zero_bits(self) -> float:
+        """等效前导零位数（可为小数），每增加 1 期望工作量翻倍"""
+        return 256 - math.log2(self.target + 1)
+
+    @property
+    def work(self) -> int:
+        """满足目标的期望哈希次数"""
+        return (1 << 256) // (self.target + 1)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, DifficultyTarget) and self.target == other.target
+
+    def __hash__(self) -> int:
+        return hash(self.target)
+
+    def __str__(self) -> str:
+        return f"{self.zero_bits:.2f} 位 (bits=0x{self.to_compact():08x})"
+
+
+class DifficultyRetargeter:
+    """
+    难度调整器
+
+    创世区块之后每 window 个区块为一轮（第一轮为高度 1 ~ window），同一轮内目标值不变。
+    新一轮的目标值由上一轮的目标值和上一轮的实际出块时间决定，每轮只调整一次：
+        新目标 = 上一轮目标 × 实际用时 / 期望用时
+    实际用时限制在期望用时的 [1/max_adjustment, max_adjustment] 之间，
+    目标值不会比 pow_limit 更容易。创世区块不参与时间窗口。
+    """
+
+    def __init__(self, initial_target: DifficultyTarget, block_interval: int = 10,
+                 window: int = 10, max_adjustment: int = 4,
+                 pow_limit: Optional[DifficultyTarget] = None,
+                 median_span: int = MEDIAN_TIME_SPAN, max_future_drift: int = MAX_FUTURE_DRIFT):
+        """
+        Args:
+            initial_target: 初始目标（也是未携带目标值的旧区块的目标）
+            block_interval: 期望出块间隔（秒）
+            window: 每轮的区块数
+            max_adjustment: 单次调整的最大倍数
+            pow_limit: 最容易的目标值
+            median_span: 计算中位时间的区块数
+            max_future_drift: 区块时间戳允许超出本地时间的最大秒数
+        """
+        self.initial_target = initial_target.normalized()
+        self.block_interval = max(1, int(block_interval))
+        self.window = max(2, int(window))
+        self.max_adjustment = max(1, int(max_adjustment))
+        self.pow_limit = pow_limit or DifficultyTarget.from_zero_bits(1)
+        self.median_span = max(1, int(median_span))
+        self.max_future_drift = max(0, int(max_future_drift))
+
+    def target_of(self, block) -> DifficultyTarget:
+        """区块自身的目标值，旧区块没有记录目标值时使用初始目标"""
+        bits = getattr(block, 'bits', None)
+        if bits:
+            return DifficultyTarget.from_compact(bits)
+        return self.initial_target
+
+    def next_target(self, chain: List, height: Optional[int] = None) -> DifficultyTarget:
+        """
+        计算高度为 height 的区块应使用的目标值（默认为链尾之后的下一个区块）
+
+        一轮之内沿用前一个区块的目标；新一轮的第一个区块只读取上一轮的首尾两个区块，复杂度 O(1)。
+        新目标总是由上一轮第一个区块的目标算出，调整不会逐块累积。
+        """
+        if height is None:
+            height = len(chain)
+        if height <= 0:
+            return self.initial_target
+
+        if height == 1 or (height - 1) % self.window != 0:
+            # 不是新一轮的第一个区块，保持前一个目标不变
+            return self.target_of(chain[height - 1])
+
+        first = height - self.window
+        epoch_target = self.target_of(chain[first])
+        expected_timespan = self.block_interval * (self.window - 1)
+        actual_timespan = chain[height - 1].timestamp - chain[first].timestamp
+        actual_timespan = max(expected_timespan // self.max_adjustment,
+                              min(actual_timespan, expected_timespan * self.max_adjustment))
+        actual_timespan = max(1, actual_timespan)
+
+        new_target = epoch_target.scaled(actual_timespan, expected_timespan)
+        if new_target.target > self.pow_limit.target:
+            new_target = self.pow_limit
+        return new_target.normalized()
+
+    def median_time_past(self, chain: List, height: Optional[int] = None) -> int:
+        """高度为 height 的区块之前最近 median_span 个区块时间戳的中位数"""
+        if height is None:
+            height = len(chain)
+        timestamps = sorted(block.timestamp for block in chain[max(0, height - self.median_span):height])
+        if not timestamps:
+            return 0
+        return timestamps[len(timestamps) // 2]
+
+    def timestamp_bounds(self, chain: List, height: Optional[int] = None,
+                         now: Optional[int] = None) -> Tuple[int, int]:
+        """
+        高度为 height 的区块时间戳的允许范围 (下界, 上界)
+
+        时间戳必须大于下界（中位时间）且不大于上界（本地时间 + max_future_drift）。
+        """
+        if now is None:
+            now = int(time.time())
+        return self.median_time_past(chain, height), now + self.max_future_drift
@@ -0,0 +1,138 @@
+# governance.py - 质押与投票统计
+"""
+治理统计
+统一解析投票交易的候选人，并随区块追加增量维护每个地址的质押总额和每个候选人的得票，
+GUI 和命令行共用同一份统计，不再每次刷新都扫描整条链；统计随状态快照保存，
+重启后从快照恢复，不必加载快照之前区块的交易。
+已确认的质押、投票记录同时写入数据库的 stakes / votes 表。
+"""
+
+import heapq
+import re
+from typing import Dict, List, Optional, Tuple
+
+# 命令行创建投票交易时 data 的格式: "投票给: 候选人"
+VOTE_PREFIX = "投票给:"
+# 投票交易没有提案编号，统一记在默认提案下
+DEFAULT_PROPOSAL = "default"
+# 命令行创建质押交易时 data 的格式: "质押周期: 30天"
+STAKE_PERIOD_PATTERN = re.compile(r"质押周期:\s*(\d+)")
+
+
+def parse_vote_candidate(data: str, receiver: str) -> str:
+    """
+    解析投票交易的候选人
+
+    data 为 "投票给: X" 时取 X；否则 data 本身即候选人（GUI 直接填写候选人）；
+    data 为空时候选人是接收方地址。
+    """
+    data = (data or "").strip()
+    if VOTE_PREFIX in data:
+        candidate = data.split(VOTE_PREFIX, 1)[1].strip()
+        if candidate:
+            return candidate
+    return data or receiver
+
+
+def parse_stake_period(data: str) -> Optional[int]:
+    """质押周期（天），data 中没有时返回 None"""
+    match = STAKE_PERIOD_PATTERN.search(data or "")
+    return int(match.group(1)) if match else None
+
+
+def governance_records(transactions: List) -> Tuple[List[Dict], List[Dict]]:
+    """
+    从一个区块的交易中提取 stakes / votes 表的记录
+
+    Returns:
+        (质押记录列表, 投票记录列表)
+    """
+    stakes = []
+    votes = []
+    for tx in transactions:
+        if tx.transaction_type == "stake":
+            period = parse_stake_period(tx.data)
+            stakes.append({
+                'address': tx.sender,
+                'amount': float(tx.amount),
+                'start_time': tx.timestamp,
+                'end_time': tx.timestamp + period * 86400 if period else None
+            })
+        elif tx.transaction_type == "vote":
+            votes.append({
+                'voter_address': tx.sender,
+                'proposal_id': DEFAULT_PROPOSAL,
+                'vote_option': parse_vote_candidate(tx.data, tx.receiver),
+                'vote_power': float(tx.amount),
+                'timestamp': tx.timestamp
+            })
+    return stakes, votes
+
+
+class GovernanceAggregates:
+    """每个地址的质押总额和每个候选人的得票，随区块追加增量更新"""
+
+    def __init__(self):
+        self.stake_totals: Dict[str, float] = {}
+        self.vote_totals: Dict[str, float] = {}
+        self.total_stake = 0.0
+        self.total_votes = 0.0
+        self._block_count = 0
+        self._last_block_hash: Optional[str] = None
+
+    def apply_block(self, block) -> None:
+        for tx in block.transactions:
+            if tx.transaction_type == "stake":
+                self.stake_totals[tx.sender] = self.stake_totals.get(tx.sender, 0.0) + tx.amount
+                self.total_stake += tx.amount
+            elif tx.transaction_type == "vote":
+                # 每笔投票交易只在计入区块时解析一次
+                candidate = parse_vote_candidate(tx.data, tx.receiver)
+                self.vote_totals[candidate] = self.vote_totals.get(candidate, 0.0) + tx.amount
+                self.total_votes += tx.amount
+        self._block_count += 1
+        self._last_block_hash = block.hash
+
+    def export_state(self) -> Dict[str, Dict[str, float]]:
+        """{'stakes': {地址: 质押总额}, 'votes': {候选人: 得票}}（用于状态快照）"""
+        return {'stakes': dict(self.stake_totals), 'votes': dict(self.vote_totals)}
+
+    def restore(self, state: Dict[str, Dict[str, float]], block_count: int, last_block_hash: str) -> None:
+        """从状态快照恢复：快照包含前 block_count 个区块，之后的区块由 sync() 补上"""
+        self.stake_totals = dict(state.get('stakes', {}))
+        self.vote_totals = dict(state.get('votes', {}))
+        self.total_stake = sum(self.stake_totals.values())
+        self.total_votes = sum(self.vote_totals.values())
+        self._block_count = block_count
+        self._last_block_hash = last_block_hash
+
+    def rebuild(self, chain: List) -> None:
+        self.stake_totals = {}
+        self.vote_totals = {}
+        self.total_stake = 0.0
+        self.total_votes = 0.0
+        self._block_count = 0
+        self._last_block_hash = None
+        for block in chain:
+            self.apply_block(block)
+
+    def sync(self, chain: List) -> None:
+        """与区块链保持一致：只计入新区块；链变短或链尾被替换时重建"""
+        applied = self._block_count
+        if applied > len(chain) or (applied and chain[applied - 1].hash != self._last_block_hash):
+            self.rebuild(chain)
+            return
+        for block in chain[applied:]:
+            self.apply_block(block)
+
+    def top_stakes(self, k: Optional[int] = None) -> List[Tuple[str, float]]:
+        """质押金额最大的 k 个地址，按金额降序（k 为 None 时返回全部）"""
+        if k is None:
+            return sorted(self.stake_totals.items(), key=lambda item: item[1], reverse=True)
+        return heapq.nlargest(k, self.stake_totals.items(), key=lambda item: item[1])
+
+    def vote_ranking(self, k: Optional[int] = None) -> List[Tuple[str, float]]:
+        """得票最多的 k 个候选人，按票数降序（k 为 None 时返回全部）"""
+        if k is None:
+            return sorted(self.vote_totals.items(), key=lambda item: item[1], reverse=True)
+        return heapq.nlargest(k, self.vote_totals.items(), key=lambda item: item[1])
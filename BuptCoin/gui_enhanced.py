@@ -19,6 +19,8 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from blockchain import Blockchain, Transaction
+from mining import CancellationToken
+from mining_pool import DEFAULT_POOL_PORT, MiningPoolServer, PoolWorker
 from wallet import Wallet
 
 # 尝试导入数据库模块
@@ -440,34 +442,70 @@ class UserAuthDialog(QDialog):
 
 
 class MiningWorker(QThread):
-    """挖矿线程"""
+    """挖矿线程（本机挖矿 / 矿池模式 / 矿工模式）"""
     mining_finished = pyqtSignal(bool, str)
     mining_progress = pyqtSignal(str)
     mining_error = pyqtSignal(str)
 
-    def __init__(self, blockchain: Blockchain, miner_address: str):
+    MODE_LOCAL = 'local'
+    MODE_POOL = 'pool'
+    MODE_WORKER = 'worker'
+
+    def __init__(self, blockchain: Blockchain, miner_address: str, mode: str = MODE_LOCAL,
+                 pool: Optional[MiningPoolServer] = None, pool_host: str = '127.0.0.1',
+                 pool_port: int = DEFAULT_POOL_PORT):
         super().__init__()
         self.blockchain = blockchain
         self.miner_address = miner_address
+        self.mode = mode
+        self.pool = pool
+        self.pool_host = pool_host
+        self.pool_port = pool_port
         self.is_running = True
+        self.cancel_token = CancellationToken()
+
+    def emit_progress(self, progress):
+        self.mining_progress.emit(f"⛏️ {progress}")
 
     def run(self):
         try:
+            if self.mode == self.MODE_WORKER:
+                self.run_pool_worker()
+                return
+
             self.mining_progress.emit("⛏️ 开始挖矿...")
-            time.sleep(0.1)
-            success = self.blockchain.mine_pending_transactions(self.miner_address)
+            success = self.blockchain.mine_pending_transactions(
+                self.miner_address,
+                cancel_token=self.cancel_token,
+                progress_callback=self.emit_progress,
+                mining_engine=self.pool if self.mode == self.MODE_POOL else None
+            )
             
             if success:
                 latest_block = self.blockchain.get_latest_block()
                 msg = f"✅ 挖矿成功！\n新区块 #{latest_block.index}\n矿工获得奖励"
                 self.mining_finished.emit(True, msg)
+            elif self.cancel_token.cancelled:
+                self.mining_finished.emit(False, "⏹️ 挖矿已取消")
             else:
-                self.mining_finished.emit(False, "⚠️ 没有待处理交易")
+                self.mining_finished.emit(False, "⚠️ 没有待处理交易或区块已过期")
         except Exception as e:
             self.mining_error.emit(str(e))
+        finally:
+            self.is_running = False
+
+    def run_pool_worker(self):
+        """作为矿工连接矿池，直到停止或矿池断开"""
+        self.mining_progress.emit(f"⛏️ 正在连接矿池 {self.pool_host}:{self.pool_port}...")
+        worker = PoolWorker(self.pool_host, self.pool_port)
+        stats = worker.run(self.cancel_token, self.emit_progress)
+        msg = (f"矿工已停止\n共尝试 {stats['attempts']} 次，平均 {stats['hash_rate']:.0f} H/s\n"
+               f"份额: {stats['accepted_shares']} 接受 / {stats['rejected_shares']} 拒绝")
+        self.mining_finished.emit(False, msg)
 
     def stop(self):
         self.is_running = False
+        self.cancel_token.cancel()
 
 
 class BlockchainGUIEnhanced(QMainWindow):
@@ -481,6 +519,7 @@ class BlockchainGUIEnhanced(QMainWindow):
         self.database_connected = False
         self.current_user = None
         self.mining_worker = None
+        self.mining_pool = None
         self.db = None
         
         try:
@@ -510,7 +549,7 @@ class BlockchainGUIEnhanced(QMainWindow):
 
     def init_system_after_login(self):
         try:
-            self.blockchain = Blockchain(difficulty=2)
+            self.blockchain = Blockchain(difficulty=2, mining_workers=os.cpu_count() or 1)
             if self.current_user and self.current_user['id'] > 0 and self.database_connected:
                 self.wallet = Wallet(f"User_{self.current_user['id']}_Wallet", user_id=self.current_user['id'])
             else:
@@ -663,9 +702,21 @@ class BlockchainGUIEnhanced(QMainWindow):
         mine_layout.addWidget(QLabel("矿工:"))
         self.miner_combo = QComboBox()
         mine_layout.addWidget(self.miner_combo)
+        self.mining_mode_combo = QComboBox()
+        self.mining_mode_combo.addItem("本机挖矿", MiningWorker.MODE_LOCAL)
+        self.mining_mode_combo.addItem("矿池模式", MiningWorker.MODE_POOL)
+        self.mining_mode_combo.addItem("矿工模式", MiningWorker.MODE_WORKER)
+        mine_layout.addWidget(self.mining_mode_combo)
+        self.pool_address_input = QLineEdit(f"127.0.0.1:{DEFAULT_POOL_PORT}")
+        self.pool_address_input.setToolTip("矿池模式为监听地址，矿工模式为要连接的矿池地址")
+        self.pool_address_input.setMaximumWidth(160)
+        mine_layout.addWidget(self.pool_address_input)
         mine_btn = QPushButton("🚀 开始挖矿")
         mine_btn.clicked.connect(self.start_mining)
         mine_layout.addWidget(mine_btn)
+        stop_mine_btn = QPushButton("⏹ 停止挖矿")
+        stop_mine_btn.clicked.connect(self.stop_mining)
+        mine_layout.addWidget(stop_mine_btn)
         self.mining_status = QLabel("等待中")
         mine_layout.addWidget(self.mining_status)
         mine_layout.addStretch()
@@ -899,6 +950,10 @@ class BlockchainGUIEnhanced(QMainWindow):
                 return
             
             tx = Transaction(sender, receiver, amount, transaction_type=tx_type, data=data)
+            # 用钱包私钥签名（节点拒绝未签名的交易）
+            if not self.wallet.sign(tx, self.blockchain):
+                QMessageBox.warning(self, "错误", "交易签名失败：钱包中没有发送方地址的私钥")
+                return
             
             if self.blockchain.add_transaction(tx):
                 QMessageBox.information(self, "成功", f"交易已提交！\n类型: {tx_type}")
@@ -909,29 +964,57 @@ class BlockchainGUIEnhanced(QMainWindow):
             QMessageBox.critical(self, "错误", f"发送交易失败: {str(e)}")
 
     def start_mining(self):
-        if not self.blockchain.pending_transactions:
+        mode = self.mining_mode_combo.currentData()
+        if mode != MiningWorker.MODE_WORKER and not self.blockchain.pending_transactions:
             QMessageBox.information(self, "提示", "没有待处理交易")
             return
         
         if self.mining_worker and self.mining_worker.isRunning():
             QMessageBox.warning(self, "警告", "正在挖矿中")
             return
+
+        host, _, port = self.pool_address_input.text().strip().partition(':')
+        try:
+            port = int(port) if port else DEFAULT_POOL_PORT
+        except ValueError:
+            QMessageBox.warning(self, "警告", "矿池地址格式应为 主机:端口")
+            return
+
+        if mode == MiningWorker.MODE_POOL:
+            if self.mining_pool is None or (self.mining_pool.host, self.mining_pool.port) != (host, port):
+                if self.mining_pool:
+                    self.mining_pool.stop()
+                self.mining_pool = MiningPoolServer(host, port)
+            if not self.mining_pool.start():
+                QMessageBox.critical(self, "错误", f"矿池启动失败: {host}:{port}")
+                return
         
         miner = self.miner_combo.currentText()
         self.mining_status.setText("⛏️ 挖矿中...")
         
-        self.mining_worker = MiningWorker(self.blockchain, miner)
+        self.mining_worker = MiningWorker(self.blockchain, miner, mode, self.mining_pool, host, port)
         self.mining_worker.mining_finished.connect(self.on_mining_finished)
+        self.mining_worker.mining_progress.connect(self.mining_status.setText)
+        self.mining_worker.mining_error.connect(self.on_mining_error)
         self.mining_worker.start()
 
+    def stop_mining(self):
+        if self.mining_worker and self.mining_worker.isRunning():
+            self.mining_status.setText("⏹️ 正在停止...")
+            self.mining_worker.stop()
+
     def on_mining_finished(self, success, msg):
         if success:
             self.mining_status.setText("✅ 完成")
             QMessageBox.information(self, "成功", msg)
         else:
-            self.mining_status.setText("⚠️ 失败")
+            self.mining_status.setText(msg)
         self.update_all_displays()
 
+    def on_mining_error(self, error):
+        self.mining_status.setText("❌ 出错")
+        QMessageBox.critical(self, "错误", f"挖矿失败: {error}")
+
     def validate_blockchain(self):
         if self.blockchain.is_chain_valid():
             QMessageBox.information(self, "验证结果", "✅ 区块链验证通过！")
@@ -965,26 +1048,20 @@ class BlockchainGUIEnhanced(QMainWindow):
 
     def update_stake_ranking(self):
         """新增: 更新质押排名"""
-        stake_amounts = {}
-        
-        for block in self.blockchain.chain:
-            for tx in block.transactions:
-                if tx.transaction_type == "stake":
-                    addr = tx.sender
-                    stake_amounts[addr] = stake_amounts.get(addr, 0) + tx.amount
+        governance = self.blockchain.get_governance()
         
-        if not stake_amounts:
+        if not governance.stake_totals:
             self.stake_table.setRowCount(0)
             self.stake_total_label.setText("总质押: 0.00 BPC")
             self.stake_count_label.setText("质押地址数: 0")
             return
         
-        sorted_stakes = sorted(stake_amounts.items(), key=lambda x: x[1], reverse=True)
-        total = sum(stake_amounts.values())
+        top_stakes = governance.top_stakes(10)
+        total = governance.total_stake
         
-        self.stake_table.setRowCount(min(10, len(sorted_stakes)))
+        self.stake_table.setRowCount(len(top_stakes))
         
-        for i, (addr, amount) in enumerate(sorted_stakes[:10]):
+        for i, (addr, amount) in enumerate(top_stakes):
             percent = (amount / total * 100) if total > 0 else 0
             self.stake_table.setItem(i, 0, QTableWidgetItem(str(i+1)))
             self.stake_table.setItem(i, 1, QTableWidgetItem(addr[:20]))
@@ -992,26 +1069,20 @@ class BlockchainGUIEnhanced(QMainWindow):
             self.stake_table.setItem(i, 3, QTableWidgetItem(f"{percent:.2f}%"))
         
         self.stake_total_label.setText(f"总质押: {total:.2f} BPC")
-        self.stake_count_label.setText(f"质押地址数: {len(stake_amounts)}")
+        self.stake_count_label.setText(f"质押地址数: {len(governance.stake_totals)}")
 
     def update_vote_results(self):
         """新增: 更新投票结果"""
-        votes = {}
+        governance = self.blockchain.get_governance()
         
-        for block in self.blockchain.chain:
-            for tx in block.transactions:
-                if tx.transaction_type == "vote":
-                    candidate = tx.data if tx.data else tx.receiver
-                    votes[candidate] = votes.get(candidate, 0) + tx.amount
-        
-        if not votes:
+        if not governance.vote_totals:
             self.vote_table.setRowCount(0)
             self.vote_leader_label.setText("🏆 当前领先: 暂无")
             return
         
-        sorted_votes = sorted(votes.items(), key=lambda x: x[1], reverse=True)
-        total = sum(votes.values())
-        max_votes = max(votes.values())
+        sorted_votes = governance.vote_ranking()
+        total = governance.total_votes
+        max_votes = sorted_votes[0][1]
         
         self.vote_table.setRowCount(len(sorted_votes))
         
@@ -1045,7 +1116,7 @@ class BlockchainGUIEnhanced(QMainWindow):
             text += f"总余额: {stats.get('total_balance', 0):.2f} BPC\n"
             self.db_stats_text.setText(text)
             
-            rich_list = self.db.get_rich_list(limit=10)
+            rich_list = self.blockchain.get_rich_list(limit=10)
             self.rich_table.setRowCount(len(rich_list))
             total_balance = sum(r['balance'] for r in rich_list)
             
@@ -1131,18 +1202,18 @@ class BlockchainGUIEnhanced(QMainWindow):
             text = f"📊 区块链状态\n{'='*50}\n"
             text += f"区块总数: {len(self.blockchain.chain)}\n"
             text += f"待处理交易: {len(self.blockchain.pending_transactions)}\n"
-            text += f"挖矿难度: {self.blockchain.difficulty}\n"
+            text += f"挖矿难度: {self.blockchain.current_target()}\n"
             text += f"挖矿奖励: {self.blockchain.mining_reward} BPC\n\n"
             for block in self.blockchain.chain[-5:]:
                 text += f"区块 #{block.index}\n  哈希: {block.hash[:20]}...\n  交易: {len(block.transactions)}\n\n"
             self.blockchain_text.setText(text)
             
+            # 只需要最近 20 笔，已确认交易直接从列式存储取时间戳最新的 20 笔
             txs = []
-            for block in self.blockchain.chain:
-                for tx in block.transactions:
-                    txs.append({'time': tx.timestamp, 'type': tx.transaction_type,
-                               'sender': tx.sender, 'receiver': tx.receiver,
-                               'amount': tx.amount, 'status': '✅ 已确认', 'data': tx.data})
+            for tx in self.blockchain.get_recent_transactions(20):
+                txs.append({'time': tx.timestamp, 'type': tx.transaction_type,
+                           'sender': tx.sender, 'receiver': tx.receiver,
+                           'amount': tx.amount, 'status': '✅ 已确认', 'data': tx.data})
             for tx in self.blockchain.pending_transactions:
                 txs.append({'time': tx.timestamp, 'type': tx.transaction_type,
                            'sender': tx.sender, 'receiver': tx.receiver,
@@ -1166,7 +1237,7 @@ class BlockchainGUIEnhanced(QMainWindow):
             sys_text += f"用户ID: {self.current_user['id']}\n"
             sys_text += f"数据库: {'已连接' if self.database_connected else '未连接'}\n"
             sys_text += f"区块数: {len(self.blockchain.chain)}\n"
-            sys_text += f"难度: {self.blockchain.difficulty}\n"
+            sys_text += f"难度: {self.blockchain.current_target()}\n"
             sys_text += f"奖励: {self.blockchain.mining_reward} BPC\n"
             sys_text += f"钱包地址数: {len(self.wallet.addresses)}\n"
             self.system_text.setText(sys_text)
@@ -1242,11 +1313,16 @@ class BlockchainGUIEnhanced(QMainWindow):
         if len(self.wallet.addresses) < 2:
             QMessageBox.warning(self, "警告", "需要至少2个地址")
             return
-        sender = self.wallet.addresses[0]
-        receiver = self.wallet.addresses[1]
+        # 发送方必须是钱包中有私钥的地址（genesis 等系统地址不能签名）
+        signable = [address for address in self.wallet.addresses if address in self.wallet.private_keys]
+        if not signable:
+            QMessageBox.warning(self, "警告", "钱包中没有可签名的地址")
+            return
+        sender = signable[0]
+        receiver = next(address for address in self.wallet.addresses if address != sender)
         if self.blockchain.get_balance(sender) > 1:
             tx = Transaction(sender, receiver, 1.0)
-            if self.blockchain.add_transaction(tx):
+            if self.wallet.sign(tx, self.blockchain) and self.blockchain.add_transaction(tx):
                 QMessageBox.information(self, "成功", "测试交易创建成功！")
                 self.update_all_displays()
         else:
@@ -1300,6 +1376,8 @@ class BlockchainGUIEnhanced(QMainWindow):
             if self.mining_worker and self.mining_worker.isRunning():
                 self.mining_worker.stop()
                 self.mining_worker.wait()
+            if self.mining_pool:
+                self.mining_pool.stop()
             event.accept()
         else:
             event.ignore()
@@ -107,6 +107,7 @@ def init_database():
                 timestamp BIGINT NOT NULL,
                 status VARCHAR(20) DEFAULT 'pending',
                 confirmations INT DEFAULT 0,
+                signature TEXT,
                 memo VARCHAR(255),
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 INDEX idx_from_address (from_address),
@@ -125,10 +126,12 @@ def init_database():
             CREATE TABLE IF NOT EXISTS blocks (
                 id INT AUTO_INCREMENT PRIMARY KEY,
                 block_number INT UNIQUE NOT NULL,
+                version INT NOT NULL DEFAULT 1,
                 block_hash VARCHAR(64) UNIQUE NOT NULL,
                 previous_hash VARCHAR(64) NOT NULL,
                 timestamp BIGINT NOT NULL,
                 difficulty INT NOT NULL,
+                target_bits INT UNSIGNED,
                 nonce BIGINT NOT NULL,
                 merkle_root VARCHAR(64),
                 transaction_count INT DEFAULT 0,
@@ -145,6 +148,21 @@ def init_database():
             ''')
             print("✅ 区块表创建完成")
 
+            # 状态快照表
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS state_snapshots (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                block_number INT UNIQUE NOT NULL,
+                block_hash VARCHAR(64) NOT NULL,
+                state_digest VARCHAR(64) NOT NULL,
+                account_count INT DEFAULT 0,
+                state_data LONGTEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                INDEX idx_block_number (block_number)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+            ''')
+            print("✅ 状态快照表创建完成")
+
             # 5. 创建系统用户和创世地址
             print("\n正在创建初始数据...")
 
@@ -185,6 +203,13 @@ def init_database():
                 ('version', '3.0.0', '系统版本'),
                 ('total_supply', '1000000', '总发行量'),
                 ('max_supply', '21000000', '最大发行量'),
+                ('snapshot_interval', '100', '状态快照间隔(区块数)'),
+                ('max_block_bytes', '1000000', '区块最大字节数'),
+                ('max_block_transactions', '1000', '区块最大交易数'),
+                ('mempool_max_bytes', '5000000', '交易池最大字节数'),
+                ('mempool_max_transactions', '20000', '交易池最大交易数'),
+                ('mempool_expiry', '259200', '待处理交易过期时间(秒)'),
+                ('allow_unsigned_legacy', '0', '是否接受数据库中签名上线前的未签名已确认交易'),
             ]
 
             for key, value, desc in default_configs:
@@ -1,7 +1,10 @@
 import os
 import sys
+import threading
 import time
 from blockchain import Blockchain, Transaction
+from mining import CancellationToken
+from mining_pool import DEFAULT_POOL_PORT, MiningPoolServer, PoolWorker
 from wallet import Wallet
 
 # 在现有导入后添加数据库导入
@@ -52,7 +55,9 @@ class SimpleCoinCLI:
 
         # 初始化区块链（它会自动从数据库加载）
         print("\n正在初始化区块链...")
-        self.blockchain = Blockchain(difficulty=2)
+        self.blockchain = Blockchain(difficulty=2, mining_workers=os.cpu_count() or 1)
+        # 矿池模式下启动的矿池，首次使用时创建
+        self.mining_pool = None
 
         # 显示区块链状态
         print(f"✅ 区块链初始化完成")
@@ -282,8 +287,8 @@ class SimpleCoinCLI:
                 print(f"矿工地址: {latest_block.get('miner_address', '未知')}")
                 print(f"交易数量: {latest_block.get('transaction_count', 0)}")
 
-            # 显示富豪榜前5名
-            rich_list = db.get_rich_list(limit=5)
+            # 显示富豪榜前5名（进程内维护，不查询数据库）
+            rich_list = self.blockchain.get_rich_list(limit=5)
             if rich_list:
                 print(f"\n🏆 富豪榜前5名:")
                 for i, rich in enumerate(rich_list, 1):
@@ -655,6 +660,11 @@ class SimpleCoinCLI:
                 data=extra_data
             )
 
+            # 用钱包私钥签名（节点拒绝未签名的交易）
+            if not self.wallet.sign(transaction, self.blockchain):
+                print("❌ 交易签名失败：钱包中没有发送方地址的私钥")
+                return
+
             # 提交到区块链
             success = self.blockchain.add_transaction(transaction)
 
@@ -696,6 +706,22 @@ class SimpleCoinCLI:
         print("挖矿")
         print("=" * 40)
 
+        print("挖矿模式:")
+        print("1. 本机挖矿")
+        print("2. 矿池模式（把任务分发给连接的矿工）")
+        print("3. 矿工模式（连接其他节点的矿池）")
+        mode = input("请选择挖矿模式 (默认1): ").strip() or '1'
+
+        if mode == '3':
+            self.run_pool_worker()
+            return
+
+        mining_engine = None
+        if mode == '2':
+            mining_engine = self.get_mining_pool()
+            if not mining_engine:
+                return
+
         # 检查是否有待处理交易
         if not self.blockchain.pending_transactions:
             print("⚠️  没有待处理交易，无需挖矿")
@@ -735,11 +761,12 @@ class SimpleCoinCLI:
 
                     print(f"\n开始挖矿...")
                     print(f"矿工地址: {miner_address}")
-                    print(f"挖矿难度: {self.blockchain.difficulty}")
+                    print(f"挖矿难度: {self.blockchain.current_target()}")
                     print(f"挖矿奖励: {self.blockchain.mining_reward}")
+                    print("（按 Ctrl+C 可取消挖矿）")
 
                     # 执行挖矿
-                    success = self.blockchain.mine_pending_transactions(miner_address)
+                    success = self.run_mining(miner_address, mining_engine)
 
                     if success:
                         print("✅ 挖矿成功！")
@@ -765,6 +792,82 @@ class SimpleCoinCLI:
         except Exception as e:
             print(f"❌ 挖矿过程中出错: {e}")
 
+    def input_pool_address(self, prompt: str):
+        """读取 主机:端口 形式的矿池地址，格式错误返回 None"""
+        text = input(f"{prompt} (默认 127.0.0.1:{DEFAULT_POOL_PORT}): ").strip()
+        host, _, port = text.partition(':')
+        try:
+            return host or '127.0.0.1', int(port) if port else DEFAULT_POOL_PORT
+        except ValueError:
+            print("❌ 地址格式应为 主机:端口")
+            return None
+
+    def get_mining_pool(self):
+        """启动（或复用）本节点的矿池"""
+        pool = self.mining_pool
+        if pool and pool.running:
+            print(f"使用已启动的矿池 {pool.host}:{pool.port}，已连接矿工: {pool.get_stats()['worker_count']}")
+            return pool
+
+        address = self.input_pool_address("矿池监听地址")
+        if not address:
+            return None
+        pool = MiningPoolServer(*address)
+        if not pool.start():
+            return None
+        self.mining_pool = pool
+        print(f"矿工可运行: python mining_pool.py {pool.host} {pool.port}")
+        return pool
+
+    def run_pool_worker(self):
+        """以矿工身份连接矿池挖矿，按 Ctrl+C 停止"""
+        address = self.input_pool_address("矿池地址")
+        if not address:
+            return
+
+        cancel_token = CancellationToken()
+        worker = PoolWorker(*address)
+        print("（按 Ctrl+C 停止矿工）")
+        worker_thread = threading.Thread(
+            target=worker.run,
+            args=(cancel_token, lambda progress: print(f"\r⛏️  {progress}", end='', flush=True)),
+            daemon=True
+        )
+        worker_thread.start()
+        try:
+            while worker_thread.is_alive():
+                worker_thread.join(0.2)
+        except KeyboardInterrupt:
+            print("\n正在停止矿工...")
+            cancel_token.cancel()
+            worker_thread.join()
+
+    def run_mining(self, miner_address: str, mining_engine=None) -> bool:
+        """在后台线程中挖矿，主线程显示进度并响应 Ctrl+C 取消"""
+        cancel_token = CancellationToken()
+        result = {'success': False}
+
+        def print_progress(progress):
+            print(f"\r⛏️  {progress}", end='', flush=True)
+
+        def mine():
+            result['success'] = self.blockchain.mine_pending_transactions(
+                miner_address, cancel_token=cancel_token, progress_callback=print_progress,
+                mining_engine=mining_engine
+            )
+
+        mining_thread = threading.Thread(target=mine, daemon=True)
+        mining_thread.start()
+        try:
+            while mining_thread.is_alive():
+                mining_thread.join(0.2)
+        except KeyboardInterrupt:
+            print("\n正在取消挖矿...")
+            cancel_token.cancel()
+            mining_thread.join()
+
+        return result['success']
+
     def validate_blockchain(self):
         """验证区块链"""
         print("\n正在验证区块链完整性...")
@@ -806,7 +909,7 @@ class SimpleCoinCLI:
         print(f"📊 区块链信息:")
         print(f"  区块链长度: {len(self.blockchain.chain)}")
         print(f"  待处理交易: {len(self.blockchain.pending_transactions)}")
-        print(f"  挖矿难度: {self.blockchain.difficulty}")
+        print(f"  挖矿难度: {self.blockchain.current_target()}")
         print(f"  挖矿奖励: {self.blockchain.mining_reward}")
         print(f"  交易手续费: {self.blockchain.transaction_fee}")
 
@@ -846,32 +949,20 @@ class SimpleCoinCLI:
         print("质押排名")
         print("=" * 60)
 
-        # 从区块链收集质押数据
-        stake_amounts = {}
-
-        for block in self.blockchain.chain:
-            for tx in block.transactions:
-                if tx.transaction_type == "stake":
-                    address = tx.sender
-                    amount = tx.amount
-
-                    if address in stake_amounts:
-                        stake_amounts[address] += amount
-                    else:
-                        stake_amounts[address] = amount
+        governance = self.blockchain.get_governance()
 
-        if not stake_amounts:
+        if not governance.stake_totals:
             print("暂无质押记录")
             print("您可以通过创建'质押交易'来质押代币")
             return
 
-        # 排序并显示
-        sorted_stakes = sorted(stake_amounts.items(), key=lambda x: x[1], reverse=True)
+        # 只取前10名
+        sorted_stakes = governance.top_stakes(10)
 
         print(f"{'排名':<5} {'地址':<25} {'质押金额':<15} {'占比':<10}")
         print("-" * 60)
 
-        total_stake = sum(stake_amounts.values())
+        total_stake = governance.total_stake
 
         for i, (address, amount) in enumerate(sorted_stakes, 1):
             percentage = (amount / total_stake * 100) if total_stake > 0 else 0
@@ -887,12 +978,9 @@ class SimpleCoinCLI:
 
             print(f"{i:<5} {nickname:<25} {amount:<15.2f} {percentage:<10.1f}%")
 
-            if i >= 10:  # 只显示前10名
-                break
-
         print("-" * 60)
         print(f"总质押量: {total_stake:.2f}")
-        print(f"质押地址数: {len(stake_amounts)}")
+        print(f"质押地址数: {len(governance.stake_totals)}")
         print("=" * 60)
 
     def view_vote_results(self):
@@ -901,25 +989,9 @@ class SimpleCoinCLI:
         print("投票结果")
         print("=" * 60)
 
-        # 收集投票数据
-        votes = {}
-        total_votes = 0
-
-        for block in self.blockchain.chain:
-            for tx in block.transactions:
-                if tx.transaction_type == "vote":
-                    # 从data中提取候选人
-                    data = tx.data
-                    if "投票给:" in data:
-                        candidate = data.split("投票给:")[1].strip()
-                        amount = tx.amount
-
-                        if candidate in votes:
-                            votes[candidate] += amount
-                        else:
-                            votes[candidate] = amount
-
-                        total_votes += amount
+        governance = self.blockchain.get_governance()
+        votes = governance.vote_totals
+        total_votes = governance.total_votes
 
         if not votes:
             print("暂无投票记录")
@@ -927,7 +999,7 @@ class SimpleCoinCLI:
             return
 
         # 排序并显示
-        sorted_votes = sorted(votes.items(), key=lambda x: x[1], reverse=True)
+        sorted_votes = governance.vote_ranking()
 
         print(f"{'候选人':<20} {'票数':<15} {'占比':<10} {'进度条':<20}")
         print("-" * 60)
@@ -1026,7 +1098,7 @@ class SimpleCoinCLI:
         limit = input("显示前多少名？(默认10): ").strip()
         limit = int(limit) if limit.isdigit() else 10
 
-        rich_list = db.get_rich_list(limit=limit)
+        rich_list = self.blockchain.get_rich_list(limit=limit)
 
         print(f"\n" + "=" * 80)
         print(f"🏆 富豪榜 (前{limit}名)")
@@ -1040,7 +1112,7 @@ class SimpleCoinCLI:
             balance = rich['balance']
             percentage = (balance / total_balance * 100) if total_balance > 0 else 0
             nickname = rich['nickname'] if rich['nickname'] else rich['address'][:10] + "..."
-            owner = rich.get('owner_name', '未知')
+            owner = rich.get('owner_name') or '未知'
 
             print(f"{i:<5} {nickname:<30} {balance:<15.2f} {owner:<15} {percentage:<10.1f}%")
 
@@ -1048,6 +1120,14 @@ class SimpleCoinCLI:
         print(f"总计: {total_balance:.2f} BPC")
         print("=" * 80)
 
+        address = input("查询某个地址的排名 (留空跳过): ").strip()
+        if address:
+            rank = self.blockchain.get_address_rank(address)
+            if rank:
+                print(f"{address} 排名第 {rank}，余额 {self.blockchain.get_account_state().balance(address):.8f} BPC")
+            else:
+                print(f"{address} 不在富豪榜上（链上余额为 0）")
+
     def show_transaction_history(self):
         """显示交易历史"""
         address = input("请输入要查询的地址 (留空查看所有): ").strip()
@@ -1069,9 +1149,12 @@ class SimpleCoinCLI:
             print("暂无交易记录")
             return
 
-        print(f"\n" + "=" * 100)
-        print(f"{'时间':<20} {'方向':<8} {'对方地址':<35} {'金额':<12} {'状态':<10} {'交易哈希':<20}")
-        print("-" * 100)
+        # 历史余额索引：已确认交易显示所在区块之后的余额
+        history = self.blockchain.get_balance_history()
+
+        print(f"\n" + "=" * 116)
+        print(f"{'时间':<20} {'方向':<8} {'对方地址':<35} {'金额':<12} {'状态':<10} {'区块后余额':<14} {'交易哈希':<20}")
+        print("-" * 116)
 
         for tx in transactions:
             time_str = tx.get('time_str', '未知')
@@ -1084,10 +1167,20 @@ class SimpleCoinCLI:
             tx_hash = tx.get('transaction_hash', '未知')
             if len(tx_hash) > 20:
                 tx_hash = tx_hash[:17] + "..."
+            block_number = tx.get('block_number')
+            balance_after = "-"
+            if status == 'confirmed' and block_number is not None:
+                balance_after = f"{history.balance_at(address, block_number):.8f}"
+
+            print(f"{time_str:<20} {direction:<8} {counterparty:<35} {amount:<12} {status:<10} "
+                  f"{balance_after:<14} {tx_hash:<20}")
 
-            print(f"{time_str:<20} {direction:<8} {counterparty:<35} {amount:<12} {status:<10} {tx_hash:<20}")
+        print("=" * 116)
 
-        print("=" * 100)
+        height = input("查询该地址在某个区块高度时的余额 (留空跳过): ").strip()
+        if height.isdigit():
+            height = int(height)
+            print(f"区块 #{height} 之后的余额: {history.balance_at(address, height):.8f} BPC")
 
     def search_transaction(self):
         """搜索交易"""
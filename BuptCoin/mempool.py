@@ -0,0 +1,279 @@
+# mempool.py - 交易池
+"""
+交易池（mempool）
+替代原来的 pending_transactions 列表：
+- 按 transaction_id 建立哈希索引，重复交易直接拒绝
+- 每个发送方一个按到达顺序排列的队列
+- 按手续费率（手续费 / 交易字节数）排序的优先堆
+- 交易被区块打包后按 ID 移除，单笔 O(1)
+- 按发送方汇总的待支出金额，余额检查 O(1)
+- 单笔交易不能超过一个区块能容纳的字节数，否则永远无法被打包，直接拒绝
+- 总字节数和交易数有上限：池满时新交易只能挤掉手续费率更低的交易，
+  超过存活时间的交易被清除；被挤掉 / 过期的交易暂存在 dropped 中，
+  由调用方统一写回数据库
+"""
+
+import heapq
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from account_state import PendingSpendIndex
+from merkle_tree import MerkleAccumulator
+
+# 默认上限：交易规范编码总字节数、交易数、存活时间（秒）
+DEFAULT_MEMPOOL_MAX_BYTES = 5_000_000
+DEFAULT_MEMPOOL_MAX_TRANSACTIONS = 20_000
+DEFAULT_MEMPOOL_EXPIRY = 72 * 3600
+
+# 交易离开（或未能进入）交易池的原因，同时也是写回数据库的 status
+STATUS_EVICTED = "evicted"
+STATUS_EXPIRED = "expired"
+STATUS_REJECTED = "rejected"
+
+
+class MempoolEntry:
+    """交易池中的一笔交易及其元数据"""
+
+    __slots__ = ('transaction', 'fee', 'size', 'fee_rate', 'added_at', 'sequence')
+
+    def __init__(self, transaction, fee: float, sequence: int, added_at: Optional[float] = None):
+        self.transaction = transaction
+        self.fee = fee
+        # 交易规范编码的字节数
+        self.size = len(transaction.encode())
+        self.fee_rate = fee / self.size if self.size else 0.0
+        self.added_at = added_at if added_at is not None else time.time()
+        # 到达顺序，费率相同时先到先出
+        self.sequence = sequence
+
+
+class Mempool:
+    """带索引的待处理交易池"""
+
+    def __init__(self, max_bytes: int = DEFAULT_MEMPOOL_MAX_BYTES,
+                 max_transactions: int = DEFAULT_MEMPOOL_MAX_TRANSACTIONS,
+                 expiry: float = DEFAULT_MEMPOOL_EXPIRY, max_transaction_bytes: Optional[int] = None):
+        """
+        Args:
+            max_bytes: 池中交易规范编码的总字节数上限
+            max_transactions: 池中交易数上限
+            expiry: 交易在池中的最长存活时间（秒），不大于 0 表示不过期
+            max_transaction_bytes: 单笔交易规范编码的字节数上限（区块模板能容纳的最大交易），
+                                   None 表示只受 max_bytes 限制
+        """
+        self.max_bytes = max(1, int(max_bytes))
+        self.max_transaction_bytes = self.max_bytes
+        if max_transaction_bytes is not None:
+            self.max_transaction_bytes = min(self.max_bytes, max(1, int(max_transaction_bytes)))
+        self.max_transactions = max(1, int(max_transactions))
+        self.expiry = expiry
+        # transaction_id -> MempoolEntry，字典保持插入顺序即到达顺序
+        self._entries: Dict[str, MempoolEntry] = {}
+        # 发送方地址ID -> {transaction_id: None}（有序，作为按到达顺序的队列）
+        self._by_sender: Dict[int, Dict[str, None]] = {}
+        # (-手续费率, 到达序号, transaction_id)，被移除的交易在弹出时跳过
+        self._heap: List = []
+        # (手续费率, -到达序号, transaction_id)，池满时从堆顶挤掉费率最低、最晚到达的交易
+        self._low_heap: List = []
+        # 被挤掉或过期、尚未写回数据库的条目：[(条目, 原因), ...]
+        self.dropped: List[Tuple[MempoolEntry, str]] = []
+        self._sequence = 0
+        self.total_size = 0
+        # 按发送方汇总的待支出（金额 + 手续费）
+        self.spends = PendingSpendIndex()
+        # 按到达顺序的增量默克尔树；池中仍有交易时移除交易后在下次使用时重建，池被清空时直接重置
+        self._merkle = MerkleAccumulator()
+        self._merkle_dirty = False
+
+    # ==================== 增删 ====================
+
+    def add(self, transaction, fee: float, added_at: Optional[float] = None) -> bool:
+        """
+        加入交易
+
+        transaction_id 已存在、交易超过单笔字节数上限，或池已满且交易的手续费率不高于池中最低费率时
+        拒绝并返回 False；为新交易腾出空间而被挤掉的交易记入 dropped。
+        """
+        tx_id = transaction.transaction_id
+        if tx_id in self._entries:
+            return False
+
+        entry = MempoolEntry(transaction, fee, self._sequence, added_at)
+        victims = self._select_victims(entry)
+        if victims is None:
+            return False
+        for victim in victims:
+            self.remove(victim.transaction.transaction_id)
+            self.dropped.append((victim, STATUS_EVICTED))
+
+        self._sequence += 1
+        self._entries[tx_id] = entry
+        self._by_sender.setdefault(transaction.sender_id, {})[tx_id] = None
+        heapq.heappush(self._heap, (-entry.fee_rate, entry.sequence, tx_id))
+        heapq.heappush(self._low_heap, (entry.fee_rate, -entry.sequence, tx_id))
+        self.total_size += entry.size
+        self.spends.add(transaction, fee)
+        if not self._merkle_dirty:
+            self._merkle.append_transaction(transaction)
+        return True
+
+    def remove(self, transaction_id: str) -> Optional[MempoolEntry]:
+        """按 ID 移除交易，返回被移除的条目（不存在时返回 None）"""
+        entry = self._entries.pop(transaction_id, None)
+        if entry is None:
+            return None
+
+        transaction = entry.transaction
+        queue = self._by_sender.get(transaction.sender_id)
+        if queue is not None:
+            queue.pop(transaction_id, None)
+            if not queue:
+                del self._by_sender[transaction.sender_id]
+        self.total_size -= entry.size
+        self.spends.remove(transaction, entry.fee)
+        if self._entries:
+            self._merkle_dirty = True
+        else:
+            # 区块打包了全部交易：从空树重新开始，之后的交易继续增量追加
+            self._merkle = MerkleAccumulator()
+            self._merkle_dirty = False
+        # 堆中的记录在弹出时跳过；过期记录太多时压缩
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._compact_heap()
+        return entry
+
+    def _is_full_for(self, entry: MempoolEntry, freed_count: int, freed_bytes: int) -> bool:
+        return (len(self._entries) - freed_count + 1 > self.max_transactions
+                or self.total_size - freed_bytes + entry.size > self.max_bytes)
+
+    def _select_victims(self, entry: MempoolEntry) -> Optional[List[MempoolEntry]]:
+        """
+        为新条目腾出空间需要挤掉的条目（按费率从低到高），新条目放不进去时返回 None
+
+        只挤掉手续费率严格低于新条目的交易，费率相同时保留先到的交易。
+        """
+        if entry.size > self.max_transaction_bytes:
+            return None
+        victims = []
+        freed_count = 0
+        freed_bytes = 0
+        popped = []
+        while self._is_full_for(entry, freed_count, freed_bytes):
+            if not self._low_heap:
+                victims = None
+                break
+            item = heapq.heappop(self._low_heap)
+            lowest = self._entries.get(item[2])
+            if lowest is None:
+                # 已被移除的过期记录，直接丢弃
+                continue
+            popped.append(item)
+            if lowest.fee_rate >= entry.fee_rate:
+                victims = None
+                break
+            victims.append(lowest)
+            freed_count += 1
+            freed_bytes += lowest.size
+        # 被挤掉的条目在 remove 之后成为过期记录，统一放回堆中由后续弹出时跳过
+        for item in popped:
+            heapq.heappush(self._low_heap, item)
+        return victims
+
+    def expire(self, now: Optional[float] = None) -> List[MempoolEntry]:
+        """
+        移除在池中超过存活时间的交易并记入 dropped，返回被移除的条目
+
+        按到达顺序从最早的交易开始检查，遇到第一笔未过期的交易即停止。
+        """
+        if not self.expiry or self.expiry <= 0:
+            return []
+        cutoff = (now if now is not None else time.time()) - self.expiry
+        expired = []
+        for entry in self._entries.values():
+            if entry.added_at >= cutoff:
+                break
+            expired.append(entry)
+        for entry in expired:
+            self.remove(entry.transaction.transaction_id)
+            self.dropped.append((entry, STATUS_EXPIRED))
+        return expired
+
+    def take_dropped(self) -> List[Tuple[MempoolEntry, str]]:
+        """取出并清空被挤掉 / 过期的条目"""
+        dropped = self.dropped
+        self.dropped = []
+        return dropped
+
+    def remove_transactions(self, transactions: List) -> int:
+        """移除一组交易（例如已被区块打包的交易），返回实际移除的数量"""
+        removed = 0
+        for tx in transactions:
+            if self.remove(tx.transaction_id) is not None:
+                removed += 1
+        return removed
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_sender.clear()
+        self._heap = []
+        self._low_heap = []
+        self.dropped = []
+        self.total_size = 0
+        self.spends.clear()
+        self._merkle = MerkleAccumulator()
+        self._merkle_dirty = False
+
+    def _compact_heap(self) -> None:
+        self._heap = [item for item in self._heap if item[2] in self._entries]
+        heapq.heapify(self._heap)
+        self._low_heap = [item for item in self._low_heap if item[2] in self._entries]
+        heapq.heapify(self._low_heap)
+
+    # ==================== 查询 ====================
+
+    def fits(self, transaction) -> bool:
+        """交易是否不超过单笔字节数上限（超过的交易永远无法打包进区块）"""
+        return len(transaction.encode()) <= self.max_transaction_bytes
+
+    def __contains__(self, transaction_id: str) -> bool:
+        return transaction_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator:
+        """按到达顺序遍历交易"""
+        return (entry.transaction for entry in self._entries.values())
+
+    def get(self, transaction_id: str) -> Optional[MempoolEntry]:
+        return self._entries.get(transaction_id)
+
+    def entries(self) -> List[MempoolEntry]:
+        """按到达顺序的所有条目"""
+        return list(self._entries.values())
+
+    def transactions(self) -> List:
+        """按到达顺序的所有交易"""
+        return [entry.transaction for entry in self._entries.values()]
+
+    def sender_queue(self, sender_id: int) -> List[MempoolEntry]:
+        """某个发送方的交易，按到达顺序"""
+        return [self._entries[tx_id] for tx_id in self._by_sender.get(sender_id, ())]
+
+    def by_fee_rate(self) -> Iterator[MempoolEntry]:
+        """按手续费率从高到低遍历（费率相同时先到先出），不修改交易池"""
+        heap = [item for item in self._heap if item[2] in self._entries]
+        heapq.heapify(heap)
+        while heap:
+            yield self._entries[heapq.heappop(heap)[2]]
+
+    def outflow(self, address: str) -> float:
+        """地址在交易池中的待支出合计，O(1)"""
+        return self.spends.outflow(address)
+
+    def merkle_root_with(self, transaction) -> str:
+        """交易池中全部交易（按到达顺序）再加上一笔交易后的默克尔根"""
+        if self._merkle_dirty:
+            self._merkle = MerkleAccumulator.from_transactions(self.transactions())
+            self._merkle_dirty = False
+        return self._merkle.root_with(transaction)
@@ -1,76 +1,341 @@
 # merkle_tree.py - 新增文件
 import hashlib
-from typing import List
+from typing import Dict, List, Optional, Tuple
+
+# 每个节点是 32 字节 SHA-256 摘要
+DIGEST_SIZE = 32
+
+
+def hash_pair(left: bytes, right: bytes, legacy: bool = False) -> bytes:
+    """
+    计算父节点摘要
+
+    legacy=True 时沿用旧格式：把两个子节点的十六进制字符串拼接后再哈希，
+    用于校验旧版本区块的默克尔根；否则直接哈希两个 32 字节摘要的拼接。
+    """
+    if legacy:
+        return hashlib.sha256((left.hex() + right.hex()).encode()).digest()
+    return hashlib.sha256(left + right).digest()
 
 
 class MerkleTree:
-    """默克尔树，用于验证交易完整性"""
+    """
+    默克尔树，用于验证交易完整性
 
-    def __init__(self, transactions: List['Transaction']):
-        self.transactions = transactions
-        self.leaves = []
-        self.root = None
-        self.build_tree()
+    所有层的节点以原始 32 字节摘要连续存放在一个 bytearray 中（第 0 层为叶子），
+    构建后可直接为任意交易生成包含证明，无需重建。
+    奇数个节点时复制最后一个节点与自身配对。
+    """
 
-    def hash_data(self, data: str) -> str:
-        """计算数据的SHA256哈希"""
-        return hashlib.sha256(data.encode()).hexdigest()
+    __slots__ = ('legacy', '_buffer', '_levels', 'root')
 
-    def build_tree(self):
-        """构建默克尔树"""
-        if not self.transactions:
-            self.root = ""
-            return
+    def __init__(self, transactions: List['Transaction'], legacy: bool = False):
+        """
+        Args:
+            transactions: 交易列表，叶子为各交易的 transaction_id
+            legacy: 是否使用旧格式父节点哈希（版本 4 之前的区块）
+        """
+        self.legacy = legacy
+        # 🔥 使用transaction_id而不是str(tx)，transaction_id 是交易的完整哈希
+        self.build_tree([bytes.fromhex(tx.transaction_id) for tx in transactions])
 
-        # 🔥 关键修复：使用transaction_id而不是str(tx)
-        # str(tx)会返回 "Transfer(A -> B: 10.0)"，不包含时间戳等关键信息
-        # transaction_id 是交易的完整哈希，包含所有信息
-        self.leaves = [tx.transaction_id for tx in self.transactions]
+    @classmethod
+    def from_leaves(cls, leaves: List[bytes], legacy: bool = False) -> 'MerkleTree':
+        """直接由叶子摘要构建"""
+        tree = cls.__new__(cls)
+        tree.legacy = legacy
+        tree.build_tree(leaves)
+        return tree
 
-        # 2. 逐层计算父节点哈希
-        current_level = self.leaves
+    def build_tree(self, leaves: List[bytes]):
+        """构建默克尔树，保留所有层"""
+        self._buffer = bytearray(b''.join(leaves))
+        # 每层在缓冲区中的 (起始偏移, 节点数)
+        self._levels: List[Tuple[int, int]] = []
 
-        while len(current_level) > 1:
-            next_level = []
+        count = len(leaves)
+        if count == 0:
+            self.root = ""
+            return
 
-            # 每两个节点组合计算父节点哈希
-            for i in range(0, len(current_level), 2):
-                if i + 1 < len(current_level):
-                    combined = current_level[i] + current_level[i + 1]
+        offset = 0
+        self._levels.append((offset, count))
+        buffer = self._buffer
+        legacy = self.legacy
+
+        # 逐层计算父节点哈希
+        while count > 1:
+            next_offset = len(buffer)
+            for i in range(0, count, 2):
+                left_start = offset + i * DIGEST_SIZE
+                left = bytes(buffer[left_start:left_start + DIGEST_SIZE])
+                if i + 1 < count:
+                    right = bytes(buffer[left_start + DIGEST_SIZE:left_start + 2 * DIGEST_SIZE])
                 else:
-                    combined = current_level[i] + current_level[i]  # 奇数时复制最后一个
+                    right = left  # 奇数时复制最后一个
+                buffer += hash_pair(left, right, legacy)
+            offset = next_offset
+            count = (count + 1) // 2
+            self._levels.append((offset, count))
+
+        self.root = buffer[offset:offset + DIGEST_SIZE].hex()
 
-                parent_hash = self.hash_data(combined)
-                next_level.append(parent_hash)
+    def node(self, level: int, index: int) -> bytes:
+        """第 level 层（0 为叶子）第 index 个节点的摘要"""
+        offset, count = self._levels[level]
+        if not 0 <= index < count:
+            raise IndexError(f"第 {level} 层没有第 {index} 个节点")
+        start = offset + index * DIGEST_SIZE
+        return bytes(self._buffer[start:start + DIGEST_SIZE])
 
-            current_level = next_level
+    @property
+    def leaf_count(self) -> int:
+        return self._levels[0][1] if self._levels else 0
 
-        self.root = current_level[0] if current_level else ""
+    @property
+    def depth(self) -> int:
+        return len(self._levels)
 
     def get_root(self) -> str:
         """返回默克尔根"""
         return self.root
 
-    def verify_transaction(self, transaction: 'Transaction', merkle_proof: List[str]) -> bool:
-        """验证交易是否在默克尔树中"""
+    # ==================== 单叶子证明 ====================
+
+    def get_proof(self, index: int) -> Dict:
+        """
+        生成第 index 个交易的包含证明
+
+        Returns:
+            {'index', 'leaf_count', 'leaf', 'siblings', 'root'}，
+            siblings 为自底向上的兄弟节点（十六进制），左右位置由 index 的各个比特决定
+        """
+        if not 0 <= index < self.leaf_count:
+            raise IndexError(f"交易索引 {index} 超出范围")
+
+        siblings = []
+        position = index
+        for level in range(self.depth - 1):
+            count = self._levels[level][1]
+            sibling = position ^ 1
+            if sibling >= count:
+                sibling = position  # 奇数层的最后一个节点与自身配对
+            siblings.append(self.node(level, sibling).hex())
+            position //= 2
+
+        return {
+            'index': index,
+            'leaf_count': self.leaf_count,
+            'leaf': self.node(0, index).hex(),
+            'siblings': siblings,
+            'root': self.root
+        }
+
+    @staticmethod
+    def verify_proof(leaf: str, index: int, leaf_count: int, siblings: List[str], root: str,
+                     legacy: bool = False) -> bool:
+        """
+        按叶子位置逐层重算根哈希并与 root 比较
+
+        Args:
+            leaf_count: 树的叶子总数（应取自可信的区块数据，如区块的 transaction_count）；
+                index 必须小于它，兄弟节点数必须等于树高，
+                奇数层的最后一个节点只能与自身配对（否则可以把复制出的节点伪装成越界的叶子）
+        """
+        if not 0 <= index < leaf_count:
+            return False
+        try:
+            current = bytes.fromhex(leaf)
+            count = leaf_count
+            for sibling_hex in siblings:
+                if count <= 1:
+                    return False  # 兄弟节点比树高多
+                sibling = bytes.fromhex(sibling_hex)
+                if index ^ 1 >= count and sibling != current:
+                    return False
+                if index & 1:
+                    current = hash_pair(sibling, current, legacy)
+                else:
+                    current = hash_pair(current, sibling, legacy)
+                index >>= 1
+                count = (count + 1) // 2
+        except ValueError:
+            return False
+        return count == 1 and current.hex() == root
+
+    def verify_transaction(self, transaction: 'Transaction', merkle_proof: List[str], index: int) -> bool:
+        """验证交易是否在默克尔树的第 index 个位置"""
         if not self.root:
             return False
+        return self.verify_proof(transaction.transaction_id, index, self.leaf_count, merkle_proof,
+                                 self.root, self.legacy)
 
-        # 🔥 使用transaction_id而不是str(transaction)
-        tx_hash = transaction.transaction_id
-        current_hash = tx_hash
+    # ==================== 批量证明 ====================
 
-        # 使用证明路径重新计算根哈希
-        for proof_hash in merkle_proof:
-            # 根据位置决定组合顺序
-            if current_hash < proof_hash:
-                combined = current_hash + proof_hash
-            else:
-                combined = proof_hash + current_hash
+    def get_multiproof(self, indices: List[int]) -> Dict:
+        """
+        为多个叶子生成一份合并证明，只包含无法由这些叶子推出的节点
 
-            current_hash = self.hash_data(combined)
+        Returns:
+            {'indices', 'leaf_count', 'leaves', 'hashes', 'root'}，
+            hashes 按自底向上、每层从左到右的顺序排列
+        """
+        indices = sorted(set(indices))
+        if not indices:
+            raise ValueError("至少需要一个交易索引")
+        if indices[0] < 0 or indices[-1] >= self.leaf_count:
+            raise IndexError("交易索引超出范围")
 
-        return current_hash == self.root
+        hashes = []
+        known = indices
+        for level in range(self.depth - 1):
+            count = self._levels[level][1]
+            known_set = set(known)
+            parents = []
+            for position in known:
+                parent = position // 2
+                if parents and parents[-1] == parent:
+                    continue
+                left = parent * 2
+                right = left + 1 if left + 1 < count else left
+                for child in (left, right):
+                    if child not in known_set and not (child == right and right == left):
+                        hashes.append(self.node(level, child).hex())
+                parents.append(parent)
+            known = parents
+
+        return {
+            'indices': indices,
+            'leaf_count': self.leaf_count,
+            'leaves': [self.node(0, i).hex() for i in indices],
+            'hashes': hashes,
+            'root': self.root
+        }
+
+    @staticmethod
+    def verify_multiproof(leaves: Dict[int, str], leaf_count: int, hashes: List[str], root: str,
+                          legacy: bool = False) -> bool:
+        """
+        校验批量证明
+
+        Args:
+            leaves: {叶子索引: 叶子摘要(十六进制)}
+            leaf_count: 树的叶子总数
+            hashes: get_multiproof 返回的补充节点
+            root: 期望的默克尔根
+        """
+        if not leaves or leaf_count <= 0:
+            return False
+        try:
+            known = {index: bytes.fromhex(leaf) for index, leaf in leaves.items()}
+            if min(known) < 0 or max(known) >= leaf_count:
+                return False
+            supplied = iter(bytes.fromhex(h) for h in hashes)
+
+            count = leaf_count
+            while count > 1:
+                parents: Dict[int, bytes] = {}
+                for position in sorted(known):
+                    parent = position // 2
+                    if parent in parents:
+                        continue
+                    left = parent * 2
+                    right = left + 1
+                    left_hash = known[left] if left in known else next(supplied)
+                    if right >= count:
+                        right_hash = left_hash
+                    else:
+                        right_hash = known[right] if right in known else next(supplied)
+                    parents[parent] = hash_pair(left_hash, right_hash, legacy)
+                known = parents
+                count = (count + 1) // 2
+
+            # 补充节点必须恰好用完
+            if next(supplied, None) is not None:
+                return False
+        except (ValueError, StopIteration):
+            return False
+        return known[0].hex() == root
 
     def __str__(self):
         return f"MerkleTree(Root: {self.root[:10] if self.root else 'empty'}...)"
+
+
+class MerkleAccumulator:
+    """
+    只追加的增量默克尔树（用于待处理交易池）
+
+    只保存每层尚未配对的完整子树根（frontier），追加叶子和计算根都是 O(log n)，
+    得到的根与对同一组叶子构建 MerkleTree 完全一致（包括奇数节点复制自身的规则）。
+    """
+
+    __slots__ = ('legacy', 'leaf_count', '_peaks')
+
+    def __init__(self, legacy: bool = False):
+        self.legacy = legacy
+        self.leaf_count = 0
+        # _peaks[level] 为该层等待右兄弟的完整子树根，没有则为 None
+        self._peaks: List[Optional[bytes]] = []
+
+    @classmethod
+    def from_transactions(cls, transactions: List['Transaction'], legacy: bool = False) -> 'MerkleAccumulator':
+        accumulator = cls(legacy)
+        for tx in transactions:
+            accumulator.append_transaction(tx)
+        return accumulator
+
+    def append(self, leaf: bytes):
+        """追加一个叶子摘要"""
+        peaks = self._peaks
+        node = leaf
+        level = 0
+        while level < len(peaks) and peaks[level] is not None:
+            node = hash_pair(peaks[level], node, self.legacy)
+            peaks[level] = None
+            level += 1
+        if level == len(peaks):
+            peaks.append(node)
+        else:
+            peaks[level] = node
+        self.leaf_count += 1
+
+    def append_transaction(self, transaction: 'Transaction'):
+        self.append(bytes.fromhex(transaction.transaction_id))
+
+    def _fold(self, peaks: List[Optional[bytes]], leaf_count: int) -> str:
+        """把 frontier 自底向上合并成根：落单的节点与自身配对"""
+        if leaf_count == 0:
+            return ""
+        legacy = self.legacy
+        carry = None
+        count = leaf_count
+        level = 0
+        while count > 1:
+            peak = peaks[level] if level < len(peaks) else None
+            if peak is not None and carry is not None:
+                carry = hash_pair(peak, carry, legacy)
+            elif peak is not None:
+                carry = hash_pair(peak, peak, legacy)
+            elif carry is not None:
+                carry = hash_pair(carry, carry, legacy)
+            count = (count + 1) // 2
+            level += 1
+        if carry is None:
+            carry = peaks[level]
+        return carry.hex()
+
+    def get_root(self) -> str:
+        """当前所有叶子的默克尔根"""
+        return self._fold(self._peaks, self.leaf_count)
+
+    def root_with(self, transaction: 'Transaction') -> str:
+        """
+        再追加一笔交易后的默克尔根（不修改累加器）
+
+        用于在待处理交易之后加上挖矿奖励交易，直接得到候选区块的默克尔根。
+        """
+        accumulator = MerkleAccumulator(self.legacy)
+        accumulator._peaks = list(self._peaks)
+        accumulator.leaf_count = self.leaf_count
+        accumulator.append_transaction(transaction)
+        return accumulator.get_root()
@@ -0,0 +1,289 @@
+# mining.py - 多核并行挖矿引擎
+"""
+并行挖矿引擎
+把 nonce 空间按步长切分给多个工作进程同时搜索，
+第一个找到有效哈希的进程通知其余进程停止。
+"""
+
+import hashlib
+import multiprocessing
+import os
+import queue
+import struct
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from difficulty import DifficultyTarget
+from utils import Utils
+
+
+# 进度回报间隔（秒）
+PROGRESS_INTERVAL = 0.5
+
+
+class CancellationToken:
+    """挖矿取消令牌，可在其他线程中调用 cancel() 中止正在进行的挖矿"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+class MiningProgress:
+    """挖矿进度快照，传给进度回调"""
+
+    def __init__(self, attempts: int, elapsed: float):
+        self.attempts = attempts
+        self.elapsed = elapsed
+        self.hash_rate = attempts / elapsed if elapsed > 0 else 0.0
+
+    def __str__(self) -> str:
+        return f"尝试次数: {self.attempts}, 速度: {self.hash_rate:.0f} H/s, 已用时: {self.elapsed:.1f}秒"
+
+
+def make_nonce_hasher(hash_job: Tuple[str, Any]) -> Callable[[int], str]:
+    """
+    根据 Block.hash_job() 的描述生成 nonce -> 区块哈希 的函数
+
+    区块头格式下，前缀只哈希一次得到中间状态，
+    每次尝试 copy() 中间状态后只追加 8 字节 nonce。
+    """
+    kind, payload = hash_job
+
+    if kind == 'header':
+        midstate = hashlib.sha256(payload)
+        pack_nonce = struct.Struct('>Q').pack
+
+        def hash_nonce(nonce: int) -> str:
+            header_hash = midstate.copy()
+            header_hash.update(pack_nonce(nonce))
+            return header_hash.hexdigest()
+
+        return hash_nonce
+
+    fields = dict(payload)
+
+    def hash_legacy(nonce: int) -> str:
+        fields['nonce'] = nonce
+        return Utils.calculate_hash(fields)
+
+    return hash_legacy
+
+
+def _search_nonce_range(worker_id: int, hash_job: Tuple[str, Any], target_hex: str,
+                        start_nonce: int, step: int, stop_event, result_queue,
+                        max_attempts: Optional[int] = None) -> None:
+    """
+    工作进程入口：从 start_nonce 开始，每次跳过 step 个 nonce 进行搜索
+
+    每个工作进程负责 start_nonce + k * step 这一组 nonce，
+    互不重叠。结束时（找到、被取消或达到上限）都会回报统计信息。
+    target_hex 为 64 位十六进制目标值，哈希不大于它即成功。
+    """
+    nonce = start_nonce
+    attempts = 0
+    start_time = time.time()
+    last_report = start_time
+    hash_nonce = make_nonce_hasher(hash_job)
+
+    while True:
+        block_hash = hash_nonce(nonce)
+        attempts += 1
+
+        if block_hash <= target_hex:
+            result_queue.put(('found', worker_id, nonce, block_hash))
+            stop_event.set()
+            break
+
+        if max_attempts is not None and attempts >= max_attempts:
+            break
+
+        # 每 1000 次检查一次取消标志并按间隔回报进度
+        if attempts % 1000 == 0:
+            if stop_event.is_set():
+                break
+            now = time.time()
+            if now - last_report >= PROGRESS_INTERVAL:
+                result_queue.put(('progress', worker_id, attempts))
+                last_report = now
+
+        nonce += step
+
+    result_queue.put(('stats', worker_id, attempts, time.time() - start_time))
+
+
+class MiningResult:
+    """并行挖矿结果"""
+
+    def __init__(self, nonce: Optional[int], block_hash: Optional[str],
+                 worker_stats: List[Dict], elapsed: float):
+        self.nonce = nonce
+        self.hash = block_hash
+        self.worker_stats = worker_stats
+        self.elapsed = elapsed
+
+    @property
+    def found(self) -> bool:
+        return self.nonce is not None
+
+    @property
+    def total_attempts(self) -> int:
+        return sum(stat['attempts'] for stat in self.worker_stats)
+
+    @property
+    def hash_rate(self) -> float:
+        """所有工作进程的合计算力 (H/s)"""
+        return sum(stat['hash_rate'] for stat in self.worker_stats)
+
+    def to_dict(self) -> Dict:
+        return {
+            'found': self.found,
+            'nonce': self.nonce,
+            'hash': self.hash,
+            'elapsed': self.elapsed,
+            'total_attempts': self.total_attempts,
+            'hash_rate': self.hash_rate,
+            'workers': self.worker_stats
+        }
+
+
+class ParallelMiningEngine:
+    """多进程挖矿引擎"""
+
+    def __init__(self, workers: Optional[int] = None, min_zero_bits: int = 16):
+        """
+        Args:
+            workers: 工作进程数，默认使用全部 CPU 核心
+            min_zero_bits: 难度低于该前导零位数时直接在当前进程挖矿，
+                           避免进程启动开销超过挖矿本身
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.min_zero_bits = min_zero_bits
+
+    def mine(self, block, target: Union[int, DifficultyTarget], cancel_token: Optional[CancellationToken] = None,
+             progress_callback: Optional[Callable[[MiningProgress], None]] = None,
+             max_attempts_per_worker: Optional[int] = None) -> MiningResult:
+        """
+        为区块搜索有效 nonce，成功后直接写回 block.nonce 和 block.hash
+
+        Args:
+            block: 待挖矿的区块
+            target: 难度目标（整数按旧的十六进制前导 0 个数解释）
+            cancel_token: 取消令牌，被取消时所有工作进程停止，结果 found 为 False
+            progress_callback: 进度回调，参数为所有进程合计的 MiningProgress
+            max_attempts_per_worker: 每个进程的最大尝试次数（用于测试或限时挖矿）
+        """
+        target = DifficultyTarget.coerce(target)
+        if self.workers <= 1 or target.zero_bits < self.min_zero_bits:
+            return self._mine_inline(block, target, cancel_token, progress_callback)
+
+        print(f"开始并行挖矿，难度: {target}, 工作进程数: {self.workers}")
+
+        stop_event = multiprocessing.Event()
+        result_queue = multiprocessing.Queue()
+        hash_job = block.hash_job()
+        start_nonce = block.nonce
+
+        processes = []
+        for worker_id in range(self.workers):
+            process = multiprocessing.Process(
+                target=_search_nonce_range,
+                args=(worker_id, hash_job, target.target_hex, start_nonce + worker_id,
+                      self.workers, stop_event, result_queue, max_attempts_per_worker),
+                daemon=True
+            )
+            processes.append(process)
+
+        start_time = time.time()
+        for process in processes:
+            process.start()
+
+        found = None
+        stats = {}
+        progress = {}
+        try:
+            # 每个进程最终都会发送一条 stats 消息
+            while len(stats) < len(processes):
+                if cancel_token and cancel_token.cancelled and not stop_event.is_set():
+                    stop_event.set()
+
+                try:
+                    message = result_queue.get(timeout=0.2)
+                except queue.Empty:
+                    if not any(p.is_alive() for p in processes) and result_queue.empty():
+                        break
+                    continue
+
+                if message[0] == 'found':
+                    if found is None:
+                        found = message
+                    stop_event.set()
+                elif message[0] == 'progress':
+                    _, worker_id, attempts = message
+                    progress[worker_id] = attempts
+                    if progress_callback:
+                        progress_callback(MiningProgress(sum(progress.values()), time.time() - start_time))
+                else:
+                    _, worker_id, attempts, worker_elapsed = message
+                    stats[worker_id] = {
+                        'worker_id': worker_id,
+                        'attempts': attempts,
+                        'elapsed': worker_elapsed,
+                        'hash_rate': attempts / worker_elapsed if worker_elapsed > 0 else 0.0
+                    }
+        finally:
+            stop_event.set()
+            for process in processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+
+        elapsed = time.time() - start_time
+        worker_stats = [stats[k] for k in sorted(stats)]
+
+        if found is None:
+            if cancel_token and cancel_token.cancelled:
+                print("⏹️  并行挖矿已取消")
+            else:
+                print("⚠️  并行挖矿结束，未找到有效 nonce")
+            return MiningResult(None, None, worker_stats, elapsed)
+
+        _, winner, nonce, block_hash = found
+        block.nonce = nonce
+        block.hash = block_hash
+
+        result = MiningResult(nonce, block_hash, worker_stats, elapsed)
+        print(f"✅ 并行挖矿成功！(工作进程 #{winner})")
+        print(f"  Nonce: {nonce}")
+        print(f"  哈希: {block_hash}")
+        print(f"  总尝试次数: {result.total_attempts}")
+        print(f"  耗时: {elapsed:.2f}秒")
+        print(f"  合计算力: {result.hash_rate:.0f} H/s")
+        for stat in worker_stats:
+            print(f"    进程 #{stat['worker_id']}: {stat['attempts']} 次, {stat['hash_rate']:.0f} H/s")
+        return result
+
+    def _mine_inline(self, block, target: DifficultyTarget, cancel_token: Optional[CancellationToken] = None,
+                     progress_callback: Optional[Callable[[MiningProgress], None]] = None) -> MiningResult:
+        """在当前进程中挖矿（低难度时使用）"""
+        start_time = time.time()
+        start_nonce = block.nonce
+        found = block.mine_block(target, cancel_token, progress_callback)
+        elapsed = time.time() - start_time
+        attempts = block.nonce - start_nonce
+        stat = {
+            'worker_id': 0,
+            'attempts': attempts,
+            'elapsed': elapsed,
+            'hash_rate': attempts / elapsed if elapsed > 0 else 0.0
+        }
+        if not found:
+            return MiningResult(None, None, [stat], elapsed)
+        return MiningResult(block.nonce, block.hash, [stat], elapsed)
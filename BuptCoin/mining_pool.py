@@ -0,0 +1,581 @@
+# mining_pool.py - 矿池模式：节点把挖矿任务分发给多台矿机
+"""
+矿池
+矿池服务器（节点一侧）把区块头模板和互不重叠的 nonce 区间分发给通过 TCP 连接的矿工，
+矿工提交满足份额难度（比区块难度低）的份额，矿池据此统计算力，
+份额同时满足区块难度时即完成挖矿。
+
+协议：每条消息是一行 JSON（以换行符结尾）
+    矿工 -> 矿池  subscribe   {"name"}
+                  share       {"job_id", "nonce", "hash"}
+                  need_work   {"job_id"}                      当前区间已搜索完
+                  progress    {"job_id", "attempts"}          本任务累计尝试次数
+    矿池 -> 矿工  job         {"job_id", "kind", "payload", "target", "share_target",
+                               "nonce_start", "nonce_end"}    新模板或新区间
+                  share_result {"accepted", "error"}               error 为拒绝原因（接受时为 null）
+                  idle        {}                              暂无任务
+"""
+
+import json
+import socket
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from difficulty import DifficultyTarget
+from mining import CancellationToken, MiningProgress, MiningResult, PROGRESS_INTERVAL, make_nonce_hasher
+
+DEFAULT_POOL_PORT = 5555
+# 每次分配给矿工的 nonce 区间大小
+DEFAULT_RANGE_SIZE = 1 << 20
+# 份额难度（前导零位数），越低份额越多、算力统计越平滑
+DEFAULT_SHARE_ZERO_BITS = 12
+# nonce 在区块头中编码为 8 字节无符号整数
+NONCE_LIMIT = 1 << 64
+
+
+def encode_job(hash_job: Tuple[str, Any]) -> Tuple[str, Any]:
+    """把 Block.hash_job() 转成可 JSON 序列化的形式"""
+    kind, payload = hash_job
+    if kind == 'header':
+        return kind, payload.hex()
+    return kind, payload
+
+
+def decode_job(kind: str, payload: Any) -> Tuple[str, Any]:
+    """encode_job 的逆操作"""
+    if kind == 'header':
+        return kind, bytes.fromhex(payload)
+    return kind, payload
+
+
+class _LineConnection:
+    """按行收发 JSON 消息的 TCP 连接，发送加锁以便多线程共用"""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.reader = sock.makefile('r', encoding='utf-8')
+        self.send_lock = threading.Lock()
+
+    def send(self, message: Dict) -> bool:
+        data = (json.dumps(message) + '\n').encode('utf-8')
+        try:
+            with self.send_lock:
+                self.sock.sendall(data)
+            return True
+        except OSError:
+            return False
+
+    def receive(self) -> Optional[Dict]:
+        """读取一条消息，连接关闭时返回 None"""
+        try:
+            line = self.reader.readline()
+        except (OSError, ValueError):
+            return None
+        if not line:
+            return None
+        try:
+            message = json.loads(line)
+        except json.JSONDecodeError:
+            return {}
+        return message if isinstance(message, dict) else {}
+
+    def close(self):
+        # makefile() 持有套接字引用，必须先 shutdown 才能真正断开连接
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+def _parse_uint(value: Any, limit: int) -> Optional[int]:
+    """矿工上报的非负整数（nonce、尝试次数），类型不对或不在 [0, limit) 内时返回 None"""
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value < limit:
+        return None
+    return value
+
+
+class PoolWorkerSession:
+    """矿池中一个已连接矿工的状态"""
+
+    def __init__(self, worker_id: int, connection: _LineConnection, address):
+        self.worker_id = worker_id
+        self.connection = connection
+        self.address = address
+        self.name = f"{address[0]}:{address[1]}"
+        self.job_attempts = 0
+        self.job_started = time.time()
+        self.hash_rate = 0.0
+        self.accepted_shares = 0
+        self.rejected_shares = 0
+        self._last_attempts = 0
+        self._last_report = time.time()
+
+    def reset_job(self):
+        self.job_attempts = 0
+        self.job_started = time.time()
+        self._last_attempts = 0
+        self._last_report = time.time()
+
+    def record_progress(self, attempts: int):
+        now = time.time()
+        if attempts >= self._last_attempts and now > self._last_report:
+            self.hash_rate = (attempts - self._last_attempts) / (now - self._last_report)
+        self.job_attempts = attempts
+        self._last_attempts = attempts
+        self._last_report = now
+
+    def to_dict(self) -> Dict:
+        elapsed = time.time() - self.job_started
+        return {
+            'worker_id': self.worker_id,
+            'name': self.name,
+            'attempts': self.job_attempts,
+            'elapsed': elapsed,
+            'hash_rate': self.hash_rate,
+            'accepted_shares': self.accepted_shares,
+            'rejected_shares': self.rejected_shares
+        }
+
+
+class MiningPoolServer:
+    """
+    矿池服务器
+
+    接口与 ParallelMiningEngine 相同（mine(block, target, cancel_token, progress_callback)），
+    可以直接作为 Blockchain.mine_pending_transactions 的挖矿引擎。
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = DEFAULT_POOL_PORT,
+                 range_size: int = DEFAULT_RANGE_SIZE, share_zero_bits: int = DEFAULT_SHARE_ZERO_BITS):
+        self.host = host
+        self.port = port
+        self.range_size = range_size
+        self.share_zero_bits = share_zero_bits
+        self.server_socket = None
+        self.running = False
+
+        self.lock = threading.Lock()
+        self.sessions: Dict[int, PoolWorkerSession] = {}
+        self._next_worker_id = 0
+
+        # 当前任务
+        self.job: Optional[Dict] = None
+        self._job_id = 0
+        self._next_nonce = 0
+        self._hash_nonce = None
+        self._block_target: Optional[DifficultyTarget] = None
+        self._share_target: Optional[DifficultyTarget] = None
+        # 当前任务已提交过的 nonce，同一份额重复提交会被拒绝（否则可以刷份额）
+        self._submitted_nonces: Set[int] = set()
+        self._found: Optional[Tuple[int, str, int]] = None
+        self._found_event = threading.Event()
+
+    # ==================== 服务器 ====================
+
+    def start(self) -> bool:
+        """开始监听矿工连接"""
+        if self.running:
+            return True
+        try:
+            self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.server_socket.bind((self.host, self.port))
+            self.server_socket.listen(16)
+            # 端口为 0 时由系统分配
+            self.port = self.server_socket.getsockname()[1]
+        except OSError as e:
+            print(f"❌ 矿池启动失败: {e}")
+            return False
+
+        self.running = True
+        threading.Thread(target=self._accept_connections, daemon=True).start()
+        print(f"✅ 矿池已启动: {self.host}:{self.port}")
+        return True
+
+    def stop(self):
+        """关闭矿池并断开所有矿工"""
+        self.running = False
+        if self.server_socket:
+            try:
+                self.server_socket.close()
+            except OSError:
+                pass
+        with self.lock:
+            sessions = list(self.sessions.values())
+            self.sessions.clear()
+        for session in sessions:
+            session.connection.close()
+        print("矿池已关闭")
+
+    def _accept_connections(self):
+        while self.running:
+            try:
+                client_socket, address = self.server_socket.accept()
+            except OSError:
+                break
+            client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self.lock:
+                worker_id = self._next_worker_id
+                self._next_worker_id += 1
+                session = PoolWorkerSession(worker_id, _LineConnection(client_socket), address)
+                self.sessions[worker_id] = session
+            print(f"⛏️  矿工 #{worker_id} 已连接: {address[0]}:{address[1]}")
+            threading.Thread(target=self._handle_worker, args=(session,), daemon=True).start()
+
+    def _handle_worker(self, session: PoolWorkerSession):
+        try:
+            while self.running:
+                message = session.connection.receive()
+                if message is None:
+                    break
+                try:
+                    self._handle_message(session, message)
+                except (TypeError, ValueError) as e:
+                    # 格式错误的消息只丢弃这一条，不断开矿工
+                    print(f"⚠️  矿工 #{session.worker_id} 发送了无效消息: {e}")
+        finally:
+            with self.lock:
+                self.sessions.pop(session.worker_id, None)
+            session.connection.close()
+            print(f"矿工 #{session.worker_id} ({session.name}) 已断开")
+
+    def _handle_message(self, session: PoolWorkerSession, message: Dict):
+        msg_type = message.get('type')
+
+        if msg_type == 'subscribe':
+            session.name = str(message.get('name') or session.name)
+            self._send_work(session)
+        elif msg_type == 'need_work':
+            if message.get('job_id') == self._job_id:
+                self._send_work(session, new_template=False)
+        elif msg_type == 'progress':
+            attempts = _parse_uint(message.get('attempts', 0), NONCE_LIMIT)
+            if message.get('job_id') == self._job_id and attempts is not None:
+                session.record_progress(attempts)
+        elif msg_type == 'share':
+            error = self._check_share(session, message)
+            session.connection.send({'type': 'share_result', 'accepted': error is None, 'error': error})
+
+    # ==================== 任务分发 ====================
+
+    def _send_work(self, session: PoolWorkerSession, new_template: bool = True):
+        """给矿工分配当前任务的下一个 nonce 区间"""
+        with self.lock:
+            job = self.job
+            if job is None:
+                message = {'type': 'idle'}
+            else:
+                nonce_start = self._next_nonce
+                self._next_nonce += self.range_size
+                message = dict(job, nonce_start=nonce_start, nonce_end=nonce_start + self.range_size)
+            if new_template:
+                session.reset_job()
+        session.connection.send(message)
+
+    def _check_share(self, session: PoolWorkerSession, message: Dict) -> Optional[str]:
+        """
+        校验份额：nonce 必须是 8 字节无符号整数，且份额属于当前任务、nonce 未提交过、
+        哈希正确并满足份额难度
+
+        Returns:
+            拒绝原因，接受时返回 None
+        """
+        with self.lock:
+            error = None
+            nonce = _parse_uint(message.get('nonce'), NONCE_LIMIT)
+            if nonce is None:
+                error = "nonce 无效"
+            elif self.job is None or message.get('job_id') != self._job_id:
+                error = "任务已过期"
+            elif nonce in self._submitted_nonces:
+                error = "重复的份额"
+            else:
+                block_hash = self._hash_nonce(nonce)
+                if block_hash != message.get('hash'):
+                    error = "哈希不正确"
+                elif not self._share_target.is_met(block_hash):
+                    error = "未满足份额难度"
+            if error is not None:
+                session.rejected_shares += 1
+                return error
+
+            self._submitted_nonces.add(nonce)
+            session.accepted_shares += 1
+            if self._found is None and self._block_target.is_met(block_hash):
+                self._found = (nonce, block_hash, session.worker_id)
+                self.job = None
+                self._found_event.set()
+            return None
+
+    def _broadcast_work(self):
+        with self.lock:
+            sessions = list(self.sessions.values())
+        for session in sessions:
+            self._send_work(session)
+
+    def mine(self, block, target: Union[int, DifficultyTarget], cancel_token: Optional[CancellationToken] = None,
+             progress_callback: Optional[Callable[[MiningProgress], None]] = None) -> MiningResult:
+        """
+        发布新的区块模板，等待矿工找到有效 nonce，成功后写回 block.nonce 和 block.hash
+
+        每次调用都会替换矿工手上的旧模板；没有矿工连接时会一直等待，直到被取消。
+        """
+        target = DifficultyTarget.coerce(target)
+        if not self.running and not self.start():
+            return MiningResult(None, None, [], 0.0)
+
+        share_target = DifficultyTarget.from_zero_bits(self.share_zero_bits)
+        if share_target.target < target.target:
+            share_target = target
+        hash_job = block.hash_job()
+        kind, payload = encode_job(hash_job)
+
+        with self.lock:
+            self._job_id += 1
+            self._next_nonce = block.nonce
+            self._hash_nonce = make_nonce_hasher(hash_job)
+            self._block_target = target
+            self._share_target = share_target
+            self._submitted_nonces = set()
+            self._found = None
+            self._found_event.clear()
+            self.job = {
+                'type': 'job',
+                'job_id': self._job_id,
+                'kind': kind,
+                'payload': payload,
+                'target': target.target_hex,
+                'share_target': share_target.target_hex
+            }
+            worker_count = len(self.sessions)
+
+        print(f"开始矿池挖矿，难度: {target}, 已连接矿工: {worker_count}")
+        if worker_count == 0:
+            print(f"⚠️  暂无矿工连接，等待矿工连接到 {self.host}:{self.port} ...")
+        self._broadcast_work()
+
+        start_time = time.time()
+        last_report = start_time
+        try:
+            while not self._found_event.wait(0.2):
+                if cancel_token and cancel_token.cancelled:
+                    break
+                now = time.time()
+                if progress_callback and now - last_report >= PROGRESS_INTERVAL:
+                    progress_callback(MiningProgress(self.total_attempts, now - start_time))
+                    last_report = now
+        finally:
+            with self.lock:
+                self.job = None
+                found = self._found
+            elapsed = time.time() - start_time
+            worker_stats = self.get_worker_stats()
+            # 通知矿工停止旧任务
+            self._broadcast_work()
+
+        if found is None:
+            print("⏹️  矿池挖矿已取消")
+            return MiningResult(None, None, worker_stats, elapsed)
+
+        nonce, block_hash, winner = found
+        block.nonce = nonce
+        block.hash = block_hash
+
+        result = MiningResult(nonce, block_hash, worker_stats, elapsed)
+        print(f"✅ 矿池挖矿成功！(矿工 #{winner})")
+        print(f"  Nonce: {nonce}")
+        print(f"  哈希: {block_hash}")
+        print(f"  耗时: {elapsed:.2f}秒")
+        print(f"  矿池算力: {result.hash_rate:.0f} H/s")
+        for stat in worker_stats:
+            print(f"    矿工 #{stat['worker_id']} ({stat['name']}): {stat['hash_rate']:.0f} H/s, "
+                  f"份额 {stat['accepted_shares']}/{stat['accepted_shares'] + stat['rejected_shares']}")
+        return result
+
+    # ==================== 统计 ====================
+
+    def get_worker_stats(self) -> List[Dict]:
+        with self.lock:
+            return [self.sessions[k].to_dict() for k in sorted(self.sessions)]
+
+    @property
+    def total_attempts(self) -> int:
+        with self.lock:
+            return sum(session.job_attempts for session in self.sessions.values())
+
+    @property
+    def hash_rate(self) -> float:
+        """所有矿工的合计算力 (H/s)"""
+        with self.lock:
+            return sum(session.hash_rate for session in self.sessions.values())
+
+    def get_stats(self) -> Dict:
+        workers = self.get_worker_stats()
+        return {
+            'address': f"{self.host}:{self.port}",
+            'workers': workers,
+            'worker_count': len(workers),
+            'hash_rate': sum(w['hash_rate'] for w in workers),
+            'accepted_shares': sum(w['accepted_shares'] for w in workers),
+            'rejected_shares': sum(w['rejected_shares'] for w in workers)
+        }
+
+
+class PoolWorker:
+    """连接矿池的矿工：按矿池分配的区间搜索 nonce 并提交份额"""
+
+    # 每搜索这么多个 nonce 检查一次新任务和取消标志
+    CHUNK_SIZE = 2000
+
+    def __init__(self, host: str = '127.0.0.1', port: int = DEFAULT_POOL_PORT, name: Optional[str] = None):
+        self.host = host
+        self.port = port
+        self.name = name or f"{socket.gethostname()}-{threading.get_ident() % 10000}"
+        self.connection: Optional[_LineConnection] = None
+
+        self._job_lock = threading.Lock()
+        self._job_changed = threading.Event()
+        self._job: Optional[Dict] = None
+        self._connected = False
+        # 当前任务（跨多个区间）的累计尝试次数
+        self._current_job_id = None
+        self._current_job_attempts = 0
+        self._last_report = 0.0
+
+        self.total_attempts = 0
+        self.accepted_shares = 0
+        self.rejected_shares = 0
+
+    def _receive_loop(self):
+        while self._connected:
+            message = self.connection.receive()
+            if message is None:
+                break
+            msg_type = message.get('type')
+            if msg_type == 'job':
+                with self._job_lock:
+                    self._job = message
+                self._job_changed.set()
+            elif msg_type == 'idle':
+                with self._job_lock:
+                    self._job = None
+                self._job_changed.set()
+            elif msg_type == 'share_result':
+                if message.get('accepted'):
+                    self.accepted_shares += 1
+                else:
+                    self.rejected_shares += 1
+                    print(f"⚠️  份额被拒绝: {message.get('error')}")
+        self._connected = False
+        self._job_changed.set()
+
+    def run(self, cancel_token: Optional[CancellationToken] = None,
+            progress_callback: Optional[Callable[[MiningProgress], None]] = None) -> Dict:
+        """
+        连接矿池并持续挖矿，直到被取消或矿池断开
+
+        Returns:
+            矿工统计信息字典
+        """
+        cancel_token = cancel_token or CancellationToken()
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=10)
+        except OSError as e:
+            print(f"❌ 无法连接矿池 {self.host}:{self.port}: {e}")
+            return self.get_stats(0.0)
+        sock.settimeout(None)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        self.connection = _LineConnection(sock)
+        self._connected = True
+        threading.Thread(target=self._receive_loop, daemon=True).start()
+        self.connection.send({'type': 'subscribe', 'name': self.name})
+        print(f"✅ 已连接矿池 {self.host}:{self.port}，矿工名: {self.name}")
+
+        start_time = time.time()
+        try:
+            while self._connected and not cancel_token.cancelled:
+                # 等待任务
+                if not self._job_changed.wait(0.2):
+                    continue
+                self._job_changed.clear()
+                with self._job_lock:
+                    job = self._job
+                if job is not None:
+                    self._work_on(job, cancel_token, progress_callback, start_time)
+        finally:
+            self._connected = False
+            self.connection.close()
+
+        elapsed = time.time() - start_time
+        print(f"矿工已停止，共尝试 {self.total_attempts} 次，"
+              f"份额 {self.accepted_shares} 接受 / {self.rejected_shares} 拒绝")
+        return self.get_stats(elapsed)
+
+    def _work_on(self, job: Dict, cancel_token: CancellationToken,
+                 progress_callback: Optional[Callable[[MiningProgress], None]], start_time: float):
+        """搜索一个 nonce 区间；任务变化、被取消或区间搜索完时返回"""
+        hash_nonce = make_nonce_hasher(decode_job(job['kind'], job['payload']))
+        share_target = job['share_target']
+        job_id = job['job_id']
+        nonce = job['nonce_start']
+        nonce_end = job['nonce_end']
+        if job_id != self._current_job_id:
+            self._current_job_id = job_id
+            self._current_job_attempts = 0
+
+        while nonce < nonce_end:
+            chunk_end = min(nonce + self.CHUNK_SIZE, nonce_end)
+            for candidate in range(nonce, chunk_end):
+                block_hash = hash_nonce(candidate)
+                if block_hash <= share_target:
+                    self.connection.send({'type': 'share', 'job_id': job_id,
+                                          'nonce': candidate, 'hash': block_hash})
+            self._current_job_attempts += chunk_end - nonce
+            self.total_attempts += chunk_end - nonce
+            nonce = chunk_end
+
+            now = time.time()
+            if now - self._last_report >= PROGRESS_INTERVAL:
+                self.connection.send({'type': 'progress', 'job_id': job_id,
+                                      'attempts': self._current_job_attempts})
+                if progress_callback:
+                    progress_callback(MiningProgress(self.total_attempts, now - start_time))
+                self._last_report = now
+
+            if cancel_token.cancelled or not self._connected or self._job_changed.is_set():
+                return
+
+        # 区间搜索完，向矿池申请下一个区间
+        with self._job_lock:
+            if self._job is job:
+                self._job = None
+        self.connection.send({'type': 'need_work', 'job_id': job_id})
+
+    def get_stats(self, elapsed: float) -> Dict:
+        return {
+            'name': self.name,
+            'pool': f"{self.host}:{self.port}",
+            'attempts': self.total_attempts,
+            'elapsed': elapsed,
+            'hash_rate': self.total_attempts / elapsed if elapsed > 0 else 0.0,
+            'accepted_shares': self.accepted_shares,
+            'rejected_shares': self.rejected_shares
+        }
+
+
+if __name__ == "__main__":
+    # 用法: python mining_pool.py [矿池地址] [端口]  —— 以矿工身份连接矿池
+    pool_host = sys.argv[1] if len(sys.argv) > 1 else '127.0.0.1'
+    pool_port = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_POOL_PORT
+    token = CancellationToken()
+    try:
+        PoolWorker(pool_host, pool_port).run(token)
+    except KeyboardInterrupt:
+        token.cancel()
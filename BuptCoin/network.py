@@ -28,6 +28,7 @@ class P2PNode:
             'transaction': self.handle_transaction,
             'get_chain': self.handle_get_chain,
             'new_block': self.handle_new_block,
+            'get_merkle_proof': self.handle_get_merkle_proof,
             'get_peers': self.handle_get_peers,
             'stake': self.handle_stake,
             'vote': self.handle_vote,
@@ -37,7 +38,7 @@ class P2PNode:
     def handle_new_block(self, message, client_socket):
         """处理新区块消息"""
         block_data = message.get('block', {})
-        from blockchain import Block, Transaction
+        from blockchain import Block, Transaction, BLOCK_VERSION_LEGACY
 
         # 重构区块对象
         transactions = []
@@ -47,8 +48,12 @@ class P2PNode:
                 tx_data['receiver'],
                 tx_data['amount'],
                 tx_data.get('type', 'transfer'),
-                tx_data.get('data', '')
+                tx_data.get('data', ''),
+                tx_data.get('signature'),
+                tx_data.get('timestamp')
             )
+            # 保留发送方的交易ID（可能是旧格式哈希），由 validate_transaction 校验
+            tx.transaction_id = tx_data.get('transaction_id', tx.transaction_id)
             transactions.append(tx)
 
         new_block = Block(
@@ -56,16 +61,36 @@ class P2PNode:
             transactions,
             block_data['previous_hash'],
             block_data['timestamp'],
-            block_data['nonce']
+            block_data['nonce'],
+            block_data.get('version', BLOCK_VERSION_LEGACY),
+            block_data.get('bits')
         )
         new_block.hash = block_data['hash']
 
         # 验证并添加新区块
         if self.validate_and_add_block(new_block):
             print(f"新区块 #{new_block.index} 同步成功")
+            # 本地正在挖的同高度区块已经过期，立即停止
+            self.blockchain.abort_mining()
             # 广播给其他节点
             self.broadcast_block(new_block)
 
+    def handle_get_chain(self, message, client_socket):
+        """处理获取区块链请求"""
+        self.send_blockchain(client_socket)
+
+    def handle_get_merkle_proof(self, message, client_socket):
+        """处理交易包含证明请求（叶子总数 leaf_count 随证明一起发送，校验时用来拒绝越界的索引）"""
+        transaction_id = message.get('transaction_id', '')
+        proof = self.blockchain.get_transaction_proof(transaction_id)
+        response = {
+            'type': 'merkle_proof',
+            'transaction_id': transaction_id,
+            'leaf_count': proof['leaf_count'] if proof else None,
+            'proof': proof
+        }
+        client_socket.send(json.dumps(response).encode('utf-8'))
+
     def handle_get_peers(self, message, client_socket):
         """处理获取节点列表请求"""
         response = {
@@ -91,30 +116,48 @@ class P2PNode:
 
     def validate_and_add_block(self, block) -> bool:
         """验证并添加区块"""
-        # 1. 验证工作量证明
-        if block.hash[:self.blockchain.difficulty] != '0' * self.blockchain.difficulty:
+        # 0. 必须接在当前链末端（重复或过期的区块直接忽略）
+        latest_block = self.blockchain.get_latest_block()
+        if latest_block and (block.index != latest_block.index + 1 or block.previous_hash != latest_block.hash):
+            print(f"区块 #{block.index} 不能接在当前链末端，忽略")
+            return False
+
+        # 1. 验证时间戳（晚于中位时间、不超前本地时间过多）
+        if not self.blockchain.verify_timestamp(block):
+            print(f"区块时间戳验证失败")
+            return False
+
+        # 2. 验证工作量证明（含难度目标是否符合难度调整结果）
+        if not self.blockchain.verify_proof_of_work(block):
             print(f"工作量证明验证失败")
             return False
 
-        # 2. 验证区块哈希
+        # 3. 验证区块哈希
         if block.hash != block.calculate_hash():
             print(f"区块哈希验证失败")
             return False
 
-        # 3. 验证交易
+        # 4. 验证交易
         for tx in block.transactions:
             if not self.validate_transaction(tx):
                 print(f"交易验证失败: {tx}")
                 return False
 
-        # 添加到区块链
+        # 5. 验证签名（交易 ID 已与内容核对；进入过本节点交易池的交易命中缓存）
+        if not self.blockchain.verify_block_signatures(block):
+            print(f"区块签名验证失败")
+            return False
+
+        # 添加到区块链，已被打包的交易移出待处理池
+        # 从网络接收的区块不保存到数据库，因此不在这里保存状态快照（见 Blockchain.persisted_height）
         self.blockchain.chain.append(block)
+        self.blockchain.remove_pending_transactions(block.transactions)
         return True
 
     def validate_transaction(self, transaction) -> bool:
         """验证交易"""
         # 这里可以添加签名验证、余额检查等
-        return True
+        return transaction.has_valid_id()
 
     def broadcast_block(self, block):
         """广播新区块"""
@@ -213,6 +256,10 @@ class P2PNode:
             self.handle_transaction(message)
         elif msg_type == 'get_chain':
             self.send_blockchain(client_socket)
+        elif msg_type == 'new_block':
+            self.handle_new_block(message, client_socket)
+        elif msg_type == 'get_merkle_proof':
+            self.handle_get_merkle_proof(message, client_socket)
 
     def handle_hello(self, message, client_socket):
         """处理新节点加入"""
@@ -240,10 +287,19 @@ class P2PNode:
         tx = Transaction(
             tx_data.get('sender', ''),
             tx_data.get('receiver', ''),
-            tx_data.get('amount', 0)
+            tx_data.get('amount', 0),
+            tx_data.get('type', 'transfer'),
+            tx_data.get('data', ''),
+            tx_data.get('signature'),
+            tx_data.get('timestamp')
         )
 
-        # 添加到本地区块链
+        # 交易ID必须与内容一致，否则同一笔交易在各节点会得到不同ID，无法去重
+        if tx_data.get('transaction_id', tx.transaction_id) != tx.transaction_id:
+            print(f"交易ID与内容不符，丢弃: {tx_data.get('transaction_id')}")
+            return
+
+        # 添加到本地区块链（交易池会拒绝已存在的交易，重复广播到此为止）
         if self.blockchain.add_transaction(tx):
             print(f"收到并添加交易: {tx}")
             # 广播给其他节点
@@ -342,4 +398,4 @@ class PeerManager:
             sock.close()
             return True
         except:
-            return False
\ No newline at end of file
+            return False
\ No newline at end of file
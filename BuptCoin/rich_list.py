@@ -0,0 +1,60 @@
+# rich_list.py - 富豪榜
+"""
+富豪榜
+按余额降序维护所有余额为正的地址（系统账户除外，见 account_state.UNRANKED_ADDRESSES），
+账户状态每次更新余额时同步调整位置。
+Top-K 和查询某个地址的排名都在进程内完成，不需要访问数据库。
+"""
+
+from bisect import bisect_left, insort
+from typing import Collection, Dict, List, Optional, Tuple
+
+from address_registry import address_registry
+
+
+class RichList:
+    """
+    按余额降序排列的地址表
+
+    内部保存有序列表 [(-余额, 地址ID), ...]，余额相同时按地址 ID 排序，
+    更新一个地址是两次二分查找加一次列表插入 / 删除。
+    """
+
+    def __init__(self):
+        self._entries: List[Tuple[float, int]] = []
+        # 地址ID -> 当前在有序列表中的键
+        self._keys: Dict[int, Tuple[float, int]] = {}
+
+    def update(self, address_id: int, balance: float) -> None:
+        """地址余额变为 balance（不大于 0 时移出榜单）"""
+        old_key = self._keys.pop(address_id, None)
+        if old_key is not None:
+            position = bisect_left(self._entries, old_key)
+            del self._entries[position]
+        if balance > 0:
+            key = (-balance, address_id)
+            insort(self._entries, key)
+            self._keys[address_id] = key
+
+    def rebuild(self, balances, excluded: Collection[int] = ()) -> None:
+        """由按地址 ID 排列的余额数组整体重建，excluded 中的地址 ID 不上榜"""
+        self._keys = {address_id: (-balance, address_id)
+                      for address_id, balance in enumerate(balances)
+                      if balance > 0 and address_id not in excluded}
+        self._entries = sorted(self._keys.values())
+
+    def top_k(self, k: int) -> List[Tuple[str, float]]:
+        """余额最高的 k 个地址：[(地址, 余额), ...]"""
+        return [(address_registry.address(address_id), -negative_balance)
+                for negative_balance, address_id in self._entries[:k]]
+
+    def rank(self, address: str) -> Optional[int]:
+        """地址的排名（从 1 开始），不在榜上返回 None"""
+        address_id = address_registry.lookup(address)
+        key = self._keys.get(address_id) if address_id is not None else None
+        if key is None:
+            return None
+        return bisect_left(self._entries, key) + 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
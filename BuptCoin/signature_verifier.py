@@ -0,0 +1,185 @@
+# signature_verifier.py - 交易签名验证
+"""
+交易签名验证
+用发送方在 wallet_addresses.public_key 中登记的 RSA 公钥（PKCS#1 PEM）校验交易签名，
+签名内容与 Wallet.sign_transaction 相同：交易字段的排序键 JSON。
+批量验证时把交易分块交给常驻的进程池，准入吞吐不再受限于单个 CPU 核心；
+批量较小时直接在当前进程验证，避免进程间传输开销超过验证本身。
+
+同一笔交易会在进入交易池、随区块转发、整链校验时各验证一次，
+因此验证通过的 (transaction_id, 签名) 记在有界 LRU 缓存中，之后直接命中；
+解析后的公钥对象也按 PEM 文本缓存，不再每次重新解析。
+"""
+
+import base64
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+try:
+    import rsa
+    RSA_AVAILABLE = True
+except ImportError:
+    RSA_AVAILABLE = False
+    print("⚠️  rsa 模块不可用，无法验证交易签名")
+
+# 一个验证任务：(签名内容, base64 签名, 公钥 PEM)
+VerifyJob = Tuple[bytes, str, str]
+
+# 缓存上限
+DEFAULT_VERIFIED_CACHE_SIZE = 100_000
+PUBLIC_KEY_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=PUBLIC_KEY_CACHE_SIZE)
+def load_public_key(public_key: str):
+    """解析 PEM 公钥（每个进程各自缓存）"""
+    return rsa.PublicKey.load_pkcs1(public_key.encode())
+
+
+def verify_signature(message: bytes, signature: str, public_key: str) -> bool:
+    """用 PEM 公钥验证 base64 编码的 RSA 签名"""
+    if not RSA_AVAILABLE or not signature or not public_key:
+        return False
+    try:
+        rsa.verify(message, base64.b64decode(signature), load_public_key(public_key))
+        return True
+    except Exception:
+        # 签名不匹配、签名或公钥格式错误都视为验证失败
+        return False
+
+
+def _verify_chunk(jobs: List[VerifyJob]) -> List[bool]:
+    """工作进程入口：依次验证一块任务"""
+    return [verify_signature(message, signature, public_key) for message, signature, public_key in jobs]
+
+
+class VerifiedSignatureCache:
+    """
+    验证通过的 (transaction_id, 签名) 的有界 LRU 缓存
+
+    transaction_id 是交易内容（含发送方）的哈希，调用方须先确认 transaction_id
+    与交易内容一致（Transaction.has_valid_id），命中缓存才等价于重新验证。
+    交易池准入、区块转发和整链校验可能在不同线程中同时使用，读写都加锁。
+    """
+
+    def __init__(self, max_size: int = DEFAULT_VERIFIED_CACHE_SIZE):
+        self.max_size = max(1, max_size)
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def contains(self, transaction_id: str, signature: str) -> bool:
+        """是否已验证通过（命中时移到最近使用）"""
+        key = (transaction_id, signature)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True
+            self.misses += 1
+            return False
+
+    def add(self, transaction_id: str, signature: str) -> None:
+        key = (transaction_id, signature)
+        with self._lock:
+            self._entries[key] = None
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SignatureVerifier:
+    """批量签名验证器，进程池在第一次并行验证时创建，之后一直复用"""
+
+    def __init__(self, workers: Optional[int] = None, chunk_size: int = 64, min_parallel: int = 32,
+                 cache_size: int = DEFAULT_VERIFIED_CACHE_SIZE):
+        """
+        Args:
+            workers: 工作进程数，默认使用全部 CPU 核心
+            chunk_size: 每次交给一个工作进程的任务数
+            min_parallel: 批量少于该数量时在当前进程验证
+            cache_size: 已验证签名缓存的条目上限
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = max(1, chunk_size)
+        self.min_parallel = min_parallel
+        self.cache = VerifiedSignatureCache(cache_size)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def available(self) -> bool:
+        return RSA_AVAILABLE
+
+    def verify(self, message: bytes, signature: str, public_key: str,
+               transaction_id: Optional[str] = None) -> bool:
+        """在当前进程验证单个签名；给出 transaction_id 时先查、后写已验证缓存"""
+        if transaction_id is not None and self.cache.contains(transaction_id, signature):
+            return True
+        valid = verify_signature(message, signature, public_key)
+        if valid and transaction_id is not None:
+            self.cache.add(transaction_id, signature)
+        return valid
+
+    def verify_batch(self, jobs: Sequence[VerifyJob],
+                     transaction_ids: Optional[Sequence[str]] = None) -> List[bool]:
+        """
+        批量验证，结果与 jobs 一一对应
+
+        给出 transaction_ids 时已验证过的签名直接命中缓存，只有未命中的交给进程池。
+        进程池不可用（例如创建失败）时退回当前进程顺序验证。
+        """
+        jobs = list(jobs)
+        if transaction_ids is None:
+            return self._verify_uncached(jobs)
+
+        results = [False] * len(jobs)
+        pending = []
+        for position, (tx_id, job) in enumerate(zip(transaction_ids, jobs)):
+            if self.cache.contains(tx_id, job[1]):
+                results[position] = True
+            else:
+                pending.append(position)
+
+        for position, valid in zip(pending, self._verify_uncached([jobs[p] for p in pending])):
+            results[position] = valid
+            if valid:
+                self.cache.add(transaction_ids[position], jobs[position][1])
+        return results
+
+    def _verify_uncached(self, jobs: List[VerifyJob]) -> List[bool]:
+        if self.workers <= 1 or len(jobs) < self.min_parallel or not RSA_AVAILABLE:
+            return _verify_chunk(jobs)
+
+        chunks = [jobs[i:i + self.chunk_size] for i in range(0, len(jobs), self.chunk_size)]
+        try:
+            results = []
+            for chunk_results in self._get_executor().map(_verify_chunk, chunks):
+                results.extend(chunk_results)
+            return results
+        except Exception as e:
+            print(f"⚠️  并行签名验证失败，改为单进程验证: {e}")
+            self.shutdown()
+            return _verify_chunk(jobs)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def shutdown(self) -> None:
+        """关闭进程池（之后再次并行验证时会重新创建）"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
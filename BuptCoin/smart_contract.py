@@ -94,6 +94,20 @@ class ContractManager:
         """获取合约"""
         return self.contracts.get(address)
 
+    def export_state(self) -> Dict[str, Dict]:
+        """导出所有合约的状态（用于状态快照）"""
+        return {address: contract.to_dict() for address, contract in self.contracts.items()}
+
+    def restore_state(self, state: Dict[str, Dict]):
+        """从状态快照恢复所有合约"""
+        self.contracts = {}
+        for address, data in state.items():
+            contract = SmartContract(address, data['creator'])
+            contract.balance = data.get('balance', 0.0)
+            contract.storage = data.get('storage', {})
+            contract.timestamp = data.get('timestamp')
+            self.contracts[address] = contract
+
     def execute_contract(self, contract_address: str, function: str, args: List, caller: str, value: float = 0) -> Dict:
         """执行合约"""
         contract = self.get_contract(contract_address)
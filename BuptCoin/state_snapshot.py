@@ -0,0 +1,90 @@
+# state_snapshot.py - 状态快照
+"""
+状态快照（检查点）
+每隔 N 个区块把完整的账户状态、合约状态和治理统计（质押、投票）连同区块高度、区块哈希、
+状态摘要一起保存。启动时加载最新的快照，只需重放快照之后的区块，重启耗时与链长度无关。
+"""
+
+import json
+from typing import Dict, List, Optional
+
+from utils import Utils
+
+# 默认每 100 个区块保存一次快照
+DEFAULT_SNAPSHOT_INTERVAL = 100
+
+# 账户状态格式版本，参与状态摘要
+# 2: 账户余额扣除交易手续费（旧格式快照摘要不符，加载时被忽略并重新计算）
+# 3: 增加治理统计
+STATE_FORMAT_VERSION = 3
+
+
+class StateSnapshot:
+    """某个区块高度之后的完整状态"""
+
+    def __init__(self, height: int, block_hash: str, accounts: Dict[str, List[float]],
+                 contracts: Dict[str, Dict], governance: Optional[Dict[str, Dict[str, float]]] = None,
+                 state_digest: Optional[str] = None):
+        """
+        Args:
+            height: 快照包含的最后一个区块的高度
+            block_hash: 该区块的哈希
+            accounts: {地址: [余额, 累计转出, 累计收入]}
+            contracts: {合约地址: 合约状态}
+            governance: {'stakes': {地址: 质押总额}, 'votes': {候选人: 得票}}
+            state_digest: 状态摘要，不提供时计算
+        """
+        self.height = height
+        self.block_hash = block_hash
+        self.accounts = accounts
+        self.contracts = contracts
+        self.governance = governance or {'stakes': {}, 'votes': {}}
+        self.state_digest = state_digest or self.calculate_digest()
+
+    @classmethod
+    def capture(cls, block, account_state, contract_manager, governance) -> 'StateSnapshot':
+        """在 block 处拍摄快照（account_state 和 governance 必须正好计入到 block）"""
+        return cls(block.index, block.hash, account_state.export_accounts(), contract_manager.export_state(),
+                   governance.export_state())
+
+    def calculate_digest(self) -> str:
+        """对状态格式版本、高度、区块哈希和全部状态做规范 JSON 哈希"""
+        return Utils.calculate_hash({
+            'format': STATE_FORMAT_VERSION,
+            'height': self.height,
+            'block_hash': self.block_hash,
+            'accounts': self.accounts,
+            'contracts': self.contracts,
+            'governance': self.governance
+        })
+
+    def is_valid(self) -> bool:
+        """状态数据与摘要是否一致"""
+        return self.state_digest == self.calculate_digest()
+
+    def to_record(self) -> Dict:
+        """转换为数据库记录"""
+        return {
+            'block_number': self.height,
+            'block_hash': self.block_hash,
+            'state_digest': self.state_digest,
+            'account_count': len(self.accounts),
+            'state_data': json.dumps({'accounts': self.accounts, 'contracts': self.contracts,
+                                      'governance': self.governance}, separators=(',', ':'))
+        }
+
+    @classmethod
+    def from_record(cls, record: Dict) -> 'StateSnapshot':
+        """从数据库记录恢复"""
+        state = json.loads(record['state_data'])
+        return cls(
+            height=record['block_number'],
+            block_hash=record['block_hash'],
+            accounts=state.get('accounts', {}),
+            contracts=state.get('contracts', {}),
+            governance=state.get('governance'),
+            state_digest=record['state_digest']
+        )
+
+    def __str__(self) -> str:
+        return f"StateSnapshot(#{self.height}, {len(self.accounts)} 个账户, 摘要: {self.state_digest[:10]}...)"
@@ -0,0 +1,159 @@
+# conftest.py - 测试公共设置
+"""
+测试公共设置
+项目模块平铺在 BuptCoin/ 目录下，测试时把该目录加入 sys.path。
+没有 MySQL 驱动时 Blockchain 自动使用内存存储，测试不依赖数据库。
+"""
+
+import base64
+import hashlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import blockchain as bc  # noqa: E402
+from mempool import Mempool  # noqa: E402
+
+
+@pytest.fixture
+def chain():
+    """内存存储的区块链；难度调整窗口设得很大，连续出块时难度不变"""
+    blockchain = bc.Blockchain(difficulty=1)
+    blockchain.db = None
+    blockchain.retargeter.window = 10 ** 6
+    yield blockchain
+    blockchain.chain_validator.shutdown()
+    blockchain.signature_verifier.shutdown()
+
+
+@pytest.fixture
+def account(chain):
+    """在 chain 上登记公钥的地址，返回 (地址, 签名函数)"""
+    rsa = pytest.importorskip("rsa")
+    public_key, private_key = rsa.newkeys(512)
+    pem = public_key.save_pkcs1().decode()
+    address = "BPC_" + hashlib.sha256(pem.encode()).hexdigest()[:40]
+    assert chain.register_public_key(address, pem)
+
+    def sign(transaction):
+        signature = rsa.sign(transaction.signing_payload(), private_key, 'SHA-256')
+        transaction.signature = base64.b64encode(signature).decode()
+        return transaction
+
+    return address, sign
+
+
+def fund(blockchain, address, amount, miner="miner"):
+    """用系统交易给地址打款并出块"""
+    assert blockchain.add_transaction(bc.Transaction("0", address, amount))
+    assert blockchain.mine_pending_transactions(miner)
+
+
+class FakeCursor:
+    def __init__(self, database):
+        self.database = database
+        self.rows = []
+
+    def execute(self, query, params=()):
+        if 'FROM blocks' in query:
+            self.rows = self.database.blocks
+        elif 'FROM transactions' in query:
+            first = params[0]
+            last = params[1] if len(params) > 1 else float('inf')
+            self.rows = [row for row in self.database.transactions if first <= row['block_number'] <= last]
+            self.database.transaction_queries.append((first, last))
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, database):
+        self.database = database
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self.database)
+
+
+class FakeDatabase:
+    """只实现 load_from_database 用到的查询：区块、已确认交易、状态快照和待处理交易"""
+
+    is_connected = True
+
+    def __init__(self, chain, snapshot=None, pending=()):
+        self.connection = FakeConnection(self)
+        self.snapshot = snapshot.to_record() if snapshot else None
+        self.blocks = [{
+            'block_number': block.index, 'previous_hash': block.previous_hash, 'timestamp': block.timestamp,
+            'nonce': block.nonce, 'block_hash': block.hash, 'version': block.version,
+            'target_bits': block.bits, 'difficulty': 1, 'merkle_root': block.merkle_root
+        } for block in chain]
+        self.transactions = [self.transaction_row(tx, block.index, 'confirmed')
+                             for block in chain for tx in block.transactions]
+        self.pending = [dict(self.transaction_row(tx, None, 'pending'), id=row_id)
+                        for row_id, tx in enumerate(pending, 1)]
+        self.transaction_queries = []
+
+    @staticmethod
+    def transaction_row(tx, block_number, status):
+        return {
+            'from_address': tx.sender, 'to_address': tx.receiver, 'amount': tx.amount,
+            'transaction_type': tx.transaction_type, 'data': tx.data, 'timestamp': tx.timestamp,
+            'transaction_hash': tx.transaction_id, 'signature': tx.signature,
+            'block_number': block_number, 'status': status
+        }
+
+    def get_latest_state_snapshot(self, max_height=None):
+        return self.snapshot
+
+    def get_address_labels(self, addresses):
+        return {}
+
+    def get_address_balance(self, address):
+        # 没有余额表，余额由账户状态计算
+        return None
+
+    def get_pending_transactions(self, limit):
+        pending = [row for row in self.pending if row['status'] == 'pending']
+        latest = sorted(pending, key=lambda row: (row['timestamp'], row['id']), reverse=True)[:limit]
+        latest.reverse()
+        return latest
+
+    def mark_pending_before(self, timestamp, status, before_id=None):
+        marked = 0
+        for row in self.pending:
+            earlier = row['timestamp'] < timestamp or (
+                before_id is not None and row['timestamp'] == timestamp and row['id'] < before_id)
+            if row['status'] == 'pending' and earlier:
+                row['status'] = status
+                marked += 1
+        return marked
+
+    def mark_transactions_status(self, hashes, status):
+        hashes = set(hashes)
+        for row in self.pending:
+            if row['transaction_hash'] in hashes:
+                row['status'] = status
+        return True
+
+
+def load_chain(database, max_pending=None):
+    """用 database 中的数据加载一条新的区块链，max_pending 为交易池的交易数上限"""
+    blockchain = bc.Blockchain(difficulty=1)
+    if max_pending is not None:
+        blockchain.mempool = Mempool(max_transactions=max_pending,
+                                     max_transaction_bytes=blockchain.mempool.max_transaction_bytes)
+    # 丢弃没有数据库时创建的创世区块和内存状态
+    blockchain.chain = []
+    blockchain.account_state = bc.AccountStateIndex(blockchain.transaction_fee)
+    blockchain.governance = bc.GovernanceAggregates()
+    blockchain.db = database
+    blockchain.retargeter.window = 10 ** 6
+    assert blockchain.load_from_database()
+    return blockchain
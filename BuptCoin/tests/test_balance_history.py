@@ -0,0 +1,30 @@
+# test_balance_history.py - 历史余额索引
+import blockchain as bc
+from conftest import fund
+
+
+def test_balance_at_tip_matches_get_balance(chain, account):
+    """历史余额与 get_balance / 账户状态 / 富豪榜使用相同的手续费规则"""
+    address, sign = account
+    fund(chain, address, 50)
+    assert chain.add_transaction(sign(bc.Transaction(address, "receiver", 20)))
+    assert chain.mine_pending_transactions("miner")
+
+    tip = chain.get_latest_block().index
+    for holder in (address, "receiver", "miner"):
+        assert chain.get_balance_at(holder, tip) == chain.get_balance(holder)
+    assert chain.get_balance_at(address, tip) == round(50 - 20 - chain.transaction_fee, 8)
+
+    balances = {entry['address']: entry['balance'] for entry in chain.get_rich_list()}
+    assert balances[address] == chain.get_balance_at(address, tip)
+
+
+def test_balance_at_earlier_height(chain, account):
+    address, sign = account
+    fund(chain, address, 50)
+    funded_at = chain.get_latest_block().index
+    assert chain.add_transaction(sign(bc.Transaction(address, "receiver", 5)))
+    assert chain.mine_pending_transactions("miner")
+
+    assert chain.get_balance_at(address, funded_at) == 50
+    assert chain.get_balance_at(address, funded_at - 1) == 0
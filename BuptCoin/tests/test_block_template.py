@@ -0,0 +1,29 @@
+# test_block_template.py - 区块模板
+import blockchain as bc
+from block_template import REWARD_RESERVED_BYTES, BlockTemplateBuilder
+from mempool import Mempool
+
+
+def test_no_block_when_nothing_fits(chain):
+    """区块模板没有选中任何交易时不挖只含奖励的区块"""
+    assert chain.add_transaction(bc.Transaction("0", "holder", 10, data="x" * 400))
+    # 区块上限在交易进入交易池之后被调小
+    chain.block_template_builder = BlockTemplateBuilder(REWARD_RESERVED_BYTES + 200)
+    height = len(chain.chain)
+
+    assert not chain.mine_pending_transactions("miner")
+    assert len(chain.chain) == height
+    assert chain.get_balance("miner") == 0
+
+
+def test_template_respects_byte_budget():
+    pool = Mempool()
+    small = [bc.Transaction("0", f"holder-{i}", 10) for i in range(3)]
+    for tx in small:
+        assert pool.add(tx, 0.1)
+    per_transaction = len(small[0].encode())
+    builder = BlockTemplateBuilder(REWARD_RESERVED_BYTES + 2 * per_transaction + 1)
+
+    template = builder.build(pool)
+    assert len(template) == 2
+    assert template.remaining == 1
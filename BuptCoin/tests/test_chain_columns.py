@@ -0,0 +1,72 @@
+# test_chain_columns.py - 列式交易存储
+from types import SimpleNamespace
+
+import pytest
+
+import blockchain as bc
+import chain_columns
+
+
+def make_block(index, transactions, tag=""):
+    return SimpleNamespace(index=index, hash=f"block-{index}{tag}", transactions=transactions)
+
+
+def make_chain():
+    return [
+        make_block(0, [bc.Transaction("0", "alice", 100, timestamp=1000)]),
+        make_block(1, [
+            bc.Transaction("alice", "bob", 30, timestamp=1100),
+            bc.Transaction("alice", "carol", 10, "stake", timestamp=1200),
+        ]),
+        make_block(2, [
+            bc.Transaction("bob", "carol", 5, timestamp=1300),
+            bc.Transaction("alice", "bob", 20, timestamp=1400),
+        ]),
+    ]
+
+
+@pytest.fixture(params=[True, False], ids=["numpy", "python"])
+def numpy_mode(request, monkeypatch):
+    if request.param and not chain_columns.NUMPY_AVAILABLE:
+        pytest.skip("未安装 NumPy")
+    monkeypatch.setattr(chain_columns, "NUMPY_AVAILABLE", request.param)
+
+
+def test_columns_follow_blocks():
+    columns = chain_columns.ChainColumns()
+    columns.sync(make_chain())
+    assert columns.row_count == 5
+    assert list(columns.heights) == [0, 1, 1, 2, 2]
+    assert list(columns.amounts) == [100, 30, 10, 5, 20]
+    assert columns.locate(3) == (2, 0)
+
+
+def test_aggregates(numpy_mode):
+    columns = chain_columns.ChainColumns()
+    columns.sync(make_chain())
+
+    assert columns.sum_by('sender') == {"0": 100, "alice": 60, "bob": 5}
+    assert columns.sum_by('receiver', tx_type="transfer") == {"alice": 100, "bob": 50, "carol": 5}
+    assert columns.sum_by('sender', start=1100, end=1400) == {"alice": 40, "bob": 5}
+    assert columns.sum_by('sender', tx_type="vote") == {}
+    assert columns.top_k(2, 'receiver') == [("alice", 100), ("bob", 50)]
+    assert columns.rows_in_range(1200, 1400) == [2, 3]
+    assert columns.rows_in_range(tx_type="stake") == [2]
+    assert columns.latest_rows(2) == [4, 3]
+    with pytest.raises(ValueError):
+        columns.sum_by('label')
+
+
+def test_sync_detects_reorg_to_shorter_chain():
+    columns = chain_columns.ChainColumns()
+    columns.sync(make_chain())
+
+    # 分叉链：高度 1 的区块被替换，且比原链短
+    fork = make_chain()[:1] + [make_block(1, [bc.Transaction("alice", "dave", 7, timestamp=1500)], "b")]
+    columns.sync(fork)
+    assert columns.row_count == 2
+    assert columns.sum_by('receiver') == {"alice": 100, "dave": 7}
+
+    # 回到原链
+    columns.sync(make_chain())
+    assert columns.sum_by('receiver') == {"alice": 100, "bob": 50, "carol": 15}
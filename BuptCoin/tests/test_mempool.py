@@ -0,0 +1,75 @@
+# test_mempool.py - 交易池
+import time
+
+import blockchain as bc
+import mempool as mempool_module
+from conftest import FakeDatabase, load_chain
+from mempool import STATUS_EVICTED
+from merkle_tree import MerkleAccumulator
+
+
+def test_merkle_accumulator_not_rebuilt_after_block_takes_all(chain, monkeypatch):
+    """出块清空交易池后，新交易继续增量追加，不再每轮全量重建默克尔树"""
+    rebuilds = []
+    original = MerkleAccumulator.from_transactions.__func__
+
+    def spy(cls, transactions, legacy=False):
+        rebuilds.append(len(transactions))
+        return original(cls, transactions, legacy)
+
+    monkeypatch.setattr(mempool_module.MerkleAccumulator, "from_transactions", classmethod(spy))
+
+    for round_number in range(2):
+        assert chain.add_transaction(bc.Transaction("0", f"holder-{round_number}", 10))
+        assert chain.mine_pending_transactions("miner")
+        assert len(chain.mempool) == 0
+
+    assert rebuilds == []
+    assert chain.is_chain_valid()
+
+
+def test_merkle_root_after_partial_removal():
+    pool = mempool_module.Mempool()
+    transactions = [bc.Transaction("0", f"holder-{i}", 10 + i) for i in range(3)]
+    for tx in transactions:
+        assert pool.add(tx, 0.1)
+    pool.remove(transactions[0].transaction_id)
+
+    reward = bc.Transaction("0", "miner", 50, "mining_reward")
+    expected = MerkleAccumulator.from_transactions(transactions[1:] + [reward]).get_root()
+    assert pool.merkle_root_with(reward) == expected
+
+
+def test_rejects_transaction_larger_than_a_block(chain):
+    """放不进任何区块模板的交易在进入交易池时就被拒绝"""
+    limit = chain.block_template_builder.max_transaction_bytes
+    assert chain.mempool.max_transaction_bytes == limit
+
+    oversized = bc.Transaction("0", "holder", 10, data="x" * (limit + 1))
+    assert not chain.mempool.fits(oversized)
+    assert not chain.add_transaction(oversized)
+    results = chain.add_transactions([oversized])
+    assert not results[0]['accepted'] and "交易过大" in results[0]['reason']
+    assert len(chain.mempool) == 0
+
+    pool = mempool_module.Mempool(max_transaction_bytes=300)
+    assert not pool.add(bc.Transaction("0", "holder", 10, data="x" * 300), 0.1)
+    assert pool.add(bc.Transaction("0", "holder", 10), 0.1)
+
+
+def test_load_evicts_unloaded_pending_with_same_timestamp(chain):
+    """交易池装不下的待处理交易即使与最早加载的交易同一时间戳，也被标记为挤出"""
+    now = int(time.time())
+    pending = [bc.Transaction("0", f"holder-{i}", 10, timestamp=now) for i in range(4)]
+    database = FakeDatabase(chain.chain, pending=pending)
+
+    restored = load_chain(database, max_pending=2)
+    try:
+        loaded = {tx.transaction_id for tx in restored.pending_transactions}
+        assert len(loaded) == 2
+        for row in database.pending:
+            expected = 'pending' if row['transaction_hash'] in loaded else STATUS_EVICTED
+            assert row['status'] == expected
+    finally:
+        restored.chain_validator.shutdown()
+        restored.signature_verifier.shutdown()
@@ -0,0 +1,50 @@
+# test_mining_pool.py - 矿池协议
+import json
+import socket
+
+import pytest
+
+from mining_pool import MiningPoolServer
+
+
+@pytest.fixture
+def pool():
+    server = MiningPoolServer(port=0)
+    assert server.start()
+    yield server
+    server.stop()
+
+
+def connect(server):
+    sock = socket.create_connection((server.host, server.port), timeout=5)
+    reader = sock.makefile('r', encoding='utf-8')
+
+    def send(message):
+        sock.sendall((json.dumps(message) + '\n').encode('utf-8'))
+
+    def receive():
+        return json.loads(reader.readline())
+
+    return sock, send, receive
+
+
+@pytest.mark.parametrize("nonce", [-1, 1 << 64, "12", 1.5, True, None])
+def test_malformed_share_is_rejected_without_dropping_session(pool, nonce):
+    sock, send, receive = connect(pool)
+    try:
+        send({'type': 'subscribe', 'name': 'tester'})
+        assert receive() == {'type': 'idle'}
+
+        send({'type': 'progress', 'job_id': 0, 'attempts': "many"})
+        send({'type': 'share', 'job_id': 0, 'nonce': nonce, 'hash': "00"})
+        assert receive() == {'type': 'share_result', 'accepted': False, 'error': "nonce 无效"}
+
+        # 会话仍然可用
+        send({'type': 'share', 'job_id': 0, 'nonce': 1, 'hash': "00"})
+        assert receive() == {'type': 'share_result', 'accepted': False, 'error': "任务已过期"}
+        send(["not", "an", "object"])
+        send({'type': 'subscribe', 'name': 'tester'})
+        assert receive() == {'type': 'idle'}
+        assert pool.get_worker_stats()[0]['rejected_shares'] == 2
+    finally:
+        sock.close()
@@ -0,0 +1,66 @@
+# test_state_snapshot.py - 状态快照与历史区块的延迟加载
+import blockchain as bc
+from conftest import FakeDatabase, load_chain
+from state_snapshot import StateSnapshot
+
+SNAPSHOT_HEIGHT = 4
+
+
+def mine_history(chain):
+    transactions = [
+        bc.Transaction("0", "alice", 50, timestamp=1),
+        bc.Transaction("0", "alice", 5, "stake", timestamp=2),
+        bc.Transaction("0", "bob", 3, "vote", data="投票给: carol", timestamp=3),
+        bc.Transaction("0", "bob", 20, timestamp=4),
+        bc.Transaction("0", "alice", 2, "stake", timestamp=5),
+        bc.Transaction("0", "dave", 1, "vote", data="carol", timestamp=6),
+        bc.Transaction("0", "carol", 7, timestamp=7),
+    ]
+    for tx in transactions:
+        assert chain.add_transaction(tx)
+        assert chain.mine_pending_transactions("miner")
+
+
+def capture(chain, height):
+    account_state = bc.AccountStateIndex(chain.transaction_fee)
+    account_state.rebuild(chain.chain[:height + 1])
+    governance = bc.GovernanceAggregates()
+    governance.rebuild(chain.chain[:height + 1])
+    return StateSnapshot.capture(chain.chain[height], account_state, chain.contract_manager, governance)
+
+
+def test_refresh_after_restore_leaves_archived_blocks_unloaded(chain):
+    mine_history(chain)
+    database = FakeDatabase(chain.chain, capture(chain, SNAPSHOT_HEIGHT))
+
+    restored = load_chain(database)
+    try:
+        assert database.transaction_queries == [(SNAPSHOT_HEIGHT + 1, float('inf'))]
+
+        # GUI / 命令行刷新一次用到的查询
+        governance = restored.get_governance()
+        recent = restored.get_recent_transactions(3)
+        rich_list = restored.get_rich_list()
+        balance = restored.get_balance("alice")
+
+        assert not any(block.is_loaded for block in restored.chain[:SNAPSHOT_HEIGHT + 1])
+        assert database.transaction_queries == [(SNAPSHOT_HEIGHT + 1, float('inf'))]
+
+        expected = chain.get_governance()
+        assert governance.top_stakes() == expected.top_stakes()
+        assert governance.vote_ranking() == expected.vote_ranking() == [("carol", 4)]
+        assert [tx.transaction_id for tx in recent] == \
+            [tx.transaction_id for tx in chain.get_recent_transactions(3)]
+        assert rich_list == chain.get_rich_list()
+        assert balance == chain.get_balance("alice")
+    finally:
+        restored.chain_validator.shutdown()
+        restored.signature_verifier.shutdown()
+
+
+def test_snapshot_round_trip_keeps_governance(chain):
+    mine_history(chain)
+    snapshot = capture(chain, len(chain.chain) - 1)
+    restored = StateSnapshot.from_record(snapshot.to_record())
+    assert restored.is_valid()
+    assert restored.governance == chain.get_governance().export_state()
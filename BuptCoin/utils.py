@@ -13,11 +13,15 @@ class Utils:
         计算数据的SHA256哈希值
 
         Args:
-            data: 任意可JSON序列化的数据
+            data: 规范编码后的字节串，或任意可JSON序列化的数据（旧格式）
 
         Returns:
             str: 十六进制哈希字符串
         """
+        if isinstance(data, (bytes, bytearray)):
+            # 规范二进制编码（见 canonical_encoding.py）直接哈希
+            return hashlib.sha256(data).hexdigest()
+
         if isinstance(data, dict):
             # 确保字典有序，使哈希计算稳定
             data_str = json.dumps(data, sort_keys=True)
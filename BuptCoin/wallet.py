@@ -1,3 +1,4 @@
+from address_registry import address_registry
 from blockchain import Transaction, Blockchain
 # 在现有导入后添加
 import hashlib
@@ -53,15 +54,21 @@ class Wallet:
             addresses_info = db.get_user_addresses(self.user_id)
             if addresses_info:
                 print(f"从数据库加载用户 {self.user_id} 的钱包地址...")
+                address_keys = db.get_address_keys([info['address'] for info in addresses_info])
                 for addr_info in addresses_info:
-                    address = addr_info['address']
+                    address = address_registry.intern(addr_info['address'])
                     self.addresses.append(address)
 
-                    # 注意：真实应用中应该从数据库加载密钥
-                    # 这里简化处理，生成新的密钥对
-                    key_pair = self.generate_key_pair()
-                    self.public_keys[address] = key_pair["public_key"]
-                    self.private_keys[address] = key_pair["private_key"]
+                    # 使用数据库中登记的密钥，节点按 wallet_addresses.public_key 验证签名
+                    keys = address_keys.get(address)
+                    if keys and keys['public_key'] and keys['private_key_encrypted']:
+                        try:
+                            private_key = base64.b64decode(keys['private_key_encrypted']).decode('utf-8')
+                        except ValueError:
+                            # 系统地址（如 genesis）没有可用私钥
+                            continue
+                        self.public_keys[address] = keys['public_key']
+                        self.private_keys[address] = private_key
 
                 print(f"✅ 从数据库加载了 {len(self.addresses)} 个地址")
             else:
@@ -89,15 +96,21 @@ class Wallet:
             addresses_info = db.get_user_addresses(self.user_id)
             if addresses_info:
                 print(f"从数据库加载用户 {self.user_id} 的钱包地址...")
+                address_keys = db.get_address_keys([info['address'] for info in addresses_info])
                 for addr_info in addresses_info:
-                    address = addr_info['address']
+                    address = address_registry.intern(addr_info['address'])
                     self.addresses.append(address)
 
-                    # 注意：真实应用中应该从数据库加载密钥
-                    # 这里简化处理，生成新的密钥对
-                    key_pair = self.generate_key_pair()
-                    self.public_keys[address] = key_pair["public_key"]
-                    self.private_keys[address] = key_pair["private_key"]
+                    # 使用数据库中登记的密钥，节点按 wallet_addresses.public_key 验证签名
+                    keys = address_keys.get(address)
+                    if keys and keys['public_key'] and keys['private_key_encrypted']:
+                        try:
+                            private_key = base64.b64decode(keys['private_key_encrypted']).decode('utf-8')
+                        except ValueError:
+                            # 系统地址（如 genesis）没有可用私钥
+                            continue
+                        self.public_keys[address] = keys['public_key']
+                        self.private_keys[address] = private_key
 
                 print(f"✅ 从数据库加载了 {len(self.addresses)} 个地址")
             else:
@@ -141,14 +154,15 @@ class Wallet:
         # 生成5个默认地址
         for i in range(5):
             key_pair = self.generate_key_pair()
-            address = key_pair["address"]
+            # 地址登记到全局地址表，钱包与交易共享同一份字符串
+            address = address_registry.intern(key_pair["address"])
 
             self.addresses.append(address)
             self.public_keys[address] = key_pair["public_key"]
             self.private_keys[address] = key_pair["private_key"]
 
         # 添加特殊的创世地址
-        genesis_address = "genesis"
+        genesis_address = address_registry.intern("genesis")
         self.addresses.insert(0, genesis_address)
 
     def sign_transaction(self, transaction_data: Dict, address: str) -> Optional[str]:
@@ -173,6 +187,20 @@ class Wallet:
             print(f"签名失败: {e}")
             return None
 
+    def sign(self, transaction, blockchain: Blockchain = None) -> bool:
+        """
+        用发送方地址的私钥为交易对象签名（写入 transaction.signature）
+
+        给出 blockchain 时同时向节点登记公钥（内存存储时节点没有其他途径获得公钥）。
+        """
+        signature = self.sign_transaction(transaction.signing_data(), transaction.sender)
+        if not signature:
+            return False
+        transaction.signature = signature
+        if blockchain is not None:
+            blockchain.register_public_key(transaction.sender, self.public_keys[transaction.sender])
+        return True
+
     def verify_signature(self, transaction_data: Dict, signature: str, address: str) -> bool:
         """验证交易签名"""
         if address not in self.public_keys:
@@ -221,17 +249,21 @@ class Wallet:
             return None
 
         # 创建交易对象
+        # 时间戳必须与签名内容一致，否则节点验证签名失败
         from blockchain import Transaction
         transaction = Transaction(
             sender=sender,
             receiver=receiver,
             amount=amount,
             transaction_type=tx_type,
-            data=data
+            data=data,
+            signature=signature,
+            timestamp=transaction_data["timestamp"]
         )
 
-        # 添加到待处理交易池
-        if blockchain.add_transaction(transaction):
+        # 添加到待处理交易池（节点用登记的公钥验证签名）
+        blockchain.register_public_key(sender, self.public_keys[sender])
+        if blockchain.add_transaction(transaction, signature):
             print(f"已签名交易创建成功！")
             print(f"交易哈希: {transaction.transaction_id}")
             print(f"签名: {signature[:50]}...")
@@ -274,8 +306,11 @@ class Wallet:
             print(f"错误：金额必须大于0")
             return False
 
-        # 创建交易
+        # 创建并签名交易（节点拒绝未签名的交易）
         transaction = Transaction(sender, receiver, amount)
+        if not self.sign(transaction, blockchain):
+            print("交易签名失败")
+            return False
 
         # 提交交易到区块链
         success = blockchain.add_transaction(transaction)